@@ -1,25 +1,66 @@
-from influxdb import DataFrameClient,InfluxDBClient
-from dataclasses import dataclass
+from influxdb.line_protocol import quote_ident
+import sys
+import time
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Union
+import numpy as np
 import pandas as pd
 import config
+from influx_line_protocol import (dataframe_to_lines, point_to_line,
+                                  timestamps_to_ns, wire_precision)
+from influx_pool import get_pool, WriteStats
+from influx_batch_writer import BatchWriter, WriteReport
+from influx_spool import WriteSpool
+from influx_query import (build_select, build_last_point, build_last_points, build_aggregated,
+                          resolve_window, iter_chunk_frames, series_frames_to_rows)
+from influx_shard import split_time_range, split_by_counts, estimate_buckets, read_sharded
+from influx_cache import QueryCache, shared_cache, invalidate_caches
+from influx_catalog import SchemaCatalog, show_result
+from influx_follow import WatermarkStore, FollowCursor, watermark_store
+from influx_metrics import traced, span, current_span
 @dataclass
 class InfluxConfig:
     """Конфигурация подключения к InfluxDB"""
     db_name: str
     ip: str
     port: int
+    gzip: bool = False
+    time_precision: Dict[str, str] = field(default_factory=dict)
+    row_budget: Optional[int] = None
+    schema_ttl: float = 60.0
+    ssl: bool = False
         
 
 class InfluxDBManager:
     """Класс для управления операциями с InfluxDB"""
     
-    def __init__(self, config_data: Optional[Dict] = None):
+    def __init__(self, config_data: Optional[Dict] = None,
+                 pool_size: int = 10,
+                 timeout: Optional[float] = None,
+                 gzip: Optional[bool] = None):
+        """
+        Args:
+            config_data: Конфигурация подключения (по умолчанию config.INFLUX)
+            pool_size: Размер общего пула HTTP-соединений с сервером
+            timeout: Таймаут HTTP-запроса, с
+            gzip: Сжимать тела запросов записи (по умолчанию - gzip_ из конфигурации)
+        """
         self.config = self._load_config(config_data)
+        if gzip is not None:
+            self.config.gzip = gzip
+        # Пул общий для всех менеджеров и функций database.py с тем же сервером
+        self.pool = get_pool(self.config.ip, self.config.port,
+                             pool_size=pool_size, timeout=timeout, ssl=self.config.ssl)
         self.client = None
+        self.spool = None
+        self.cache = None
+        self.last_cache = None
+        # Схема баз: один запрос на базу, затем обновление по записям менеджера
+        self.catalog = SchemaCatalog(self.pool.query_results, ttl=self.config.schema_ttl)
         
-    def _load_config(self, config_data: Optional[Dict] = None) -> InfluxConfig:
+    @staticmethod
+    def _load_config(config_data: Optional[Dict] = None) -> InfluxConfig:
         """Загрузка конфигурации InfluxDB"""
         if config_data is None:
             config_data = config.INFLUX
@@ -27,22 +68,125 @@ class InfluxDBManager:
         return InfluxConfig(
             db_name=config_data['DB_name'],
             ip=config_data['IP_'],
-            port=config_data['port_']
+            port=config_data['port_'],
+            gzip=bool(config_data.get('gzip_', False)),
+            time_precision=dict(config_data.get('time_precision_') or {}),
+            row_budget=config_data.get('row_budget_'),
+            schema_ttl=config_data.get('schema_ttl_', 60.0),
+            ssl=bool(config_data.get('ssl_', False))
         )
     
     def connect(self, database: Optional[str] = None) -> None:
-        """Установка соединения с InfluxDB"""
+        """Получение клиента текущего потока из пула соединений"""
         db_name = database or self.config.db_name
-        self.client = DataFrameClient(
-            host=self.config.ip,
-            port=self.config.port,
-            database=db_name
-        )
+        self.client = self.pool.client()
+        self.client.switch_database(db_name)
     
     def disconnect(self) -> None:
-        """Закрытие соединения с InfluxDB"""
-        if self.client:
-            self.client.close()
+        """Освобождение клиента (соединения остаются в пуле)"""
+        self.client = None
+    
+    def close(self) -> None:
+        """
+        Закрытие журнала записи и сброс каталога схемы менеджера
+        
+        Пул соединений общий для всех менеджеров и функций database.py
+        с тем же сервером и остаётся открытым (закрывается close_pools).
+        """
+        self.client = None
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+        self.catalog.clear()
+    
+    def enable_spool(self, directory: str, **spool_options) -> WriteSpool:
+        """
+        Включение локального журнала записи
+        
+        Все записи менеджера сначала попадают в журнал на диске, фоновый
+        поток отправляет их на сервер по порядку, когда он доступен.
+        
+        Args:
+            directory: Каталог журнала
+            **spool_options: Параметры WriteSpool (segment_bytes, max_bytes,
+                fsync, fsync_interval, on_full, retry_interval)
+            
+        Returns:
+            WriteSpool: Журнал (backlog() - объём неотправленных данных)
+        """
+        self.spool = WriteSpool(directory, send=self._write, **spool_options).start()
+        return self.spool
+    
+    def enable_cache(self, max_bytes: int = 256 * 1024 * 1024,
+                     ttl: float = 60.0) -> QueryCache:
+        """
+        Включение кэша результатов read_data
+        
+        Кэш общий для процесса (им же пользуется read_DF_from_influxDB):
+        запись через любой менеджер или функции database сбрасывает
+        записи измерения.
+        
+        Args:
+            max_bytes: Лимит объёма DataFrame в кэше (вытеснение LRU)
+            ttl: Время жизни результатов для интервалов, захватывающих
+                текущий момент, с (закончившиеся интервалы хранятся без срока)
+            
+        Returns:
+            QueryCache: Кэш (stats - счётчики попаданий и промахов)
+        """
+        self.cache = shared_cache(max_bytes=max_bytes, ttl=ttl)
+        return self.cache
+    
+    def _send_payload(self, payload: bytes, database: str,
+                      precision: Optional[str] = None,
+                      retry: bool = False) -> bool:
+        """
+        Отправка тела запроса на сервер или в журнал, если он включен
+        
+        retry - повторы при сетевых сбоях при отправке на сервер (для
+        вызовов без собственных повторов; журнал повторяет отправку сам)
+        """
+        if self.spool is not None:
+            return self.spool.append(payload, database, precision)
+        return self._write(payload, database, precision, retry=retry)
+    
+    def _write(self, payload: bytes, database: str,
+               precision: Optional[str] = None,
+               retry: bool = False) -> bool:
+        """Отправка на сервер (и из журнала); кэши сбрасываются после отправки"""
+        try:
+            return self.pool.write(payload, database, precision, gzip=self.config.gzip,
+                                   retry=retry)
+        finally:
+            # после ответа сервера (и при ошибке - запись могла пройти частично):
+            # чтение между добавлением в журнал и отправкой не оставит в кэше
+            # данные без этой записи
+            invalidate_caches(database, payload=payload)
+            self.catalog.observe_payload(payload, database)
+    
+    @property
+    def write_stats(self) -> WriteStats:
+        """Объём записанных данных до и после сжатия (общий для пула соединений)"""
+        return self.pool.write_stats
+    
+    def set_time_precision(self, measurement: str, precision: Optional[str]) -> None:
+        """
+        Точность меток времени при записи в измерение
+        
+        Args:
+            measurement: Имя измерения
+            precision: h, m, s, ms, us или ns (None - по умолчанию, ns);
+                в запросе /write us передаётся как u
+        """
+        if precision is None:
+            self.config.time_precision.pop(measurement, None)
+            return
+        wire_precision(precision)
+        self.config.time_precision[measurement] = precision
+    
+    def time_precision(self, measurement: str) -> Optional[str]:
+        """Точность меток времени измерения (None - ns)"""
+        return self.config.time_precision.get(measurement)
     
     def __enter__(self):
         """Контекстный менеджер"""
@@ -53,6 +197,7 @@ class InfluxDBManager:
         """Контекстный менеджер"""
         self.disconnect()
     
+    @traced()
     def create_database(self, database: str) -> bool:
         """
         Создание новой базы данных
@@ -64,10 +209,7 @@ class InfluxDBManager:
             bool: Успешность операции
         """
         try:
-            client = InfluxDBClient(
-                host=self.config.ip,
-                port=self.config.port
-            )
+            client = self.pool.client()
             existing_dbs = client.get_list_database()
             
             if database not in [db['name'] for db in existing_dbs]:
@@ -79,11 +221,11 @@ class InfluxDBManager:
                 return False
                 
         except Exception as e:
+            current_span().fail(e)
             print(f"Ошибка при создании БД: {e}")
             return False
-        finally:
-            client.close()
     
+    @traced()
     def drop_measurement(self, measurement: str, database: Optional[str] = None) -> bool:
         """
         Удаление измерения
@@ -97,18 +239,15 @@ class InfluxDBManager:
         """
         try:
             db_name = database or self.config.db_name
-            client = InfluxDBClient(
-                host=self.config.ip,
-                port=self.config.port,
-                database=db_name
-            )
-            client.drop_measurement(measurement)
+            self.pool.query(f"DROP MEASUREMENT {quote_ident(measurement)}",
+                            database=db_name, method='POST')
+            invalidate_caches(db_name, measurement)
+            self.catalog.forget(measurement, db_name)
             return True
         except Exception as e:
+            current_span().fail(e)
             print(f"Ошибка при удалении измерения: {e}")
             return False
-        finally:
-            client.close()
 
 
 
@@ -127,13 +266,138 @@ class InfluxDataPoint:
             "fields": self.fields,
             "time": self.timestamp or datetime.utcnow()
         }
+    
+    def to_line_protocol(self, precision: str = 'ns') -> Optional[str]:
+        return point_to_line(self.measurement, self.fields, self.tags,
+                             self.timestamp, precision)
+
+def _tag_column(values) -> pd.Categorical:
+    """Тег как словарный столбец: коды + общие (интернированные) строки значений"""
+    values = pd.Series(values, dtype=object)
+    present = values.notna()
+    values[present] = values[present].map(str)
+    column = pd.Categorical(values)
+    return column.rename_categories([sys.intern(c) for c in column.categories])
+
+
+def _field_array(values):
+    """
+    Столбец поля с типом его значений: float64 (NaN - пропуск) либо
+    массив pandas с маской пропусков (Int64, boolean, string)
+    """
+    if isinstance(values, np.ndarray) and values.dtype.kind == 'f':
+        return values.astype(np.float64, copy=False)
+    array = pd.array(values)
+    if pd.api.types.is_float_dtype(array.dtype):
+        return array.to_numpy(dtype=np.float64, na_value=np.nan)
+    return array
+
+
+def _field_values(column) -> List[Any]:
+    """Значения столбца поля как скаляры Python (None - пропуск)"""
+    if isinstance(column, np.ndarray):
+        return [None if v != v else v for v in column.tolist()]
+    return column.to_numpy(dtype=object, na_value=None).tolist()
+
 
-@dataclass
 class InfluxBatch:
-    points: List[InfluxDataPoint]
+    """
+    Столбцовая пачка точек одного измерения
+    
+    Вместо списка InfluxDataPoint со словарями на каждую точку хранит
+    массив меток времени int64 (нс UTC), по массиву на каждое поле с типом
+    его значений (целые поля пишутся как целые) и словарные столбцы тегов.
+    
+    InfluxBatch(points) - пачка из списка точек, как и прежде; готовые
+    столбцы передаются именованными аргументами.
+    """
+    
+    def __init__(self, points: Optional[List[InfluxDataPoint]] = None, *,
+                 measurement: str = '',
+                 time: Optional[np.ndarray] = None,
+                 fields: Optional[Dict[str, Any]] = None,
+                 tags: Optional[Dict[str, pd.Categorical]] = None):
+        """
+        Args:
+            points: Точки одного измерения
+            measurement: Имя измерения (без points)
+            time: Метки времени, нс UTC (без points)
+            fields: Поле -> значения (массив или список, None - пропуск)
+            tags: Тег -> словарный столбец (см. _tag_column)
+        """
+        if points is not None:
+            measurement, time, fields, tags = self._columns(points)
+        self.measurement = measurement
+        self.time = np.asarray([] if time is None else time, dtype=np.int64)
+        self.fields = {str(k): _field_array(v) for k, v in (fields or {}).items()}
+        self.tags = dict(tags or {})
+    
+    def __len__(self) -> int:
+        return len(self.time)
+    
+    @staticmethod
+    def _columns(points: List[InfluxDataPoint]):
+        """Столбцы пачки из списка точек одного измерения"""
+        points = list(points)
+        measurements = {point.measurement for point in points}
+        if len(measurements) > 1:
+            raise ValueError(f"Точки разных измерений в одной пачке: {sorted(measurements)}")
+        now = time.time_ns()
+        timestamps = np.array([now if p.timestamp is None else
+                               int(p.timestamp) if isinstance(p.timestamp, (int, np.integer)) else
+                               pd.Timestamp(p.timestamp).value for p in points], dtype=np.int64)
+        field_names = list(dict.fromkeys(k for p in points for k in p.fields))
+        fields = {k: [p.fields.get(k) for p in points] for k in field_names}
+        tag_keys = list(dict.fromkeys(k for p in points for k in p.tags))
+        tags = {k: _tag_column([p.tags.get(k) for p in points]) for k in tag_keys}
+        return (measurements.pop() if measurements else ''), timestamps, fields, tags
+    
+    @classmethod
+    def from_points(cls, points: List[InfluxDataPoint]) -> 'InfluxBatch':
+        """Пачка из списка точек одного измерения"""
+        return cls(points)
+    
+    @property
+    def field_names(self) -> List[str]:
+        return list(self.fields)
+    
+    @property
+    def points(self) -> List[InfluxDataPoint]:
+        """Совместимость: пачка в виде списка точек"""
+        return self.to_points()
+    
+    def to_points(self) -> List[InfluxDataPoint]:
+        """Пачка в виде списка InfluxDataPoint"""
+        field_values = {k: _field_values(column) for k, column in self.fields.items()}
+        tag_values = {k: column.astype(object) for k, column in self.tags.items()}
+        points = []
+        for i in range(len(self)):
+            points.append(InfluxDataPoint(
+                measurement=self.measurement,
+                fields={k: values[i] for k, values in field_values.items() if values[i] is not None},
+                tags={k: column[i] for k, column in tag_values.items() if not pd.isna(column[i])},
+                timestamp=pd.Timestamp(int(self.time[i]))
+            ))
+        return points
     
     def to_influx_format(self) -> List[Dict[str, Any]]:
-        return [point.to_influx_format() for point in self.points]
+        return [point.to_influx_format() for point in self.to_points()]
+    
+    def to_dataframe(self) -> pd.DataFrame:
+        """DataFrame с индексом времени UTC, столбцами полей и тегов"""
+        df = pd.DataFrame(self.fields, columns=self.field_names,
+                          index=pd.DatetimeIndex(self.time.view('datetime64[ns]')))
+        for key, column in self.tags.items():
+            df[key] = column
+        return df
+    
+    def to_lines(self, precision: str = 'ns') -> List[str]:
+        """Строки line protocol (теги кодируются по словарю значений)"""
+        return dataframe_to_lines(self.to_dataframe(), self.measurement,
+                                  tag_columns=list(self.tags),
+                                  field_columns=self.field_names,
+                                  precision=precision,
+                                  skip_missing_tags=True)
     
 
 class InfluxDataBuilder:
@@ -142,6 +406,10 @@ class InfluxDataBuilder:
         self.fields = {}
         self.tags = {}
         self.timestamp = None
+        # столбцы точек, добавленных через append() (для build_batch)
+        self._time = []
+        self._field_columns = {}
+        self._tag_columns = {}
     
     def with_field(self, name: str, value: float) -> 'InfluxDataBuilder':
         self.fields[name] = value
@@ -161,7 +429,32 @@ class InfluxDataBuilder:
             fields=self.fields,
             tags=self.tags,
             timestamp=self.timestamp
-        )            
+        )
+    
+    def append(self) -> 'InfluxDataBuilder':
+        """Добавление текущей точки в столбцы пачки и сброс полей, тегов и времени"""
+        n = len(self._time)
+        self._time.append(time.time_ns() if self.timestamp is None
+                          else pd.Timestamp(self.timestamp).value)
+        for name in self.fields.keys() - self._field_columns.keys():
+            self._field_columns[name] = [None] * n
+        for name, column in self._field_columns.items():
+            column.append(self.fields.get(name))
+        for name in self.tags.keys() - self._tag_columns.keys():
+            self._tag_columns[name] = [None] * n
+        for name, column in self._tag_columns.items():
+            column.append(self.tags.get(name))
+        self.fields, self.tags, self.timestamp = {}, {}, None
+        return self
+    
+    def build_batch(self) -> InfluxBatch:
+        """Столбцовая пачка из точек, добавленных через append()"""
+        return InfluxBatch(
+            measurement=self.measurement,
+            time=np.array(self._time, dtype=np.int64),
+            fields=self._field_columns,
+            tags={k: _tag_column(v) for k, v in self._tag_columns.items()}
+        )
 
 class BaseTags:
     FLEET: str = "fleet"
@@ -200,34 +493,124 @@ class TagPreset:
         
 class EnhancedInfluxDBManager(InfluxDBManager):
     
-    def write_points(self, points: List[InfluxDataPoint], 
+    @traced()
+    def write_points(self, points: Union[List[InfluxDataPoint], InfluxBatch], 
                     database: Optional[str] = None) -> bool:
-        """Запись списка точек данных"""
+        """Запись списка точек данных (пачками, см. write_points_batched)"""
         try:
-            db_name = database or self.config.db_name
-            client = InfluxDBClient(
-                host=self.config.ip,
-                port=self.config.port,
-                database=db_name
-            )
-            
-            influx_data = [point.to_influx_format() for point in points]
-            success = client.write_points(influx_data)
-            return success
+            report = self.write_points_batched(points, database)
+            self._print_write_errors(report)
+            return report.success
             
         except Exception as e:
+            current_span().fail(e)
             print(f"Ошибка при записи точек: {e}")
             return False
-        #finally:
-        #    client.close()
     
+    @traced()
+    def write_points_batched(self, points: Union[List[InfluxDataPoint], InfluxBatch],
+                             database: Optional[str] = None,
+                             **batch_options) -> WriteReport:
+        """
+        Параллельная запись точек пачками с повторами
+        
+        Args:
+            points: Точки данных или столбцовая пачка InfluxBatch
+            database: Имя базы данных
+            **batch_options: Параметры write_lines_batched
+                (chunk_size, chunk_bytes, workers, queue_size, retries, backoff)
+            
+        Returns:
+            WriteReport: Записанные и незаписанные точки по пачкам
+        """
+        if isinstance(points, InfluxBatch):
+            precision = self.time_precision(points.measurement)
+            return self.write_lines_batched(points.to_lines(precision or 'ns'), database,
+                                            precision=precision, **batch_options)
+        if not self.config.time_precision:
+            lines = (point.to_line_protocol() for point in points)
+            return self.write_lines_batched((line for line in lines if line),
+                                            database, **batch_options)
+        chunks = []
+        for precision, lines in self._points_lines(points, self.config.time_precision).items():
+            report = self.write_lines_batched(lines, database, precision=precision,
+                                              **batch_options)
+            chunks.extend(report.chunks)
+        return WriteReport(chunks)
+    
+    @staticmethod
+    def _points_lines(points: List[InfluxDataPoint],
+                      time_precision: Dict[str, str]) -> Dict[Optional[str], List[str]]:
+        """Строки line protocol точек, сгруппированные по точности времени измерений"""
+        groups = {}
+        for point in points:
+            precision = time_precision.get(point.measurement)
+            line = point.to_line_protocol(precision or 'ns')
+            if line:
+                groups.setdefault(precision, []).append(line)
+        return groups
+    
+    @traced()
+    def write_lines_batched(self, lines,
+                            database: Optional[str] = None,
+                            precision: Optional[str] = None,
+                            chunk_size: Optional[int] = 5000,
+                            chunk_bytes: Optional[int] = None,
+                            workers: int = 4,
+                            queue_size: Optional[int] = None,
+                            retries: int = 3,
+                            backoff: float = 0.5) -> WriteReport:
+        """
+        Параллельная запись строк line protocol пачками
+        
+        Args:
+            lines: Строки line protocol
+            database: Имя базы данных
+            precision: Точность меток времени в строках (ns, us, ms, s)
+            chunk_size: Максимум точек в одном запросе
+            chunk_bytes: Максимальный размер запроса в байтах
+            workers: Число параллельных потоков отправки - из общего пула
+                потоков пула соединений, не больше его pool_size (при
+                включенном журнале - один поток, пачки попадают в журнал
+                по порядку)
+            queue_size: Ёмкость очереди пачек (backpressure)
+            retries: Число повторов неудачной пачки
+            backoff: Начальная задержка перед повтором, с
+            
+        Returns:
+            WriteReport: Отчёт по пачкам
+        """
+        db_name = database or self.config.db_name
+        if self.spool is not None:
+            # в журнал пачки дописываются одним потоком, в порядке строк
+            workers = 1
+        writer = BatchWriter(
+            send=lambda payload: self._send_payload(payload, db_name, precision),
+            chunk_points=chunk_size,
+            chunk_bytes=chunk_bytes,
+            workers=min(workers, self.pool.pool_size),
+            queue_size=queue_size,
+            retries=retries,
+            backoff=backoff,
+            executor=self.pool.executor()
+        )
+        return writer.write_lines(lines)
+    
+    @staticmethod
+    def _print_write_errors(report: WriteReport) -> None:
+        for chunk in report.failed_chunks:
+            print(f"Ошибка при записи пачки {chunk.index} "
+                  f"({chunk.points} точек, попыток {chunk.attempts}): {chunk.error}")
+    
+    @traced()
     def write_dataframe_enhanced(self, dataframe: pd.DataFrame, 
                                measurement: str,
                                tag_columns: List[str] = None,
                                field_columns: List[str] = None,
                                timestamp_column: str = None,
                                additional_tags: Dict[str, str] = None,
-                               database: Optional[str] = None) -> bool:
+                               database: Optional[str] = None,
+                               vectorized: bool = True) -> bool:
         """
         Улучшенная запись DataFrame с автоматическим определением структуры
         
@@ -238,7 +621,14 @@ class EnhancedInfluxDBManager(InfluxDBManager):
             field_columns: Столбцы, которые следует использовать как поля
             timestamp_column: Столбец с временными метками
             database: Имя базы данных
+            vectorized: Кодировать DataFrame в line protocol по столбцам
+                (False - построчный путь через InfluxDataPoint)
         """
+        if vectorized:
+            return self._write_dataframe_vectorized(
+                dataframe, measurement, tag_columns, field_columns,
+                timestamp_column, additional_tags, database)
+        
         if additional_tags is not None:
             for add_tag in additional_tags.keys():
                 #print('add_tag:',add_tag,'=',additional_tags[add_tag])
@@ -285,6 +675,83 @@ class EnhancedInfluxDBManager(InfluxDBManager):
         
         return self.write_points(points, database)
     
+    def _write_dataframe_vectorized(self, dataframe: pd.DataFrame,
+                                    measurement: str,
+                                    tag_columns: List[str] = None,
+                                    field_columns: List[str] = None,
+                                    timestamp_column: str = None,
+                                    additional_tags: Dict[str, str] = None,
+                                    database: Optional[str] = None) -> bool:
+        """Запись DataFrame через векторизованный кодировщик line protocol"""
+        precision = self.time_precision(measurement)
+        try:
+            lines = self._dataframe_lines(dataframe, measurement, tag_columns,
+                                          field_columns, timestamp_column,
+                                          additional_tags, precision or 'ns')
+        except Exception as e:
+            current_span().fail(e)
+            print(f"Ошибка при кодировании DataFrame: {e}")
+            return False
+        
+        report = self.write_lines_batched(lines, database, precision=precision)
+        self._print_write_errors(report)
+        return report.success
+    
+    @staticmethod
+    def _dataframe_lines(dataframe: pd.DataFrame,
+                         measurement: str,
+                         tag_columns: List[str] = None,
+                         field_columns: List[str] = None,
+                         timestamp_column: str = None,
+                         additional_tags: Dict[str, str] = None,
+                         precision: str = 'ns') -> List[str]:
+        """Строки line protocol для DataFrame по правилам write_dataframe_enhanced"""
+        additional_tags = {k: str(v) for k, v in (additional_tags or {}).items()}
+        
+        if field_columns is None:
+            field_columns = dataframe.select_dtypes(include=['number']).columns.tolist()
+            
+        if tag_columns is None:
+            tag_columns = list(set(dataframe.keys()) - set(field_columns)
+                               - set(['TimeWrite2DB', timestamp_column]))
+        
+        return dataframe_to_lines(
+            dataframe, measurement,
+            tag_columns=tag_columns,
+            field_columns=field_columns,
+            timestamp_column=timestamp_column,
+            global_tags=additional_tags,
+            precision=precision,
+            fields_as_float=True
+        )
+    
+    @traced()
+    def write_lines(self, payload: bytes,
+                    database: Optional[str] = None,
+                    precision: Optional[str] = None) -> bool:
+        """
+        Запись готового тела запроса в формате line protocol
+        
+        Args:
+            payload: Строки line protocol в кодировке utf-8
+            database: Имя базы данных
+            precision: Точность меток времени в payload (ns, us, ms, s)
+            
+        Returns:
+            bool: Успешность операции
+        """
+        if not payload:
+            return True
+        try:
+            db_name = database or self.config.db_name
+            return self._send_payload(payload, db_name, precision, retry=True)
+            
+        except Exception as e:
+            current_span().fail(e)
+            print(f"Ошибка при записи точек: {e}")
+            return False
+    
+    @traced()
     def write_with_preset(self, dataframe: pd.DataFrame, 
                          measurement: str,
                          preset_name: str = "custom",
@@ -310,13 +777,89 @@ class EnhancedInfluxDBManager(InfluxDBManager):
             additional_tags=tags,
             field_columns=field_columns
         )
+    
+    @traced()
+    def write_measurements(self, data: Dict[str, Union[pd.DataFrame, List[InfluxDataPoint], InfluxBatch]],
+                           presets: Optional[Dict[str, Union[str, Dict[str, str]]]] = None,
+                           database: Optional[str] = None,
+                           **batch_options) -> bool:
+        """
+        Запись нескольких измерений общими пачками
+        
+        Строки всех измерений кодируются в один поток и режутся на
+        запросы ограниченного размера, поэтому цикл расчёта с десятком
+        таблиц результатов обходится несколькими запросами вместо десятков.
+        Измерения с разной точностью времени пишутся разными запросами;
+        точность определяется по измерению, в которое пишутся строки
+        (для InfluxBatch и точек - их measurement, а не ключ data).
+        
+        Args:
+            data: Имя измерения -> DataFrame, список точек или InfluxBatch
+            presets: Имя измерения -> теги для DataFrame: словарь тегов или
+                имя предустановки ("basic"); как в write_with_preset, поля -
+                числовые столбцы, не совпадающие с тегами. Неизвестное имя
+                предустановки - ValueError
+            database: Имя базы данных
+            **batch_options: Параметры write_lines_batched
+                (chunk_size, chunk_bytes, workers, queue_size, retries, backoff)
+            
+        Returns:
+            bool: Успешность операции
+        """
+        presets = dict(presets or {})
+        for measurement, tags in presets.items():
+            if isinstance(tags, str):
+                if tags != 'basic':
+                    raise ValueError(f"Неизвестная предустановка тегов {tags!r} "
+                                     f"для измерения {measurement}")
+                presets[measurement] = TagPreset.basic_preset()
+        groups = {}
+        try:
+            for measurement, item in data.items():
+                if isinstance(item, pd.DataFrame):
+                    precision = self.time_precision(measurement)
+                    tags = presets.get(measurement) or {}
+                    field_columns = [col for col in item.columns
+                                     if col not in tags and pd.api.types.is_numeric_dtype(item[col])]
+                    lines = self._dataframe_lines(item, measurement,
+                                                  field_columns=field_columns,
+                                                  additional_tags=tags,
+                                                  precision=precision or 'ns')
+                    groups.setdefault(precision, []).extend(lines)
+                elif isinstance(item, InfluxBatch):
+                    precision = self.time_precision(item.measurement)
+                    groups.setdefault(precision, []).extend(item.to_lines(precision or 'ns'))
+                else:
+                    for precision, lines in self._points_lines(item, self.config.time_precision).items():
+                        groups.setdefault(precision, []).extend(lines)
+        except Exception as e:
+            current_span().fail(e)
+            print(f"Ошибка при кодировании данных: {e}")
+            return False
+        
+        chunks = []
+        for precision, lines in groups.items():
+            report = self.write_lines_batched(lines, database, precision=precision,
+                                              **batch_options)
+            chunks.extend(report.chunks)
+        report = WriteReport(chunks)
+        self._print_write_errors(report)
+        return report.success
+    
+    @traced()
     def read_data(self, measurement: str, 
                  start_time: Optional[str] = None,
                  end_time: Optional[str] = None,
                  fields: Optional[List[str]] = None,
                  tags: Optional[Dict[str, str]] = None,
                  database: Optional[str] = None,
-                 time_zone: str = 'Etc/GMT-3') -> pd.DataFrame:
+                 time_zone: str = 'Etc/GMT-3',
+                 chunked: bool = False,
+                 chunk_size: int = 10000,
+                 shards: Optional[int] = None,
+                 shard_window: Optional[str] = None,
+                 shard_points: Optional[int] = None,
+                 workers: Optional[int] = None) -> pd.DataFrame:
         """
         Чтение данных из InfluxDB с фильтрацией
         
@@ -328,9 +871,18 @@ class EnhancedInfluxDBManager(InfluxDBManager):
             tags: Фильтры по тегам
             database: Имя базы данных
             time_zone: Часовой пояс
+            chunked: Потоковое чтение - вместо DataFrame возвращается
+                генератор DataFrame по chunk_size строк (ошибка чтения
+                выбрасывается из генератора)
+            chunk_size: Число строк во фрагменте ответа
+            shards: Разбить интервал на shards окон и читать их параллельно
+            shard_window: Длительность окна ('1D', '6h'); важнее shards
+            shard_points: Окна примерно по shard_points точек (по оценке count)
+            workers: Число параллельных запросов (по умолчанию - размер пула)
             
         Returns:
             pd.DataFrame: Данные из InfluxDB
+                (при chunked=True - Iterator[pd.DataFrame])
         """
         if start_time is None:
             print('start_time: None')
@@ -339,33 +891,36 @@ class EnhancedInfluxDBManager(InfluxDBManager):
             end_time = pd.Timestamp(end_time) if end_time else pd.Timestamp(start_time)
         
         db_name = database or self.config.db_name
-        self.connect(db_name)
-        
+        query = build_select(measurement, start_time, end_time,
+                             fields, tags, time_zone)
+        if chunked:
+            return self._read_chunks(query, measurement, db_name,
+                                     time_zone, chunk_size)
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.key(db_name, measurement, fields, tags,
+                                       start_time, end_time, time_zone,
+                                       server=(self.config.ip, int(self.config.port)))
+            df = self.cache.get(cache_key)
+            if df is not None:
+                return df
+            generation = self.cache.generation
+        if start_time is not None and (shards or shard_window or shard_points):
+            df = self._read_sharded(measurement, start_time, end_time, fields, tags,
+                                    db_name, time_zone, shards, shard_window,
+                                    shard_points, workers)
+        else:
+            df = self._read_query(query, measurement, db_name, time_zone)
+        if cache_key is not None and not df.empty:
+            self.cache.put(cache_key, df, end_time, generation, time_zone)
+        return df
+    
+    def _read_query(self, query: str, measurement: str, db_name: str,
+                    time_zone: Optional[str]) -> pd.DataFrame:
+        """Чтение измерения одним запросом"""
         try:
-            # Формирование условия для тегов
-            tags_condition = ''
-            if tags:
-                tags_conditions = [f"{k}='{str(v)}'" for k, v in tags.items()]
-                tags_condition = ' AND '.join(tags_conditions) + ' AND '
-            
-            # Формирование списка полей
-            fields_select = '*' if not fields else ', '.join(fields)
-            
-            if start_time is None:
-                query = f"""
-                    SELECT {fields_select} FROM {measurement}                     
-                """            
-            else:
-                query = f"""
-                    SELECT {fields_select} FROM {measurement} 
-                    WHERE {tags_condition}time >= '{start_time}' AND time <= '{end_time}'
-                """
-            
-            if time_zone:
-                query += f" tz('{time_zone}')"
-            
             #print(f"БД:{db_name}. Выполняем запрос: {query}")
-            result = self.client.query(query)
+            result = self.pool.query_frames(query, db_name)
             
             if measurement in result:
                 df = result[measurement]
@@ -377,11 +932,59 @@ class EnhancedInfluxDBManager(InfluxDBManager):
                 return pd.DataFrame()
                 
         except Exception as e:
+            current_span().fail(e)
             print(f"Ошибка при чтении из InfluxDB: {e}")
             return pd.DataFrame()
-        finally:
-            self.disconnect()
     
+    @traced('read_data_chunked')
+    def _read_chunks(self, query: str, measurement: str, database: str,
+                     time_zone: Optional[str], chunk_size: int):
+        """
+        Генератор DataFrame по фрагментам chunked-ответа
+        
+        Ошибка чтения пробрасывается потребителю: иначе оборванный поток
+        нельзя было бы отличить от полностью прочитанного.
+        """
+        try:
+            results = self.pool.query_chunked(query, database, chunk_size)
+            yield from iter_chunk_frames(results, measurement, time_zone)
+        except Exception as e:
+            current_span().fail(e)
+            print(f"Ошибка при потоковом чтении из InfluxDB: {e}")
+            raise
+    
+    def _read_sharded(self, measurement: str, start_time, end_time,
+                      fields: Optional[List[str]], tags: Optional[Dict[str, str]],
+                      database: str, time_zone: Optional[str],
+                      shards: Optional[int], shard_window: Optional[str],
+                      shard_points: Optional[int], workers: Optional[int]) -> pd.DataFrame:
+        """Параллельное чтение интервала по временным окнам"""
+        def frame(query):
+            return self.pool.query_frames(query, database, dropna=False).get(measurement)
+        
+        def fetch(start, end, end_inclusive):
+            return frame(build_select(measurement, start, end, fields, tags,
+                                      time_zone, end_inclusive=end_inclusive))
+        
+        try:
+            if shard_points:
+                buckets = estimate_buckets(frame, measurement, start_time, end_time, tags)
+                windows = split_by_counts(start_time, end_time, buckets, shard_points)
+            else:
+                windows = split_time_range(start_time, end_time, shards, shard_window)
+            df = read_sharded(fetch, windows, workers or self.pool.pool_size)
+            if df is None:
+                print('Результат запроса - пустая таблица')
+                return pd.DataFrame()
+            if time_zone:
+                df = df.tz_convert(time_zone)
+            return df
+        except Exception as e:
+            current_span().fail(e)
+            print(f"Ошибка при чтении из InfluxDB: {e}")
+            return pd.DataFrame()
+    
+    @traced()
     def read_last_point(self, measurement: str,
                        tags: Optional[Dict[str, str]] = None,
                        database: Optional[str] = None) -> pd.DataFrame:
@@ -397,22 +1000,11 @@ class EnhancedInfluxDBManager(InfluxDBManager):
             pd.DataFrame: Последняя точка данных
         """
         db_name = database or self.config.db_name
-        self.connect(db_name)
         
         try:
-            tags_condition = ''
-            if tags:
-                tags_conditions = [f"{k}='{str(v)}'" for k, v in tags.items()]
-                tags_condition = ' AND '.join(tags_conditions) + ' AND '
+            query = build_last_point(measurement, tags)
             
-            query = f"""
-                SELECT * FROM {measurement} 
-                WHERE {tags_condition}time > now() - 1d
-                ORDER BY time DESC 
-                LIMIT 1
-            """
-            
-            result = self.client.query(query)
+            result = self.pool.query_frames(query, db_name)
             
             if measurement in result:
                 return result[measurement]
@@ -420,19 +1012,137 @@ class EnhancedInfluxDBManager(InfluxDBManager):
                 return pd.DataFrame()
                 
         except Exception as e:
+            current_span().fail(e)
             print(f"Ошибка при чтении последней точки: {e}")
             return pd.DataFrame()
-        finally:
-            self.disconnect()
     
+    @traced()
+    def read_last_points(self, measurement: str,
+                         tag_filters: Optional[List[Dict[str, str]]] = None,
+                         group_by: Optional[Union[str, List[str]]] = None,
+                         tags: Optional[Dict[str, str]] = None,
+                         database: Optional[str] = None,
+                         lookback: str = '1d',
+                         cache_ttl: Optional[float] = None) -> pd.DataFrame:
+        """
+        Чтение последней точки многих серий одним запросом GROUP BY
+        
+        Args:
+            measurement: Имя измерения
+            tag_filters: Список наборов тегов серий, например
+                [{'equipment': 'T1'}, {'equipment': 'T2'}]
+            group_by: Тег (или список тегов) группировки серий;
+                по умолчанию - ключи tag_filters
+            tags: Общий фильтр по тегам
+            database: Имя базы данных
+            lookback: Глубина поиска от текущего момента
+            cache_ttl: Хранить результат в кэше последних значений
+                cache_ttl секунд (запись в измерение сбрасывает кэш)
+            
+        Returns:
+            pd.DataFrame: По строке на серию: теги группировки и поля,
+                индекс - время последней точки
+        """
+        db_name = database or self.config.db_name
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        cache_key = None
+        if cache_ttl:
+            if self.last_cache is None:
+                self.last_cache = QueryCache(max_bytes=64 * 1024 * 1024, ttl=cache_ttl)
+            cache_key = (None, db_name, measurement,
+                         tuple(tuple(sorted((k, str(v)) for k, v in f.items()))
+                               for f in tag_filters or [] if f),
+                         tuple(group_by or ()),
+                         tuple(sorted((k, str(v)) for k, v in (tags or {}).items())),
+                         lookback)
+            df = self.last_cache.get(cache_key)
+            if df is not None:
+                return df
+            generation = self.last_cache.generation
+        
+        try:
+            query = build_last_points(measurement, tag_filters, group_by, tags, lookback)
+            df = series_frames_to_rows(self.pool.query_frames(query, db_name), measurement)
+        except Exception as e:
+            current_span().fail(e)
+            print(f"Ошибка при чтении последних точек: {e}")
+            return pd.DataFrame()
+        if cache_key is not None:
+            self.last_cache.put(cache_key, df, None, generation, ttl=cache_ttl)
+        return df
+    
+    def follow(self, measurement: str,
+               tags: Optional[Dict[str, str]] = None,
+               fields: Optional[List[str]] = None,
+               database: Optional[str] = None,
+               poll_interval: float = 5.0,
+               since=None,
+               watermarks: Optional[Union[str, WatermarkStore]] = None,
+               time_zone: Optional[str] = 'Etc/GMT-3',
+               batch_size: int = 10000,
+               stop=None):
+        """
+        Генератор новых точек измерения (follow/tail)
+        
+        Каждый опрос читает только точки новее отметки - времени последней
+        выданной точки для пары (измерение, теги). Отметка сдвигается,
+        когда потребитель запрашивает следующий DataFrame.
+        
+        Args:
+            measurement: Имя измерения
+            tags: Фильтры по тегам (входят в ключ отметки)
+            fields: Список полей
+            database: Имя базы данных
+            poll_interval: Пауза между опросами без новых данных, с
+            since: Начальная отметка, если сохранённой нет (по умолчанию - текущий момент)
+            watermarks: Файл отметок или WatermarkStore: перезапущенный
+                потребитель продолжит с сохранённой отметки
+            time_zone: Временная зона индекса
+            batch_size: Максимум точек в одном DataFrame; при полном ответе
+                следующий опрос выполняется без паузы
+            stop: threading.Event для остановки генератора
+            
+        Yields:
+            pd.DataFrame: Новые точки в порядке времени
+        """
+        db_name = database or self.config.db_name
+        store = watermark_store(watermarks)
+        cursor = FollowCursor(store, store.key(db_name, measurement, tags), since, batch_size)
+        
+        while stop is None or not stop.is_set():
+            more = False
+            with span('follow', measurement):
+                try:
+                    query = cursor.query(measurement, fields, tags)
+                    df, more = cursor.accept(self.pool.query_frames(query, db_name).get(measurement))
+                except Exception as e:
+                    current_span().fail(e)
+                    print(f"Ошибка при чтении новых точек: {e}")
+                    df = None
+            
+            if df is not None:
+                yield df.tz_convert(time_zone) if time_zone else df
+            cursor.commit()
+            if more:
+                continue
+            if stop is not None:
+                stop.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+    
+    @traced()
     def read_aggregated_data(self, measurement: str,
                            start_time: str,
                            end_time: str,
-                           aggregation: str = 'mean',
+                           aggregation: Union[str, List[str]] = 'mean',
                            window: str = '1h',
                            fields: Optional[List[str]] = None,
                            tags: Optional[Dict[str, str]] = None,
-                           database: Optional[str] = None) -> pd.DataFrame:
+                           database: Optional[str] = None,
+                           max_points: Optional[int] = None,
+                           row_budget: Optional[int] = None,
+                           on_budget: str = 'coarsen') -> pd.DataFrame:
         """
         Чтение агрегированных данных
         
@@ -440,11 +1150,18 @@ class EnhancedInfluxDBManager(InfluxDBManager):
             measurement: Имя измерения
             start_time: Начальное время
             end_time: Конечное время
-            aggregation: Тип агрегации (mean, sum, count, max, min)
+            aggregation: Тип агрегации (mean, sum, count, max, min) или их список;
+                несколько агрегатов и полей читаются одним запросом,
+                столбцы - <агрегат>_<поле>
             window: Окно агрегации (1h, 30m, 1d)
             fields: Поля для агрегации
             tags: Фильтры по тегам
             database: Имя базы данных
+            max_points: Целевое число точек: окно выбирается по интервалу
+                вместо window
+            row_budget: Лимит строк результата (по умолчанию row_budget_ из конфигурации)
+            on_budget: При превышении лимита: coarsen - укрупнить окно,
+                refuse - не выполнять запрос
             
         Returns:
             pd.DataFrame: Агрегированные данные
@@ -453,25 +1170,15 @@ class EnhancedInfluxDBManager(InfluxDBManager):
         end_time = pd.Timestamp(end_time)
         
         db_name = database or self.config.db_name
-        self.connect(db_name)
         
         try:
-            tags_condition = ''
-            if tags:
-                tags_conditions = [f"{k}='{str(v)}'" for k, v in tags.items()]
-                tags_condition = ' AND '.join(tags_conditions) + ' AND '
-            
-            fields_select = '*' if not fields else ', '.join(fields)
-            
-            query = f"""
-                SELECT {aggregation}({fields_select}) 
-                FROM {measurement} 
-                WHERE {tags_condition}time >= '{start_time}' AND time <= '{end_time}'
-                GROUP BY time({window})
-            """
+            window = resolve_window(start_time, end_time, window, max_points,
+                                    row_budget or self.config.row_budget, on_budget)
+            query = build_aggregated(measurement, start_time, end_time,
+                                     aggregation, window, fields, tags)
             
             #print(f"Выполняем агрегирующий запрос: {query}")
-            result = self.client.query(query)
+            result = self.pool.query_frames(query, db_name)
             
             if measurement in result:
                 return result[measurement]
@@ -479,62 +1186,67 @@ class EnhancedInfluxDBManager(InfluxDBManager):
                 return pd.DataFrame()
                 
         except Exception as e:
+            current_span().fail(e)
             print(f"Ошибка при чтении агрегированных данных: {e}")
             return pd.DataFrame()
-        finally:
-            self.disconnect()
+    @traced()
     def get_measurement_info(self, measurement: str,
                            database: Optional[str] = None) -> Dict[str, Any]:
         """
         Получение информации об измерении
         
+        Ключи и значения тегов, поля и время первой/последней точки берутся
+        из каталога (self.catalog); при промахе они читаются одним запросом
+        с FROM измерение.
+        
         Args:
             measurement: Имя измерения
             database: Имя базы данных
             
         Returns:
-            Dict: Информация об измерении
+            Dict: Информация об измерении:
+                tag_keys, field_keys - ResultSet, как у SHOW TAG KEYS / SHOW FIELD KEYS,
+                first_time, last_time - время первой и последней точки,
+                tag_values - {тег: значения}, field_types - {поле: тип}
+                (прежнего ключа time_range с SELECT FIRST(*), LAST(*) нет:
+                запрос сканировал все серии; время - first_time, last_time)
         """
         db_name = database or self.config.db_name
-        self.connect(db_name)
         
         try:
-            # Получение временного диапазона
-            time_range_query = f"""
-                SELECT FIRST(*), LAST(*) FROM {measurement}
-            """
-            
-            # Получение уникальных тегов
-            tag_keys_query = f"""
-                SHOW TAG KEYS FROM {measurement}
-            """
-            
-            # Получение уникальных полей
-            field_keys_query = f"""
-                SHOW FIELD KEYS FROM {measurement}
-            """
+            schema = self.catalog.schema(measurement, db_name, time_range=True)
+            if schema is None:
+                print(f"Измерение {measurement} не найдено")
+                return {}
             
             result = {
                 'measurement': measurement,
-                'time_range': self.client.query(time_range_query),
-                'tag_keys': self.client.query(tag_keys_query),
-                'field_keys': self.client.query(field_keys_query)
+                'tag_keys': show_result(measurement, ['tagKey'],
+                                        [[k] for k in schema.tag_keys]),
+                'field_keys': show_result(measurement, ['fieldKey', 'fieldType'],
+                                          [[k, t] for k, t in schema.field_keys.items()]),
+                'first_time': schema.first,
+                'last_time': schema.last,
+                'tag_values': {k: list(v) for k, v in schema.tag_values.items()},
+                'field_types': dict(schema.field_keys)
             }
             
             return result
             
         except Exception as e:
+            current_span().fail(e)
             print(f"Ошибка при получении информации об измерении: {e}")
             return {}
-        finally:
-            self.disconnect()
     
-    def get_measurements_list(self, database: Optional[str] = None) -> List[str]:
+    @traced()
+    def get_measurements_list(self, database: Optional[str] = None,
+                              refresh: bool = False) -> List[str]:
         """
         Получение списка всех измерений в базе данных
         
         Args:
             database: Имя базы данных
+            refresh: Перечитать схему базы, не дожидаясь истечения TTL каталога
             
         Returns:
             List[str]: Список измерений
@@ -542,29 +1254,41 @@ class EnhancedInfluxDBManager(InfluxDBManager):
         db_name = database or self.config.db_name
         
         try:
-            client = InfluxDBClient(
-                host=self.config.ip,
-                port=self.config.port,
-                database=db_name
-            )
-            
-            result = client.query("SHOW MEASUREMENTS")
-            measurements = [list(point.values())[0] for point in result.get_points()]
-            
-            return measurements
+            return self.catalog.measurements(db_name, refresh)
             
         except Exception as e:
+            current_span().fail(e)
             print(f"Ошибка при получении списка измерений: {e}")
-            return []
-        finally:
-            client.close()           
+            return []           
 
 class InfluxDataFactory:
     
     @staticmethod
     def from_dataframe(df: pd.DataFrame, measurement: str, 
-                      tag_columns: List[str] = None) -> List[InfluxDataPoint]:
-        """Создание точек данных из DataFrame"""
+                      tag_columns: List[str] = None,
+                      columnar: bool = False) -> Union[List[InfluxDataPoint], InfluxBatch]:
+        """Создание точек данных из DataFrame (columnar=True - InfluxBatch)"""
+        if columnar:
+            tag_columns = [c for c in (tag_columns or []) if c in df.columns]
+            field_columns = [c for c in df.columns if c not in tag_columns
+                             and pd.api.types.is_numeric_dtype(df[c])]
+            if isinstance(df.index, pd.DatetimeIndex):
+                timestamps = timestamps_to_ns(df.index)
+            elif isinstance(df.index, pd.PeriodIndex):
+                timestamps = timestamps_to_ns(df.index.to_timestamp())
+            else:
+                raise TypeError(f"Для пачки нужен DatetimeIndex или PeriodIndex, "
+                                f"индекс: {type(df.index).__name__}")
+            return InfluxBatch(
+                measurement=measurement,
+                time=timestamps,
+                # числовые поля как float, как в построчном пути ниже
+                fields={str(c): df[c].to_numpy(dtype=np.float64, na_value=np.nan)
+                        for c in field_columns},
+                # теги как str(value), как в построчном пути ниже
+                tags={str(c): _tag_column(df[c].to_numpy(dtype=object).astype(str)) for c in tag_columns}
+            )
+        
         points = []
         
         for idx, row in df.iterrows():
@@ -589,8 +1313,22 @@ class InfluxDataFactory:
     
     @staticmethod
     def from_dict_list(data_list: List[Dict], measurement: str,
-                      field_keys: List[str], tag_keys: List[str] = None) -> List[InfluxDataPoint]:
-        """Создание точек данных из списка словарей"""
+                      field_keys: List[str], tag_keys: List[str] = None,
+                      columnar: bool = False) -> Union[List[InfluxDataPoint], InfluxBatch]:
+        """Создание точек данных из списка словарей (columnar=True - InfluxBatch)"""
+        if columnar:
+            now = time.time_ns()
+            timestamps = [data.get('timestamp') for data in data_list]
+            return InfluxBatch(
+                measurement=measurement,
+                time=np.array([now if t is None else pd.Timestamp(t).value
+                               for t in timestamps], dtype=np.int64),
+                # поля как float(data[k]), как в построчном пути ниже
+                fields={k: np.array([data.get(k, np.nan) for data in data_list], dtype=np.float64)
+                        for k in field_keys},
+                tags={k: _tag_column([data.get(k) for data in data_list]) for k in (tag_keys or [])}
+            )
+        
         points = []
         
         for data in data_list:
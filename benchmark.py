@@ -0,0 +1,311 @@
+"""
+Воспроизводимые бенчмарки путей записи и чтения InfluxDB и MongoDB
+
+Работает без серверов: InfluxDB заменяется локальным HTTP-сервером
+StubInfluxServer, MongoDB - StubMongoClient в памяти процесса. Данные -
+синтетические DataFrame (строки x столбцы x кардинальность тегов) с
+фиксированным seed.
+
+Для каждого сценария измеряются задержка (среднее, p50, p90, p99),
+пропускная способность (строк/с по медиане) и пиковая память
+(tracemalloc, отдельным прогоном). Результаты сохраняются в JSON;
+при заданном baseline ухудшения сверх допуска отмечаются, а код
+возврата - 1.
+
+Примеры:
+    python benchmark.py --rows 100000 --output baseline.json
+    python benchmark.py --rows 100000 --baseline baseline.json
+    python benchmark.py --cases influx_read_DF,mongo_get_DF --repeat 10
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Callable
+
+import numpy as np
+import pandas as pd
+
+import config
+from influx_stub_server import StubInfluxServer
+from mongo_stub import StubMongoClient, StubGridFSBucket
+
+
+def synthetic_frame(rows: int = 10000,
+                    columns: int = 10,
+                    tag_cardinality: int = 10,
+                    tags: int = 2,
+                    start='2024-01-01',
+                    freq: str = '1s',
+                    seed: int = 0) -> pd.DataFrame:
+    """
+    Синтетический DataFrame с индексом времени UTC
+
+    Args:
+        rows: Число строк
+        columns: Число столбцов-полей float64 (f0, f1, ...)
+        tag_cardinality: Число различных значений каждого тега
+        tags: Число столбцов-тегов (t0, t1, ...)
+        start: Время первой строки
+        freq: Шаг времени; строки с одинаковым набором тегов не совпадают по времени
+        seed: Начальное значение генератора
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=rows, freq=freq, tz='UTC')
+    data = {f'f{i}': rng.normal(100.0, 15.0, rows) for i in range(columns)}
+    for i in range(tags):
+        codes = rng.integers(0, max(1, tag_cardinality), rows)
+        data[f't{i}'] = np.array([f'T{i}_{c}' for c in range(max(1, tag_cardinality))],
+                                 dtype=object)[codes]
+    return pd.DataFrame(data, index=index)
+
+
+@dataclass
+class CaseResult:
+    """Результат одного сценария"""
+    name: str
+    rows: int
+    latencies: List[float] = field(default_factory=list)
+    peak_memory: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        latency = np.array(self.latencies) * 1000
+        p50 = float(np.percentile(latency, 50))
+        return {
+            'rows': self.rows,
+            'repeat': len(self.latencies),
+            'latency_ms': {
+                'mean': float(latency.mean()),
+                'min': float(latency.min()),
+                'p50': p50,
+                'p90': float(np.percentile(latency, 90)),
+                'p99': float(np.percentile(latency, 99)),
+                'max': float(latency.max()),
+            },
+            'throughput_rows_s': self.rows / (p50 / 1000) if p50 else 0.0,
+            'peak_memory_mb': self.peak_memory / 2 ** 20,
+        }
+
+
+def measure(name: str, run: Callable[[], Any], rows: int,
+            repeat: int = 5, warmup: int = 1) -> CaseResult:
+    """
+    Замер сценария: warmup прогонов без учёта, repeat прогонов по времени,
+    затем один прогон под tracemalloc для пиковой памяти
+    """
+    result = CaseResult(name, rows)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            run()
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            run()
+            result.latencies.append(time.perf_counter() - t0)
+        tracemalloc.start()
+        try:
+            run()
+            result.peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+SINK_DATABASE = 'bench_sink'
+# число кривых в сценариях пакетной записи MongoDB
+CURVES = 200
+
+
+class BenchmarkEnvironment:
+    """Локальные заглушки серверов и подключение к ним модулей проекта"""
+
+    def __init__(self):
+        # запись в SINK_DATABASE сервер только подсчитывает - время
+        # сценариев записи определяется клиентом, а не разбором на заглушке
+        self.influx = StubInfluxServer(sink_databases=(SINK_DATABASE,)).start()
+        config.INFLUX.update(IP_=self.influx.host, port_=self.influx.port)
+        import database
+        import mongo_pool
+        import mongo_frames
+        import influx_pool
+        # заглушка MongoDB подключается только на время бенчмарка
+        self.database = database
+        self._mongo_pool = mongo_pool
+        self._mongo_frames = mongo_frames
+        self._influx_pool = influx_pool
+        self._mongo_client = mongo_pool.MongoClient
+        self._gridfs_bucket = mongo_frames.GridFSBucket
+        mongo_pool.close_mongo_clients()
+        mongo_pool.MongoClient = StubMongoClient
+        mongo_frames.GridFSBucket = StubGridFSBucket
+        from InfluxDatabase import EnhancedInfluxDBManager
+        self.manager = EnhancedInfluxDBManager()
+
+    def close(self) -> None:
+        self._mongo_pool.close_mongo_clients()
+        self._mongo_pool.MongoClient = self._mongo_client
+        self._mongo_frames.GridFSBucket = self._gridfs_bucket
+        StubMongoClient.reset()
+        self.influx.stop()
+        # пул соединений с остановленной заглушкой больше не нужен
+        self._influx_pool.close_pools()
+
+
+def build_cases(env: BenchmarkEnvironment, frame: pd.DataFrame) -> Dict[str, Callable[[], Any]]:
+    """Сценарии: имя -> функция одного прогона (данные для чтения готовятся заранее)"""
+    db = env.database
+    tags = [c for c in frame.columns if c.startswith('t')]
+    fields = [c for c in frame.columns if c not in tags]
+    start, end = frame.index[0], frame.index[-1]
+    # ревизия модели: CURVES кривых из строк frame
+    bounds = np.linspace(0, len(frame), CURVES + 1).astype(int)
+    curves = [(frame[fields].iloc[a:b], 'BENCH', 'bulk', f'curve{i}', 'Base')
+              for i, (a, b) in enumerate(zip(bounds[:-1], bounds[1:]))]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        db.save_df_2_db(frame, table_='bench_read', Tag_Names=tags)
+        db.write_DF_2mongo(frame[fields], Equipment='BENCH', Name='get_DF', Subsystem=None, Format='json')
+        db.write_DF_2mongo(frame[fields], Equipment='BENCH', Name='get_DF_arrow', Subsystem=None, Format='arrow')
+
+    return {
+        'influx_write_dataframe_enhanced': lambda: env.manager.write_dataframe_enhanced(
+            frame, 'bench_write', tag_columns=tags, database=SINK_DATABASE),
+        'influx_save_df_2_db': lambda: db.save_df_2_db(frame, table_='bench_save',
+                                                       database_=SINK_DATABASE, Tag_Names=tags),
+        'influx_read_DF': lambda: db.read_DF_from_influxDB(
+            table_='bench_read', timestamp_=start, timestamp_to=end),
+        'mongo_write_DF': lambda: db.write_DF_2mongo(
+            frame[fields], Equipment='BENCH', Name='write', Subsystem=None, Format='json'),
+        'mongo_get_DF': lambda: db.get_DF('BENCH.get_DF'),
+        'mongo_write_DF_arrow': lambda: db.write_DF_2mongo(
+            frame[fields], Equipment='BENCH', Name='write_arrow', Subsystem=None, Format='arrow'),
+        'mongo_get_DF_arrow': lambda: db.get_DF('BENCH.get_DF_arrow'),
+        'mongo_write_curves_sequential': lambda: [db.write_DF_2mongo(*c[:1], Equipment=c[1], Subsystem=c[2],
+                                                                     Name=c[3], Model=c[4], Format='arrow')
+                                                  for c in curves],
+        'mongo_write_curves_bulk': lambda: db.write_DFs_2mongo(curves, Format='arrow'),
+    }
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any],
+            tolerance: float = 0.1, memory_tolerance: float = 0.2) -> List[str]:
+    """
+    Сравнение с baseline
+
+    Returns:
+        List: Описания ухудшений: пропускная способность ниже на tolerance,
+            медиана задержки выше на tolerance, пиковая память выше на memory_tolerance
+    """
+    regressions = []
+    base_results = baseline.get('results', {})
+    for name, current in results.items():
+        base = base_results.get(name)
+        if base is None or 'error' in base:
+            continue
+        if 'error' in current:
+            regressions.append(f'{name}: ошибка: {current["error"]}')
+            continue
+        if base['rows'] != current['rows']:
+            print(f'{name}: в baseline другое число строк ({base["rows"]}), сравнение пропущено')
+            continue
+        checks = [
+            ('пропускная способность', current['throughput_rows_s'], base['throughput_rows_s'], -tolerance),
+            ('задержка p50', current['latency_ms']['p50'], base['latency_ms']['p50'], tolerance),
+            ('пиковая память', current['peak_memory_mb'], base['peak_memory_mb'], memory_tolerance),
+        ]
+        for label, value, reference, limit in checks:
+            if not reference:
+                continue
+            change = value / reference - 1
+            if (limit < 0 and change < limit) or (limit > 0 and change > limit):
+                regressions.append(f'{name}: {label} {reference:.3g} -> {value:.3g} ({change:+.1%})')
+    return regressions
+
+
+def run(rows: int = 10000, columns: int = 10, tag_cardinality: int = 10, tags: int = 2,
+        repeat: int = 5, warmup: int = 1, cases: Optional[List[str]] = None,
+        seed: int = 0) -> Dict[str, Any]:
+    """Запуск бенчмарков; возвращает словарь для сохранения в JSON"""
+    frame = synthetic_frame(rows, columns, tag_cardinality, tags, seed=seed)
+    env = BenchmarkEnvironment()
+    try:
+        available = build_cases(env, frame)
+        selected = cases or list(available)
+        unknown = set(selected) - set(available)
+        if unknown:
+            raise ValueError(f'Неизвестные сценарии: {sorted(unknown)}; есть: {list(available)}')
+        results = {}
+        for name in selected:
+            try:
+                results[name] = measure(name, available[name], rows, repeat, warmup).to_dict()
+            except Exception as e:
+                # например, документ MongoDB больше 16 МБ
+                print(f'{name}: ошибка: {str(e)[:200]}')
+                results[name] = {'rows': rows, 'error': str(e)[:1000]}
+                continue
+            print_result(name, results[name])
+    finally:
+        env.close()
+    return {
+        'meta': {
+            'created': pd.Timestamp.now(tz='UTC').isoformat(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'params': {'rows': rows, 'columns': columns, 'tag_cardinality': tag_cardinality,
+                       'tags': tags, 'repeat': repeat, 'warmup': warmup, 'seed': seed},
+        },
+        'results': results,
+    }
+
+
+def print_result(name: str, result: Dict[str, Any]) -> None:
+    latency = result['latency_ms']
+    print(f"{name:34s} p50 {latency['p50']:9.1f} мс  p90 {latency['p90']:9.1f} мс  "
+          f"p99 {latency['p99']:9.1f} мс  {result['throughput_rows_s']:12.0f} строк/с  "
+          f"память {result['peak_memory_mb']:8.1f} МБ")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Бенчмарки путей InfluxDB и MongoDB')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--columns', type=int, default=10)
+    parser.add_argument('--cardinality', type=int, default=10, help='значений на тег')
+    parser.add_argument('--tags', type=int, default=2, help='число столбцов-тегов')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cases', help='сценарии через запятую (по умолчанию все)')
+    parser.add_argument('--output', help='файл JSON для результатов')
+    parser.add_argument('--baseline', help='файл JSON с результатами для сравнения')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='допустимое ухудшение времени и пропускной способности')
+    parser.add_argument('--memory-tolerance', type=float, default=0.2,
+                        help='допустимый рост пиковой памяти')
+    args = parser.parse_args(argv)
+
+    report = run(args.rows, args.columns, args.cardinality, args.tags, args.repeat,
+                 args.warmup, args.cases.split(',') if args.cases else None, args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report['results'], baseline, args.tolerance, args.memory_tolerance)
+        if regressions:
+            print('Ухудшения относительно baseline:')
+            for line in regressions:
+                print('  ' + line)
+            return 1
+        print('Ухудшений относительно baseline нет')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,33 @@
+"""
+Общая настройка проверок
+
+config.py проекта локальный (не хранится в репозитории): если его нет,
+проверки получают config с параметрами по умолчанию. Подключение к
+серверам в проверках задаётся явно (заглушки StubInfluxServer, StubMongoClient).
+Если не установлен внешний json_convertor, вместо него используется
+convert2jsonMongo в прежнем формате: DataFrame.to_json() для DataFrame
+и для каждого DataFrame словаря.
+"""
+import importlib.util
+import sys
+import types
+
+if importlib.util.find_spec('config') is None:
+    config = types.ModuleType('config')
+    config.INFLUX = {'DB_name': 'test', 'IP_': '127.0.0.1', 'port_': 8086}
+    config.MONGO = {'DB_name': 'TES', 'IP_': '127.0.0.1', 'port_': 27017,
+                    'username_': 'mongo', 'password_': 'mongo'}
+    sys.modules['config'] = config
+
+if importlib.util.find_spec('json_convertor') is None:
+    import pandas as pd
+
+    def convert2jsonMongo(data):
+        if isinstance(data, pd.DataFrame):
+            return data.to_json()
+        return {k: v.to_json() if isinstance(v, pd.DataFrame) else v for k, v in data.items()}
+
+    json_convertor = types.ModuleType('json_convertor')
+    json_convertor.convert2jsonMongo = convert2jsonMongo
+    json_convertor.__all__ = ['convert2jsonMongo']
+    sys.modules['json_convertor'] = json_convertor
@@ -1,8 +1,18 @@
 import pandas as pd
-import time
-from pymongo import MongoClient
-from influxdb import DataFrameClient,InfluxDBClient
+from influxdb.line_protocol import quote_ident
 from json_convertor import *
+from influx_pool import get_pool
+from mongo_pool import get_mongo_client, mongo_options, close_mongo_clients
+from mongo_query import catalog_pipeline, HEADER_FIELDS, ensure_indexes, find_version, insert_version
+from mongo_frames import decode_payload, delete_files
+from mongo_bulk import CurveEntry, CurveBulkWriter, curve_document
+from influx_spool import WriteSpool
+from influx_line_protocol import dataframe_to_lines, iter_line_batches, wire_precision
+from influx_query import iter_chunk_frames, tag_condition, select_list, pivot_long, compact_frame
+from influx_shard import split_time_range, split_by_counts, estimate_buckets, read_sharded
+from influx_cache import shared_cache, invalidate_caches
+from influx_catalog import SchemaCatalog
+from influx_metrics import traced, current_span
 
 import config
 # Пример содержания config.py
@@ -15,21 +25,42 @@ import config
 # 2. Прочесть датафрейм из монго
 # 3. Получить список таблиц из монго
 
+def mongo_client(IP=None):
+    # Общий клиент процесса (пул соединений); client.close() его не закрывает
+    # Размер пула и таймауты - необязательные ключи config.MONGO (см. mongo_options)
+    if IP==None:
+        IP=config.MONGO['IP_']
+    return get_mongo_client(IP, config.MONGO['port_'],
+                            username=config.MONGO['username_'],
+                            password=config.MONGO['password_'],
+                            **mongo_options(config.MONGO))
+
+# Формат записи DataFrame в MongoDB: 'json' (прежний), 'arrow' или 'parquet' (см. mongo_frames)
+mongo_format = config.MONGO.get('format_', 'json')
+
+def close_mongo():
+    # Закрытие общих клиентов MongoDB (при завершении работы)
+    close_mongo_clients()
+
 def mongo_db(IP=config.MONGO['IP_']):
-        client = MongoClient(IP, config.MONGO['port_'],
-                             username=config.MONGO['username_'],
-                              password=config.MONGO['password_'])
+        client = mongo_client(IP)
         db = client[config.MONGO['DB_name']]
+        # Индексы posts создаются при первом обращении процесса к базе (одна попытка на процесс)
+        try:
+            ensure_indexes(db.posts, key=(IP, config.MONGO['port_'], config.MONGO['DB_name'], 'posts'))
+        except Exception as e:
+            print(f"Не удалось создать индексы MongoDB: {e}")
         return db,client 
         
 
 
-def write_DF_2mongo(DFSt2,Equipment='TA3',Name='D0',Subsystem='St2',Model='Base',IP=None):
-        # 
+def write_DF_2mongo(DFSt2,Equipment='TA3',Name='D0',Subsystem='St2',Model='Base',IP=None,Format=None):
+        # Format - 'json', 'arrow' или 'parquet' (по умолчанию mongo_format)
+        # Двоичные DataFrame больше 8 МБ на документ переносятся в GridFS
         if IP==None:
             IP=config.MONGO['IP_']
-            
-        DFSt2=convert2jsonMongo(DFSt2)
+        if Format==None:
+            Format=mongo_format
         
         #if isinstance(DFSt2,pd.DataFrame):
         #    DFSt2=DFSt2.to_json()
@@ -38,40 +69,50 @@ def write_DF_2mongo(DFSt2,Equipment='TA3',Name='D0',Subsystem='St2',Model='Base'
         #        if isinstance(DFSt2[k],pd.DataFrame):
         #            DFSt2[k]=DFSt2[k].to_json()
         
-        name=Equipment            
-        if not Subsystem==None:
-            name=name+'.'+Subsystem
-        name=name+'.'+Name    
-        if not Model=='Base':
-            name=name+':'+Model
-            
-        dict2mongo = {'name':name,
-                      'Equipment':Equipment,
-                      'Subsystem': Subsystem,
-                      'Name':Name,
-                      'Model':Model,
-                      'Type': 'Curve',
-                      'DF' : DFSt2}
+        db,client=mongo_db(IP=IP)
+        dict2mongo,file_ids=curve_document(db, CurveEntry(DFSt2,Equipment,Subsystem,Name,Model), Format)
 
-        client = MongoClient(IP, config.MONGO['port_'],
-                             username=config.MONGO['username_'],
-                              password=config.MONGO['password_'])
-        DB_Name=config.MONGO['DB_name']
-        db = client[DB_Name]
         posts = db.posts
-        result = posts.insert_many([dict2mongo])
-        client.close()
+        try:
+            insert_version(posts, dict2mongo)
+        except Exception:
+            delete_files(db, file_ids)
+            raise
+
+def write_DFs_2mongo(entries,Format=None,Mode='insert',IP=None,workers=4,batch_documents=500):
+        """
+        Пакетная запись многих кривых (например, всех кривых ревизии модели)
+        entries - CurveEntry, словари {'frame'|'DFSt2', 'Equipment', 'Subsystem', 'Name', 'Model'}
+                  или кортежи (frame, Equipment, Subsystem, Name, Model)
+        Mode - 'insert' (новая версия каждой кривой) или 'upsert' (замена последней версии)
+        Документы готовятся в workers потоках и отправляются неупорядоченными bulk_write
+        пачками до batch_documents документов
+        Возвращает BulkReport с результатом по каждой кривой
+        """
+        if IP==None:
+            IP=config.MONGO['IP_']
+        if Format==None:
+            Format=mongo_format
+        db,client=mongo_db(IP=IP)
+        writer=CurveBulkWriter(db, format=Format, mode=Mode, workers=workers, batch_documents=batch_documents)
+        report=writer.write(entries)
+        print(report)
+        for result in report.failed:
+            print(f"Ошибка записи {result.name}: {result.error}")
+        return report
 
 def delete_from_mongo_by_name(name='TA3.St2.Qt:Test'):
     db,client=mongo_db()
     query={'name':name} 
     posts = db.posts
+    file_ids=[i for d in posts.find({'name':name,'gridfs':{'$exists':True}},{'gridfs':1}) for i in d['gridfs']]
     result=posts.delete_many(query)
-    client.close()
+    delete_files(db, file_ids)
     print(f"Deleted {result.deleted_count} document(s).")
     return True
 
-def read_FD_from_mongo(Equipment='T3',Type=None,IP=config.MONGO['IP_']):
+def read_FD_from_mongo(Equipment='T3',Type=None,IP=config.MONGO['IP_'],version=None,as_of=None):
+        # version - номер версии (с 1), as_of - последняя версия на момент времени; по умолчанию последняя
         db,client=mongo_db(IP=IP)
         posts = db.posts
     
@@ -80,11 +121,12 @@ def read_FD_from_mongo(Equipment='T3',Type=None,IP=config.MONGO['IP_']):
         else:    
             EquipmentName=Equipment+'.'+Type
             
-        result = list(posts.find({"name":EquipmentName}))[-1]
-        client.close()
+        result = find_version(posts, EquipmentName, version, as_of)
+        if result is None:
+            raise IndexError(f"Нет записи {EquipmentName} (version={version}, as_of={as_of})")
         print(result)
         
-        DFStages=onvertMongoJson2DF(result[Type])
+        DFStages=decode_payload(db, result[Type], legacy=onvertMongoJson2DF)
         
         #DFStages={}
         #if isinstance(result[Type],dict):
@@ -95,66 +137,55 @@ def read_FD_from_mongo(Equipment='T3',Type=None,IP=config.MONGO['IP_']):
         return DFStages  
 
 def list_database_names():
-    client = MongoClient(config.MONGO['IP_'], config.MONGO['port_'],
-                                  username=config.MONGO['username_'],
-                                  password=config.MONGO['password_'])
-    out=client.list_database_names(session=None, comment=None)
-    client.close()
-    return out
+    return mongo_client().list_database_names(session=None, comment=None)
     
-def get_list(Tags=None):
-    # Список всех записей
-        client = MongoClient(config.MONGO['IP_'], config.MONGO['port_'],
-                                  username=config.MONGO['username_'],
-                                  password=config.MONGO['password_'])
-        #db = client.KemGRES
-        DB_Name=config.MONGO['DB_name']
-        db = client[DB_Name]
-        
+def get_list(Tags=None, skip=0, limit=None):
+        """
+        Каталог записей: по одной строке на пару (name, Equipment), _id и поля последней версии
+        Группировка и страницы считаются на сервере (catalog_pipeline)
+        Tags - фильтр по полям записи, skip/limit - страница каталога
+        Общее число строк каталога - res.attrs['total']
+        """
+        db,client=mongo_db()
         posts = db.posts
-        if Tags ==None:
-            query = {}
-        else:
-            query = Tags
-        projection = {"_id":1,"name":1,"Equipment":1,"Subsystem":1,"Name":1,"Model":1,"Type":1}
-        result = list(posts.find(query,projection))
         
-        client.close()
-        dict_for_df=[]
-        for i in result:
-            temp=pd.DataFrame({k:[i[k]] for k in i.keys()})
-            dict_for_df.append(temp)
-        res=pd.concat(dict_for_df).reset_index(drop=True) 
-        if 'Equipment' in res.keys():
-            res=res.iloc[res[['name','Equipment']].drop_duplicates().index].set_index('_id')
+        if limit is None:
+            # $skip - в конвейере, пропущенные строки с сервера не передаются
+            rows=list(posts.aggregate(catalog_pipeline(Tags, skip), allowDiskUse=True))
+            total=skip+len(rows)
+            if skip and not rows:
+                # страница за концом каталога - число строк считается отдельно
+                counted=list(posts.aggregate(catalog_pipeline(Tags)+[{'$count':'total'}], allowDiskUse=True))
+                total=counted[0]['total'] if counted else 0
         else:
-            res=res.iloc[res[['name']].drop_duplicates().index].set_index('_id')        
+            page=next(iter(posts.aggregate(catalog_pipeline(Tags, skip, limit), allowDiskUse=True)))
+            rows=page['items']
+            total=page['total'][0]['total'] if page['total'] else 0
+        
+        res=pd.DataFrame.from_records(rows, columns=['_id']+HEADER_FIELDS).set_index('_id')
+        res.attrs['total']=total
         return res
         
-def get_DF(Name='TA3.DFSt2',df=None):
-    client = MongoClient(config.MONGO['IP_'], config.MONGO['port_'],
-                                  username=config.MONGO['username_'],
-                                  password=config.MONGO['password_'])
-    db = client[config.MONGO['DB_name']]
+def get_DF(Name='TA3.DFSt2',df=None,version=None,as_of=None):
+    # version - номер версии (с 1), as_of - последняя версия на момент времени; по умолчанию последняя
+    db,client=mongo_db()
     posts = db.posts
     
+    projection = {"_id":0,"name":0,"version":0,"gridfs":0}
     if isinstance(df,pd.DataFrame):
         ID_=df.loc[Name][0]    
-        query = {"_id":ID_}
+        result = posts.find_one({"_id":ID_},projection)
     else:
-        query = {"name":Name}
-    projection = {"_id":0,"name":0}
-    result = list(posts.find(query,projection))
-    client.close()
-    result=result[-1]
+        result = find_version(posts, Name, version, as_of, projection)
+    if result is None:
+        raise IndexError(f"Нет записи {Name} (version={version}, as_of={as_of})")
     
+    # Формат определяется по значению: строки JSON или двоичные DataFrame (mongo_frames)
     if 'DF' in result.keys(): 
-        DFSt2_=pd.read_json(result['DF'])
+        DFSt2_=decode_payload(db, result['DF'])
     else:
         Type=list(result.keys())[0]    
-        DFSt2_={}
-        for key in result[Type].keys():
-            DFSt2_.update({key:pd.read_json(result[Type][key])})
+        DFSt2_=decode_payload(db, result[Type])
     return DFSt2_
     
 
@@ -163,10 +194,101 @@ def get_DF(Name='TA3.DFSt2',df=None):
 # 2. Записать в таблицу (по умолчанию без тегов)
 # 3. Записать в таблицу результаты экспериментов (с тегами)
 
+def influx_client(host_=None, port_=None):
+    # Клиент текущего потока из общего пула соединений с сервером InfluxDB
+    if host_==None:
+        host_=config.INFLUX['IP_']
+    if port_==None:    
+        port_=config.INFLUX['port_']
+    return get_pool(host_, port_, ssl=influx_ssl).client()
+
+# Журнал записи (включается enable_influx_spool)
+influx_spool = None
+# Кэш результатов чтения (включается enable_influx_cache)
+influx_cache = None
+# Сжатие gzip тел запросов записи и точность времени по таблицам (s, ms, us, ns)
+influx_gzip = bool(config.INFLUX.get('gzip_', False))
+# Подключение к InfluxDB по https
+influx_ssl = bool(config.INFLUX.get('ssl_', False))
+influx_time_precision = dict(config.INFLUX.get('time_precision_') or {})
+# Каталоги схемы по серверам (ключи тегов и полей для read_DF_from_influxDB_unstack)
+influx_schema_ttl = config.INFLUX.get('schema_ttl_', 60.0)
+_influx_catalogs = {}
+
+def influx_catalog(host_=None, port_=None):
+    # Каталог схемы сервера: схема измерения читается одним запросом и хранится influx_schema_ttl секунд
+    if host_==None:
+        host_=config.INFLUX['IP_']
+    if port_==None:
+        port_=config.INFLUX['port_']
+    key=(host_, int(port_))
+    catalog=_influx_catalogs.get(key)
+    if catalog is None:
+        execute=lambda query, database: get_pool(host_, port_, ssl=influx_ssl).query_results(query, database)
+        catalog=_influx_catalogs.setdefault(key, SchemaCatalog(execute, ttl=influx_schema_ttl))
+    return catalog
+
+def influx_write(payload, database_=None, precision=None, retry=False):
+    # Отправка тела запроса line protocol через общий пул соединений
+    # retry - повторы при сетевых сбоях (журнал повторяет отправку сам)
+    if database_ ==None:
+            database_=config.INFLUX['DB_name']
+    pool=get_pool(config.INFLUX['IP_'], config.INFLUX['port_'], ssl=influx_ssl)
+    try:
+        return pool.write(payload, database_, precision, gzip=influx_gzip, retry=retry)
+    finally:
+        # кэши сбрасываются после ответа сервера (в т.ч. при отправке из журнала)
+        invalidate_caches(database_, payload=payload)
+        influx_catalog().observe_payload(payload, database_)
+
+def set_influx_time_precision(table_, precision):
+    """
+    Точность меток времени при записи в таблицу через write_DF_2_influxDB/save_df_2_db
+    precision: 's', 'ms', 'us', 'ns' или None (по умолчанию, ns)
+    """
+    if precision is None:
+        influx_time_precision.pop(table_, None)
+    else:
+        wire_precision(precision)
+        influx_time_precision[table_]=precision
+
+def influx_write_stats():
+    # Объём записанных данных до и после сжатия (WriteStats)
+    return get_pool(config.INFLUX['IP_'], config.INFLUX['port_'], ssl=influx_ssl).write_stats
+
+def enable_influx_spool(directory, **spool_options):
+    """
+    Включение локального журнала записи для write_DF_2_influxDB и save_df_2_db
+    Данные сначала пишутся на диск, фоновый поток отправляет их в InfluxDB
+    Параметры spool_options - см. WriteSpool (max_bytes, fsync, on_full, ...)
+    """
+    global influx_spool
+    if influx_spool is not None:
+        influx_spool.close()
+    influx_spool = WriteSpool(directory, send=influx_write, **spool_options).start()
+    return influx_spool
+
+def enable_influx_cache(max_bytes=256*1024*1024, ttl=60.0):
+    """
+    Включение кэша результатов read_DF_from_influxDB (и read_influx)
+    Закончившиеся интервалы хранятся без срока, захватывающие текущий момент - ttl секунд
+    Кэш общий для процесса (и для EnhancedInfluxDBManager.enable_cache)
+    Запись через write_DF_2_influxDB/save_df_2_db и через менеджер удаляет записи измерения из кэша
+    Счётчики попаданий и промахов - influx_cache.stats
+    """
+    global influx_cache
+    influx_cache = shared_cache(max_bytes=max_bytes, ttl=ttl)
+    return influx_cache
+
+def influx_send(payload, database_=None, precision=None):
+    # Запись через журнал, если он включен, иначе напрямую
+    if influx_spool is not None:
+        return influx_spool.append(payload, database_, precision)
+    return influx_write(payload, database_, precision, retry=True)
+
 # Создание новой БД
 def add_db(database='KEM_GRES'):
-        from   influxdb import InfluxDBClient
-        client = InfluxDBClient(host=config.INFLUX['IP_'], port=config.INFLUX['port_'])
+        client = influx_client()
         db=client.get_list_database()
         print(db)
         if  database not in  [d['name'] for d in db]:
@@ -174,25 +296,31 @@ def add_db(database='KEM_GRES'):
         else:
             print('Указанная БД уже существует!')
             
+@traced(measurement='Name')
 def drop_measurement(Name):
-    client = InfluxDBClient(host=config.INFLUX['IP_'], port=config.INFLUX['port_'],database=config.INFLUX['DB_name'])
-    client.drop_measurement(Name)
-    client.close()
+    client = influx_client()
+    client.query(f"DROP MEASUREMENT {quote_ident(Name)}", database=config.INFLUX['DB_name'], method='POST')
+    invalidate_caches(config.INFLUX['DB_name'], Name)
+    influx_catalog().forget(Name, config.INFLUX['DB_name'])
     
 
+@traced(measurement='table_')
 def write_DF_2_influxDB(resdf, table_=None,  database_ =None,  time_zone_ = None, tags_=None):
     if database_ ==None:
             database_=config.INFLUX['DB_name']
    
-    influxDataFrameClient_client = DataFrameClient(host=config.INFLUX['IP_'], port=config.INFLUX['port_'], database=database_)
     influx_DBname = table_
     resdf1=resdf[list(set(resdf.keys())-set(['TimeWrite2DB']))].astype(float)
     if 'TimeWrite2DB' in resdf.keys():
         resdf1['TimeWrite2DB']=resdf['TimeWrite2DB']
-    influxDataFrameClient_client.write_points(resdf1, influx_DBname, tags=tags_, batch_size=1000)
-    influxDataFrameClient_client.close()
+    precision=influx_time_precision.get(table_)
+    lines=dataframe_to_lines(resdf1, influx_DBname, field_columns=list(resdf1.keys()), global_tags=tags_,
+                             precision=precision or 'ns')
+    for payload in iter_line_batches(lines, max_lines=1000):
+        influx_send(payload, database_, precision)
     return True
         
+@traced(measurement='Table')
 def save_df2influx(df,Table='basic',Station='KemGRES',Equipment='All',TypeCalc="calc", Scenario="Base",Model="Base",Version='1'):
     Tag_Names=['Station','Equipment','TypeCalc','Scenario','Model','Version']
     df_keys=df.keys()
@@ -210,33 +338,40 @@ def save_df2influx(df,Table='basic',Station='KemGRES',Equipment='All',TypeCalc="
         df['Version']=Version
     save_df_2_db(df,table_=Table,database_=None,Tag_Names=Tag_Names)
         
-def save_df_2_db(res2,table_='Optimize',database_=None,Tag_Names=['Ni','Fleet', 'nBoilers']):
+@traced(measurement='table_')
+def save_df_2_db(res2,table_='Optimize',database_=None,Tag_Names=['Ni','Fleet', 'nBoilers'],batch_size=5000,batch_bytes=None):
+    # Запись всех сочетаний тегов за один проход: кадр сортируется по тегам,
+    # кодируется целиком и отправляется пачками через одно соединение из пула
     if database_ ==None:
             database_=config.INFLUX['DB_name']
             
     Others=list(set(res2.keys())-set(Tag_Names))
-    temp=res2[Tag_Names].drop_duplicates()
-    print('Уникальные теги:',temp, 'количество уникальных сочетаний:', temp.shape[0])
-    for o in range(temp.shape[0]): 
-                tt=temp.iloc[o]
-                print('Индекс уникального сочетания:',o)
-                print(tt)
-                # Формируем значения resdf для тега tags_
-                for i in range(tt.shape[0]):
-                    tags_={}
-                    k=0
-                    for t in tt.keys():
-                        tags_[t]=str(tt[t])
-                        if k==0:
-                            ftemp=res2[t]==tt[t]
-                            k=k+1
-                        else:
-                            ftemp=ftemp&(res2[t]==tt[t])
-                #print(tags_)
-                resdf=res2[Others][ftemp]    
-                #print(resdf) # Для отладки
-                write_DF_2_influxDB(resdf,table_, database_,tags_=tags_)
+    # Значения тегов приводятся к общему типу, как в строке res2[Tag_Names].iloc[i];
+    # индекс tags_df - номера строк res2 (метки времени могут повторяться)
+    tags_df=pd.DataFrame(res2[Tag_Names].values, columns=Tag_Names)
+    # Строки с пропусками в тегах не попадают ни в одно сочетание
+    tags_df=tags_df[tags_df.notna().all(axis=1)]
+    try:
+        tags_df=tags_df.sort_values(Tag_Names, kind='stable')
+    except TypeError:
+        pass # разнотипные значения тегов - пишем в исходном порядке
+    order=tags_df.index.to_numpy()
+    
+    resdf=res2[list(set(Others)-set(['TimeWrite2DB']))].iloc[order].astype(float)
+    if 'TimeWrite2DB' in res2.keys():
+        resdf['TimeWrite2DB']=res2['TimeWrite2DB'].iloc[order].to_numpy()
+    fields=list(resdf.keys())
+    for t in Tag_Names:
+        resdf[t]=tags_df[t].to_numpy()
+    print('количество уникальных сочетаний тегов:', tags_df.drop_duplicates().shape[0])
+    
+    precision=influx_time_precision.get(table_)
+    lines=dataframe_to_lines(resdf, table_, tag_columns=Tag_Names, field_columns=fields,
+                             precision=precision or 'ns')
+    for payload in iter_line_batches(lines, max_lines=batch_size, max_bytes=batch_bytes):
+        influx_send(payload, database_, precision)
                 
+@traced(measurement='Table')
 def read_influx(date,Table='basic',Station='KemGRES',date_to=None,Equipment='All',TypeCalc="calc", Scenario="Base",Model="Base",Version='1',database_=None,time_zone_=None,host_=None):
     Tags={}
     if not Station==None:
@@ -258,6 +393,7 @@ def read_influx(date,Table='basic',Station='KemGRES',date_to=None,Equipment='All
                                  database_=database_,time_zone_=time_zone_,host_=host_)
     
 
+@traced(measurement='table_')
 def read_DF_from_influxDB(host_ = None,
                           port_ = None,
                           database_ = None,
@@ -265,12 +401,25 @@ def read_DF_from_influxDB(host_ = None,
                           timestamp_ = None,
                           timestamp_to = None,
                           time_zone_ = None,
-                          tags_ = None):
+                          tags_ = None,
+                          chunked = False,
+                          chunk_size = 10000,
+                          shards = None,
+                          shard_window = None,
+                          shard_points = None,
+                          workers = None,
+                          fields_ = None):
     """
     Запрос из БД InfluxDB предрасчетный параметров 
     Возвращает dataframe с предрасчетными параметрами
+    fields_ - список выбираемых столбцов (по умолчанию все),
+    значение тега в tags_ может быть списком: k='v1' or k='v2'
+    При chunked=True возвращает генератор dataframe по chunk_size строк
+    (ответ читается потоково, весь результат в памяти не держится)
+    При shards/shard_window/shard_points интервал делится на окна
+    (shards штук, длительностью shard_window или примерно по shard_points точек),
+    которые запрашиваются параллельно в workers потоков
     """
-    t0=time.time()
     timestamp_=pd.Timestamp(timestamp_)
     if host_==None:
         host_=config.INFLUX['IP_']
@@ -281,7 +430,6 @@ def read_DF_from_influxDB(host_ = None,
     if time_zone_ == None:    
         time_zone_ = 'Etc/GMT-3'
     #print('port_',port_, type(port_))    
-    influxDataFrameClient_client = DataFrameClient(host = host_, port = port_, database = database_)
     
     if timestamp_to == None:
         timestamp_to=pd.Timestamp(timestamp_)
@@ -290,24 +438,70 @@ def read_DF_from_influxDB(host_ = None,
     tags_c=''
     if not tags_==None:
         for k in tags_.keys():
-            tags_c=tags_c+(f" {k}='{str(tags_[k])}' and")
-    query=f"""select * from {table_} where {tags_c}  time >= '{timestamp_}'  and time <= '{timestamp_to}' """
-    if len(time_zone_)>0:
-        query=query+f""" tz('{time_zone_}')"""
-    print(query)
-    df = influxDataFrameClient_client.query(query)
+            tags_c=tags_c+(f" {tag_condition(k, tags_[k])} and")
+    fields_c=select_list(fields_)
+    def select_query(date_from, date_to, end_op='<='):
+        query=f"""select {fields_c} from {table_} where {tags_c}  time >= '{date_from}'  and time {end_op} '{date_to}' """
+        if len(time_zone_)>0:
+            query=query+f""" tz('{time_zone_}')"""
+        return query
+    query=select_query(timestamp_, timestamp_to)
+    if chunked:
+        return _read_DF_chunks(host_, port_, database_, table_, query, time_zone_, chunk_size)
+    cache_key=None
+    if influx_cache is not None:
+        cache_key=influx_cache.key(database_, table_, fields_, tags_, timestamp_, timestamp_to,
+                                   time_zone_, server=(host_, int(port_)))
+        df=influx_cache.get(cache_key)
+        if df is not None:
+            current_span().set(cache='hit')
+            return df
+        generation=influx_cache.generation
+    if shards or shard_window or shard_points:
+        df = _read_DF_sharded(host_, port_, database_, table_, tags_, select_query,
+                              timestamp_, timestamp_to, shards, shard_window,
+                              shard_points, workers)
+    else:
+        df = get_pool(host_, port_, ssl=influx_ssl).query_frames(query, database_)
     if table_ in df.keys():
         df=df[table_]        
         df = df.tz_convert(time_zone_)
     else:
         print('Результат запроса - пустая таблица')
         df =pd.DataFrame()
-    
-    influxDataFrameClient_client.close()
-    dt = time.time() - t0
-    print(f'Запрос на получение данных из {table_} c {timestamp_} по {timestamp_to}  выполнен за {dt: 3.3f} c')
+    if cache_key is not None and not df.empty:
+        influx_cache.put(cache_key, df, timestamp_to, generation, time_zone_)
     return df
 
+@traced('read_DF_from_influxDB_chunked', measurement='table_')
+def _read_DF_chunks(host_, port_, database_, table_, query, time_zone_, chunk_size):
+    results=get_pool(host_, port_, ssl=influx_ssl).query_chunked(query, database_, chunk_size)
+    yield from iter_chunk_frames(results, table_, time_zone_)
+
+def _read_DF_sharded(host_, port_, database_, table_, tags_, select_query,
+                     timestamp_, timestamp_to, shards, shard_window, shard_points, workers):
+    pool=get_pool(host_, port_, ssl=influx_ssl)
+    def frame(query):
+        return pool.query_frames(query, database_, dropna=False).get(table_)
+    def fetch(date_from, date_to, end_inclusive):
+        return frame(select_query(date_from, date_to, '<=' if end_inclusive else '<'))
+    if shard_points:
+        buckets=estimate_buckets(frame, table_, timestamp_, timestamp_to, tags_)
+        windows=split_by_counts(timestamp_, timestamp_to, buckets, shard_points)
+    else:
+        windows=split_time_range(timestamp_, timestamp_to, shards, shard_window)
+    current_span().set(windows=len(windows))
+    df=read_sharded(fetch, windows, workers or pool.pool_size)
+    return {} if df is None else {table_: df}
+
+def _influx_keys(host_, port_, database_, table_):
+    # Ключи тегов и полей измерения из каталога схемы (запрос - при промахе или по истечении TTL)
+    if database_==None:
+        database_=config.INFLUX['DB_name']
+    catalog=influx_catalog(host_, port_)
+    return set(catalog.tag_keys(table_, database_)),set(catalog.field_keys(table_, database_))
+
+@traced(measurement='table_')
 def read_DF_from_influxDB_unstack(host_ = None,
                           port_ = None,
                           database_ = None,
@@ -315,13 +509,31 @@ def read_DF_from_influxDB_unstack(host_ = None,
                           timestamp_ = None,
                           timestamp_to = None,
                           time_zone_ = None,
-                          tags_ = None):
+                          tags_ = None,
+                          names_ = None,
+                          float32_ = False,
+                          categorical_ = False):
     """
     Запрос из БД InfluxDB предрасчетный параметров 
-    Возвращает dataframe с предрасчетными параметрами
+    Возвращает dataframe с предрасчетными параметрами: столбец на каждый name
+    Из БД читаются только name и value; names_ - список нужных name
+    float32_ - значения float32 вместо float64
+    categorical_ - строковые столбцы category (если таблица не в формате name/value)
     """
-    out_=read_DF_from_influxDB(host_ = host_,port_ = port_,database_ = database_,table_ = table_,timestamp_ = timestamp_,timestamp_to = timestamp_to,time_zone_ = time_zone_,tags_ = tags_)
+    tags_=dict(tags_ or {})
+    if names_ is not None and len(names_)==0:
+        return pd.DataFrame()
+    tag_keys,field_keys=_influx_keys(host_, port_, database_, table_)
+    if 'value' in field_keys and ('name' in tag_keys or 'name' in field_keys):
+        if names_ is not None:
+            tags_['name']=list(names_)
+        out_=read_DF_from_influxDB(host_ = host_,port_ = port_,database_ = database_,table_ = table_,timestamp_ = timestamp_,timestamp_to = timestamp_to,time_zone_ = time_zone_,tags_ = tags_ or None,
+                                   fields_ = ['name','value'])
+    else:
+        # в таблице нет name/value (или её ещё нет в каталоге) - читаем все столбцы как есть
+        out_=read_DF_from_influxDB(host_ = host_,port_ = port_,database_ = database_,table_ = table_,timestamp_ = timestamp_,timestamp_to = timestamp_to,time_zone_ = time_zone_,tags_ = tags_ or None)
+        if names_ is not None and 'name' in out_.keys():
+            out_=out_[out_['name'].isin(list(names_))]
     if 'value' in out_.keys() and 'name' in out_.keys():
-        out_=out_[['name','value']].reset_index().set_index(['index','name']).unstack()
-        out_.columns=out_.columns.droplevel()
-    return out_
+        out_=pivot_long(out_, 'name', 'value', dtype='float32' if float32_ and pd.api.types.is_numeric_dtype(out_['value']) else None)
+    return compact_frame(out_, float32_, categorical_)
@@ -0,0 +1,312 @@
+"""
+Асинхронный менеджер InfluxDB 1.x для приложений на asyncio
+
+Повторяет API чтения и записи EnhancedInfluxDBManager поверх aiohttp:
+вызовы не блокируют цикл событий, а число одновременных запросов
+ограничивается семафором.
+
+Пример:
+    async with AsyncInfluxDBManager(max_concurrency=200) as manager:
+        frames = await asyncio.gather(*[
+            manager.read_data('basic', start, end, tags={'Equipment': eq})
+            for eq in equipment
+        ])
+"""
+import asyncio
+import base64
+from typing import Optional, Dict, Any, List, Union
+
+import aiohttp
+import pandas as pd
+
+from InfluxDatabase import InfluxDBManager, EnhancedInfluxDBManager, InfluxDataPoint, InfluxBatch
+from influx_line_protocol import iter_line_batches, wire_precision
+from influx_pool import WriteStats, compress
+from influx_cache import invalidate_caches
+from influx_query import (build_select, build_last_point, build_last_points, build_aggregated,
+                          resolve_window, results_to_dataframes, series_frames_to_rows)
+from influx_follow import WatermarkStore, FollowCursor, watermark_store
+
+
+class AsyncInfluxDBManager:
+    """Асинхронное чтение и запись InfluxDB с ограничением параллельности"""
+
+    def __init__(self, config_data: Optional[Dict] = None,
+                 max_concurrency: int = 100,
+                 pool_size: int = 100,
+                 timeout: Optional[float] = None,
+                 batch_size: int = 5000,
+                 username: str = 'root',
+                 password: str = 'root',
+                 gzip: Optional[bool] = None):
+        """
+        Args:
+            config_data: Конфигурация подключения (по умолчанию config.INFLUX)
+            max_concurrency: Максимум одновременно выполняемых запросов
+            pool_size: Максимум открытых HTTP-соединений
+            timeout: Таймаут HTTP-запроса, с
+            batch_size: Максимум точек в одном запросе записи
+            username: Имя пользователя
+            password: Пароль
+            gzip: Сжимать тела запросов записи (по умолчанию - gzip_ из конфигурации)
+        """
+        self.config = InfluxDBManager._load_config(config_data)
+        if gzip is not None:
+            self.config.gzip = gzip
+        self.write_stats = WriteStats()
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.batch_size = batch_size
+        credentials = base64.b64encode(f'{username}:{password}'.encode('utf-8')).decode('ascii')
+        self._headers = {'Authorization': f'Basic {credentials}'}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def base_url(self) -> str:
+        scheme = 'https' if self.config.ssl else 'http'
+        return f'{scheme}://{self.config.ip}:{self.config.port}'
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Сессия создаётся лениво внутри работающего цикла событий"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers=self._headers
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def close(self) -> None:
+        """Закрытие HTTP-сессии"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def query(self, query: str,
+                    database: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Выполнение запроса /query
+
+        Returns:
+            List[Dict]: Список results ответа InfluxDB
+        """
+        session = self._get_session()
+        params = {'db': database or self.config.db_name, 'q': query}
+        async with self._semaphore:
+            async with session.get(f'{self.base_url}/query', params=params,
+                                   headers={'Accept': 'application/json'}) as response:
+                body = await response.json(content_type=None)
+                if response.status != 200:
+                    raise RuntimeError(f"{response.status}: {body.get('error', body)}")
+        return body.get('results', [])
+
+    async def write_lines(self, payload: bytes,
+                          database: Optional[str] = None,
+                          precision: Optional[str] = None) -> bool:
+        """Отправка тела запроса в формате line protocol (ошибки - исключения)"""
+        if not payload:
+            return True
+        session = self._get_session()
+        db_name = database or self.config.db_name
+        params = {'db': db_name}
+        if precision:
+            params['precision'] = wire_precision(precision)
+        headers = {'Content-Type': 'application/octet-stream'}
+        body = payload
+        if self.config.gzip:
+            body = compress(payload)
+            headers['Content-Encoding'] = 'gzip'
+        try:
+            async with self._semaphore:
+                async with session.post(f'{self.base_url}/write', params=params, data=body,
+                                        headers=headers) as response:
+                    if response.status != 204:
+                        raise RuntimeError(f'{response.status}: {await response.text()}')
+        finally:
+            # общий кэш чтения процесса (как после записи EnhancedInfluxDBManager)
+            invalidate_caches(db_name, payload=payload)
+        self.write_stats.add(payload.count(b'\n'), len(payload), len(body))
+        return True
+
+    async def _write_batched(self, lines: List[str], database: Optional[str],
+                             precision: Optional[str] = None) -> bool:
+        await asyncio.gather(*[self.write_lines(payload, database, precision)
+                               for payload in iter_line_batches(lines, self.batch_size)])
+        return True
+
+    async def _read_frame(self, query: str, measurement: str,
+                          database: Optional[str]) -> Optional[pd.DataFrame]:
+        results = await self.query(query, database)
+        frames = results_to_dataframes(results[0]) if results else {}
+        return frames.get(measurement)
+
+    async def write_points(self, points: Union[List[InfluxDataPoint], InfluxBatch],
+                           database: Optional[str] = None) -> bool:
+        """Запись списка точек данных или столбцовой пачки InfluxBatch"""
+        try:
+            if isinstance(points, InfluxBatch):
+                precision = self.config.time_precision.get(points.measurement)
+                groups = {precision: points.to_lines(precision or 'ns')}
+            else:
+                groups = EnhancedInfluxDBManager._points_lines(points, self.config.time_precision)
+            await asyncio.gather(*[self._write_batched(lines, database, precision)
+                                   for precision, lines in groups.items()])
+            return True
+        except Exception as e:
+            print(f"Ошибка при записи точек: {e}")
+            return False
+
+    async def write_dataframe_enhanced(self, dataframe: pd.DataFrame,
+                                       measurement: str,
+                                       tag_columns: List[str] = None,
+                                       field_columns: List[str] = None,
+                                       timestamp_column: str = None,
+                                       additional_tags: Dict[str, str] = None,
+                                       database: Optional[str] = None) -> bool:
+        """
+        Запись DataFrame (см. EnhancedInfluxDBManager.write_dataframe_enhanced)
+
+        Кодирование выполняется в пуле потоков, чтобы не блокировать цикл событий.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+            precision = self.config.time_precision.get(measurement)
+            lines = await loop.run_in_executor(
+                None, EnhancedInfluxDBManager._dataframe_lines, dataframe, measurement,
+                tag_columns, field_columns, timestamp_column, additional_tags,
+                precision or 'ns')
+            return await self._write_batched(lines, database, precision)
+        except Exception as e:
+            print(f"Ошибка при записи DataFrame: {e}")
+            return False
+
+    async def read_data(self, measurement: str,
+                        start_time: Optional[str] = None,
+                        end_time: Optional[str] = None,
+                        fields: Optional[List[str]] = None,
+                        tags: Optional[Dict[str, str]] = None,
+                        database: Optional[str] = None,
+                        time_zone: str = 'Etc/GMT-3') -> pd.DataFrame:
+        """Чтение данных с фильтрацией (см. EnhancedInfluxDBManager.read_data)"""
+        if start_time is not None:
+            start_time = pd.Timestamp(start_time)
+            end_time = pd.Timestamp(end_time) if end_time else pd.Timestamp(start_time)
+        try:
+            query = build_select(measurement, start_time, end_time, fields, tags, time_zone)
+            df = await self._read_frame(query, measurement, database)
+            if df is None:
+                return pd.DataFrame()
+            if time_zone and not df.empty:
+                df = df.tz_convert(time_zone)
+            return df
+        except Exception as e:
+            print(f"Ошибка при чтении из InfluxDB: {e}")
+            return pd.DataFrame()
+
+    async def read_last_point(self, measurement: str,
+                              tags: Optional[Dict[str, str]] = None,
+                              database: Optional[str] = None) -> pd.DataFrame:
+        """Чтение последней точки данных"""
+        try:
+            df = await self._read_frame(build_last_point(measurement, tags),
+                                        measurement, database)
+            return pd.DataFrame() if df is None else df
+        except Exception as e:
+            print(f"Ошибка при чтении последней точки: {e}")
+            return pd.DataFrame()
+
+    async def read_last_points(self, measurement: str,
+                               tag_filters: Optional[List[Dict[str, str]]] = None,
+                               group_by: Optional[Union[str, List[str]]] = None,
+                               tags: Optional[Dict[str, str]] = None,
+                               database: Optional[str] = None,
+                               lookback: str = '1d') -> pd.DataFrame:
+        """Последняя точка многих серий одним запросом (см. EnhancedInfluxDBManager.read_last_points)"""
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        try:
+            query = build_last_points(measurement, tag_filters, group_by, tags, lookback)
+            results = await self.query(query, database)
+            frames = results_to_dataframes(results[0]) if results else {}
+            return series_frames_to_rows(frames, measurement)
+        except Exception as e:
+            print(f"Ошибка при чтении последних точек: {e}")
+            return pd.DataFrame()
+
+    async def follow(self, measurement: str,
+                     tags: Optional[Dict[str, str]] = None,
+                     fields: Optional[List[str]] = None,
+                     database: Optional[str] = None,
+                     poll_interval: float = 5.0,
+                     since=None,
+                     watermarks: Optional[Union[str, WatermarkStore]] = None,
+                     time_zone: Optional[str] = 'Etc/GMT-3',
+                     batch_size: int = 10000,
+                     stop: Optional[asyncio.Event] = None):
+        """
+        Асинхронный итератор новых точек (см. EnhancedInfluxDBManager.follow)
+
+        Пример:
+            async for df in manager.follow('basic', tags={'Equipment': 'T1'},
+                                           watermarks='follow.json'):
+                process(df)
+        """
+        db_name = database or self.config.db_name
+        store = watermark_store(watermarks)
+        cursor = FollowCursor(store, store.key(db_name, measurement, tags), since, batch_size)
+
+        while stop is None or not stop.is_set():
+            more = False
+            try:
+                query = cursor.query(measurement, fields, tags)
+                df, more = cursor.accept(await self._read_frame(query, measurement, db_name))
+            except Exception as e:
+                print(f"Ошибка при чтении новых точек: {e}")
+                df = None
+
+            if df is not None:
+                yield df.tz_convert(time_zone) if time_zone else df
+            cursor.commit()
+            if more:
+                continue
+            if stop is not None:
+                try:
+                    await asyncio.wait_for(stop.wait(), poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(poll_interval)
+
+    async def read_aggregated_data(self, measurement: str,
+                                   start_time: str,
+                                   end_time: str,
+                                   aggregation: Union[str, List[str]] = 'mean',
+                                   window: str = '1h',
+                                   fields: Optional[List[str]] = None,
+                                   tags: Optional[Dict[str, str]] = None,
+                                   database: Optional[str] = None,
+                                   max_points: Optional[int] = None,
+                                   row_budget: Optional[int] = None,
+                                   on_budget: str = 'coarsen') -> pd.DataFrame:
+        """Чтение агрегированных данных (см. EnhancedInfluxDBManager.read_aggregated_data)"""
+        try:
+            start_time, end_time = pd.Timestamp(start_time), pd.Timestamp(end_time)
+            window = resolve_window(start_time, end_time, window, max_points,
+                                    row_budget or self.config.row_budget, on_budget)
+            query = build_aggregated(measurement, start_time, end_time,
+                                     aggregation, window, fields, tags)
+            df = await self._read_frame(query, measurement, database)
+            return pd.DataFrame() if df is None else df
+        except Exception as e:
+            print(f"Ошибка при чтении агрегированных данных: {e}")
+            return pd.DataFrame()
@@ -0,0 +1,203 @@
+"""
+Параллельная запись line protocol в InfluxDB пачками
+
+Строки делятся на пачки ограниченного размера (по числу точек и/или
+байтам), пачки через ограниченную очередь (backpressure) передаются
+N рабочим потокам (собственным или долгоживущего пула потоков, общего
+для всех вызовов). Пачки, не записанные из-за сетевого сбоя или ответов
+5xx, 408, 429, повторяются с экспоненциальной задержкой (send повторов
+не делает); по итогам возвращается отчёт по каждой пачке.
+"""
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Executor, wait
+from dataclasses import dataclass, field
+from typing import Optional, Callable, Iterable, List, Any
+
+import requests
+from influxdb.exceptions import InfluxDBClientError, InfluxDBServerError
+
+from influx_line_protocol import iter_line_batches
+from influx_metrics import current_span, use_span
+
+
+@dataclass
+class ChunkResult:
+    """Результат записи одной пачки"""
+    index: int
+    points: int
+    bytes: int
+    success: bool = False
+    attempts: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class WriteReport:
+    """Отчёт о пакетной записи"""
+    chunks: List[ChunkResult] = field(default_factory=list)
+
+    @property
+    def points_written(self) -> int:
+        return sum(c.points for c in self.chunks if c.success)
+
+    @property
+    def points_failed(self) -> int:
+        return sum(c.points for c in self.chunks if not c.success)
+
+    @property
+    def failed_chunks(self) -> List[ChunkResult]:
+        return [c for c in self.chunks if not c.success]
+
+    @property
+    def success(self) -> bool:
+        return not self.failed_chunks
+
+    def __bool__(self) -> bool:
+        return self.success
+
+
+# сетевые сбои, после которых запрос может пройти
+_RETRYABLE_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                     ConnectionError, TimeoutError, InfluxDBServerError)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Повторять ли запись после ошибки (сетевые сбои, 5xx, 408, 429)"""
+    if isinstance(error, InfluxDBClientError):
+        return error.code in (408, 429) or (error.code or 0) >= 500
+    return isinstance(error, _RETRYABLE_ERRORS)
+
+
+def retry_delay(attempt: int, backoff: float = 0.5, max_backoff: float = 30.0) -> float:
+    """Задержка перед повтором attempt (с 1): экспоненциальная, со случайной долей"""
+    delay = min(max_backoff, backoff * 2 ** (attempt - 1))
+    return delay * (0.5 + random.random() / 2)
+
+
+class BatchWriter:
+    """Пакетная запись с пулом рабочих потоков и повторами"""
+
+    def __init__(self, send: Callable[[bytes], Any],
+                 chunk_points: Optional[int] = 5000,
+                 chunk_bytes: Optional[int] = None,
+                 workers: int = 4,
+                 queue_size: Optional[int] = None,
+                 retries: int = 3,
+                 backoff: float = 0.5,
+                 max_backoff: float = 30.0,
+                 executor: Optional[Executor] = None):
+        """
+        Args:
+            send: Функция отправки тела запроса, одна попытка (исключение -
+                неудача; повторы - здесь, см. is_retryable)
+            chunk_points: Максимум точек в пачке
+            chunk_bytes: Максимальный размер пачки в байтах
+            workers: Число потоков отправки
+            queue_size: Ёмкость очереди пачек (по умолчанию 2 * workers)
+            retries: Число повторов неудачной пачки
+            backoff: Начальная задержка перед повтором, с
+            max_backoff: Максимальная задержка перед повтором, с
+            executor: Долгоживущий пул потоков для рабочих циклов (по
+                умолчанию - новые потоки на каждый вызов write_lines)
+        """
+        self.send = send
+        self.chunk_points = chunk_points
+        self.chunk_bytes = chunk_bytes
+        self.workers = max(1, int(workers))
+        self.queue_size = queue_size or 2 * self.workers
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.executor = executor
+
+    def _send_chunk(self, payload: bytes, result: ChunkResult) -> None:
+        while True:
+            result.attempts += 1
+            try:
+                self.send(payload)
+                result.success = True
+                result.error = None
+                return
+            except Exception as e:
+                result.error = str(e)
+                if result.attempts > self.retries or not is_retryable(e):
+                    current_span().fail(e)
+                    return
+                current_span().add(retries=1)
+                time.sleep(retry_delay(result.attempts, self.backoff, self.max_backoff))
+
+    def _worker(self, chunks: queue.Queue, parent) -> None:
+        with use_span(parent):
+            while True:
+                item = chunks.get()
+                if item is None:
+                    return
+                self._send_chunk(*item)
+
+    @staticmethod
+    def _fail_all(report: WriteReport, batches: Iterable[bytes],
+                  error: Exception) -> WriteReport:
+        """Отчёт, в котором все пачки не записаны из-за error"""
+        current_span().fail(error)
+        for index, payload in enumerate(batches):
+            report.chunks.append(ChunkResult(index, payload.count(b'\n'), len(payload),
+                                             error=str(error)))
+        return report
+
+    def write_lines(self, lines: Iterable[str]) -> WriteReport:
+        """
+        Запись строк line protocol
+
+        Args:
+            lines: Строки line protocol (может быть генератором)
+
+        Returns:
+            WriteReport: Отчёт по пачкам в порядке их формирования
+        """
+        report = WriteReport()
+        batches = iter_line_batches(lines, self.chunk_points, self.chunk_bytes)
+
+        if self.workers == 1:
+            for index, payload in enumerate(batches):
+                result = ChunkResult(index, payload.count(b'\n'), len(payload))
+                report.chunks.append(result)
+                self._send_chunk(payload, result)
+            return report
+
+        chunks = queue.Queue(maxsize=self.queue_size)
+        if self.executor is not None:
+            # рабочие циклы в потоках общего пула: потоки и их клиенты
+            # переиспользуются между вызовами
+            workers = []
+            try:
+                for _ in range(self.workers):
+                    workers.append(self.executor.submit(self._worker, chunks, current_span()))
+            except RuntimeError as e:
+                # пул потоков закрыт (close_pools): пачки не отправляются
+                for _ in workers:
+                    chunks.put(None)
+                wait(workers)
+                return self._fail_all(report, batches, e)
+        else:
+            workers = [threading.Thread(target=self._worker, args=(chunks, current_span()), daemon=True)
+                       for _ in range(self.workers)]
+            for thread in workers:
+                thread.start()
+        try:
+            for index, payload in enumerate(batches):
+                result = ChunkResult(index, payload.count(b'\n'), len(payload))
+                report.chunks.append(result)
+                # put() блокируется, пока потоки не разгрузят очередь
+                chunks.put((payload, result))
+        finally:
+            for _ in workers:
+                chunks.put(None)
+            if self.executor is not None:
+                wait(workers)
+            else:
+                for thread in workers:
+                    thread.join()
+        return report
@@ -0,0 +1,244 @@
+"""
+Кэш результатов чтения InfluxDB в памяти процесса
+
+Ключ - нормализованный запрос (сервер, база, измерение, поля, теги,
+интервал, часовой пояс). Вытеснение LRU по суммарному объёму DataFrame.
+Интервалы, закончившиеся в прошлом, хранятся без срока, интервалы,
+захватывающие текущий момент, - не дольше ttl секунд.
+
+Кэш результатов read_data/read_DF_from_influxDB один на процесс
+(shared_cache). Запись в измерение через менеджер или функции database
+удаляет его записи из всех кэшей процесса (invalidate_caches).
+"""
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Tuple, Set, Hashable
+
+import pandas as pd
+
+
+def _time_key(value, time_zone: Optional[str] = None) -> Optional[int]:
+    """Время в нс UTC; время без зоны - в зоне запроса tz() или UTC, как у InfluxDB"""
+    if value is None:
+        return None
+    value = pd.Timestamp(value)
+    if value.tzinfo is None and time_zone:
+        value = value.tz_localize(time_zone)
+    return value.value
+
+
+def measurements_in_payload(payload: bytes) -> Set[str]:
+    """Имена измерений в теле запроса line protocol"""
+    names = set()
+    for line in payload.split(b'\n'):
+        if not line or line.startswith(b'#'):
+            continue
+        name = line.split(b' ', 1)[0].split(b',', 1)[0]
+        names.add(name.replace(b'\\', b'').decode('utf-8'))
+    return names
+
+
+@dataclass
+class _Entry:
+    frame: pd.DataFrame
+    size: int
+    expires: Optional[float]
+
+
+class QueryCache:
+    """LRU-кэш DataFrame по нормализованному запросу с TTL для открытых интервалов"""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024,
+                 ttl: float = 60.0):
+        """
+        Args:
+            max_bytes: Лимит суммарного объёма DataFrame в кэше
+            ttl: Время жизни результатов для интервалов, захватывающих
+                текущий момент (или без конца), с
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Hashable, _Entry]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # растёт при каждой инвалидации; для каждой базы и измерения
+        # запоминается номер последней инвалидации: результат запроса,
+        # начатого до записи в измерение, не попадает в кэш после неё,
+        # а запросы к другим измерениям записью не затрагиваются
+        self.generation = 0
+        self._invalidated: Dict[Tuple[Optional[str], Optional[str]], int] = {}
+        _caches.add(self)
+
+    @staticmethod
+    def key(database: str, measurement: str,
+            fields: Optional[List[str]] = None,
+            tags: Optional[Dict[str, Any]] = None,
+            start=None, end=None,
+            time_zone: Optional[str] = None,
+            server: Optional[Tuple[str, int]] = None) -> tuple:
+        """Нормализованный ключ запроса"""
+        return (server, database, measurement,
+                tuple(fields) if fields else None,
+                tuple(sorted((str(k), str(v)) for k, v in tags.items())) if tags else None,
+                _time_key(start, time_zone), _time_key(end, time_zone),
+                time_zone or None)
+
+    def get(self, key: tuple) -> Optional[pd.DataFrame]:
+        """Копия сохранённого результата или None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires is not None and entry.expires < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.frame.copy()
+
+    def put(self, key: tuple, frame: pd.DataFrame, end=None,
+            generation: Optional[int] = None,
+            time_zone: Optional[str] = None,
+            ttl: Optional[float] = None) -> None:
+        """
+        Сохранение результата запроса
+
+        Args:
+            key: Ключ запроса (см. QueryCache.key)
+            frame: Результат запроса
+            end: Конец интервала запроса; если он в прошлом,
+                результат хранится без срока
+            generation: Значение generation до выполнения запроса; результат
+                не сохраняется, если после него были записи в измерение key
+            time_zone: Зона tz() запроса (для end без зоны)
+            ttl: Время жизни этого результата, с (по умолчанию self.ttl)
+        """
+        if frame is None:
+            return
+        size = int(frame.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            return
+        expires = None
+        if end is None or _time_key(end, time_zone) >= time.time_ns():
+            expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if generation is not None and self._invalidated_since(key, generation):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(frame.copy(), size, expires)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, database: Optional[str] = None,
+                   measurement: Optional[str] = None) -> int:
+        """
+        Удаление записей базы и/или измерения (без аргументов - всех)
+
+        Returns:
+            int: Число удалённых записей
+        """
+        with self._lock:
+            keys = [k for k in self._entries
+                    if (database is None or k[1] == database)
+                    and (measurement is None or k[2] == measurement)]
+            for k in keys:
+                self._remove(k)
+            self.generation += 1
+            self._invalidated[(database, measurement)] = self.generation
+            return len(keys)
+
+    def invalidate_payload(self, payload: bytes, database: Optional[str] = None) -> int:
+        """Удаление записей измерений, в которые пишется payload"""
+        return sum(self.invalidate(database, name)
+                   for name in measurements_in_payload(payload))
+
+    def clear(self) -> None:
+        """Очистка кэша и счётчиков"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+            self.generation += 1
+            self._invalidated = {(None, None): self.generation}
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Счётчики попаданий, промахов, вытеснений и объём кэша"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions,
+                    'entries': len(self._entries), 'bytes': self._bytes}
+
+    def _invalidated_since(self, key: tuple, generation: int) -> bool:
+        """Были ли после generation инвалидации, затрагивающие ключ key"""
+        if self.generation == generation:
+            return False
+        database, measurement = (key[1], key[2]) if len(key) > 2 else (None, None)
+        return max(self._invalidated.get((None, None), 0),
+                   self._invalidated.get((database, None), 0),
+                   self._invalidated.get((None, measurement), 0),
+                   self._invalidated.get((database, measurement), 0)) > generation
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+
+# Все кэши процесса (для инвалидации при записи) и общий кэш результатов чтения
+_caches: 'weakref.WeakSet[QueryCache]' = weakref.WeakSet()
+_shared: Optional[QueryCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache(max_bytes: int = 256 * 1024 * 1024,
+                 ttl: float = 60.0) -> QueryCache:
+    """
+    Общий для процесса кэш результатов чтения
+
+    Первый вызов создаёт кэш, последующие меняют его лимит и ttl.
+
+    Args:
+        max_bytes: Лимит объёма DataFrame в кэше
+        ttl: Время жизни результатов для открытых интервалов, с
+
+    Returns:
+        QueryCache: Общий кэш
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = QueryCache(max_bytes=max_bytes, ttl=ttl)
+        else:
+            _shared.max_bytes = max_bytes
+            _shared.ttl = ttl
+        return _shared
+
+
+def invalidate_caches(database: Optional[str] = None,
+                      measurement: Optional[str] = None,
+                      payload: Optional[bytes] = None) -> int:
+    """
+    Удаление записей измерения из всех кэшей процесса
+
+    Args:
+        database: Имя базы (None - все базы)
+        measurement: Имя измерения (None - все измерения базы)
+        payload: Тело запроса line protocol; удаляются записи измерений,
+            в которые он пишет
+
+    Returns:
+        int: Число удалённых записей
+    """
+    names = measurements_in_payload(payload) if payload is not None else [measurement]
+    return sum(cache.invalidate(database, name)
+               for cache in list(_caches) for name in names)
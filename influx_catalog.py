@@ -0,0 +1,200 @@
+"""
+Каталог схемы InfluxDB: измерения, ключи и значения тегов, ключи полей
+
+Список измерений базы читается запросом SHOW MEASUREMENTS и хранится
+ttl секунд. Схема измерения читается при первом обращении одним HTTP-запросом
+из нескольких операторов SHOW ... FROM измерение: значения тегов всей базы
+не сканируются. Запись через менеджер не сбрасывает каталог целиком: новые
+измерения сразу добавляются в список, а схема затронутых измерений
+перечитывается при следующем обращении.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Callable
+
+import pandas as pd
+from influxdb.line_protocol import quote_ident
+from influxdb.resultset import ResultSet
+
+from influx_cache import measurements_in_payload
+from influx_query import series_to_dataframe
+
+_SCHEMA_STATEMENTS = ('SHOW TAG KEYS FROM {source}', 'SHOW FIELD KEYS FROM {source}',
+                      'SHOW TAG VALUES FROM {source} WITH KEY =~ /.*/')
+
+
+@dataclass
+class MeasurementSchema:
+    """Схема одного измерения"""
+    tag_keys: List[str] = field(default_factory=list)
+    field_keys: Dict[str, str] = field(default_factory=dict)
+    tag_values: Dict[str, List[str]] = field(default_factory=dict)
+    first: Optional[pd.Timestamp] = None
+    last: Optional[pd.Timestamp] = None
+    time_range_loaded: bool = False
+
+
+def show_result(measurement: str, columns: List[str], values: List[List[Any]]) -> ResultSet:
+    """ResultSet в том виде, в каком его вернул бы оператор SHOW ... FROM measurement"""
+    result: Dict[str, Any] = {'statement_id': 0}
+    if values:
+        result['series'] = [{'name': measurement, 'columns': columns, 'values': values}]
+    return ResultSet(result)
+
+
+@dataclass
+class _DatabaseSchema:
+    # None - схема измерения не загружена или устарела после записи
+    measurements: Dict[str, Optional[MeasurementSchema]]
+    loaded_at: float
+
+
+class SchemaCatalog:
+    """Кэш схемы баз InfluxDB с TTL и инкрементальным обновлением после записи"""
+
+    def __init__(self, execute: Callable[[str, Optional[str]], List[Dict[str, Any]]],
+                 ttl: float = 60.0):
+        """
+        Args:
+            execute: Выполнение запроса из нескольких операторов:
+                execute(query, database) -> элементы results ответа
+            ttl: Время жизни схемы базы, с
+        """
+        self.execute = execute
+        self.ttl = ttl
+        self.requests = 0
+        self._databases: Dict[str, _DatabaseSchema] = {}
+        self._lock = threading.RLock()
+
+    # --- чтение ----------------------------------------------------------------
+
+    def measurements(self, database: str, refresh: bool = False) -> List[str]:
+        """Список измерений базы"""
+        return sorted(self._database(database, refresh).measurements)
+
+    def schema(self, measurement: str, database: str,
+               time_range: bool = False) -> Optional[MeasurementSchema]:
+        """
+        Схема измерения (None, если измерения нет)
+
+        Args:
+            measurement: Имя измерения
+            database: Имя базы данных
+            time_range: Загрузить также время первой и последней точки
+        """
+        db = self._database(database)
+        with self._lock:
+            if measurement not in db.measurements:
+                return None
+            schema = db.measurements[measurement]
+        if schema is None or (time_range and not schema.time_range_loaded):
+            schema = self._load_measurement(measurement, database, time_range)
+        return schema
+
+    def tag_keys(self, measurement: str, database: str) -> List[str]:
+        schema = self.schema(measurement, database)
+        return list(schema.tag_keys) if schema else []
+
+    def tag_values(self, measurement: str, key: str, database: str) -> List[str]:
+        schema = self.schema(measurement, database)
+        return list(schema.tag_values.get(key, [])) if schema else []
+
+    def field_keys(self, measurement: str, database: str) -> Dict[str, str]:
+        """Ключи полей и их типы (float, integer, string, boolean)"""
+        schema = self.schema(measurement, database)
+        return dict(schema.field_keys) if schema else {}
+
+    # --- обновление ------------------------------------------------------------
+
+    def refresh(self, database: str) -> None:
+        """Перечитать список измерений базы (схемы измерений - при обращении)"""
+        results = self._execute(['SHOW MEASUREMENTS'], database)
+        names = [row[0] for series in results[0].get('series', [])
+                 for row in series.get('values', [])]
+        schemas: Dict[str, Optional[MeasurementSchema]] = dict.fromkeys(names)
+        with self._lock:
+            self._databases[database] = _DatabaseSchema(schemas, time.monotonic())
+
+    def observe_payload(self, payload: bytes, database: str) -> None:
+        """Учесть запись: новые измерения - в список, схема затронутых - устарела"""
+        with self._lock:
+            db = self._databases.get(database)
+            if db is None:
+                return
+            for name in measurements_in_payload(payload):
+                db.measurements[name] = None
+
+    def forget(self, measurement: str, database: str) -> None:
+        """Удалить измерение из каталога (после DROP MEASUREMENT)"""
+        with self._lock:
+            db = self._databases.get(database)
+            if db is not None:
+                db.measurements.pop(measurement, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._databases.clear()
+
+    # --- внутреннее ------------------------------------------------------------
+
+    def _database(self, database: str, refresh: bool = False) -> _DatabaseSchema:
+        with self._lock:
+            db = self._databases.get(database)
+        if refresh or db is None or time.monotonic() - db.loaded_at > self.ttl:
+            self.refresh(database)
+            with self._lock:
+                db = self._databases[database]
+        return db
+
+    def _execute(self, statements: List[str], database: str) -> List[Dict[str, Any]]:
+        self.requests += 1
+        results = self.execute('; '.join(statements), database)
+        for result in results:
+            if 'error' in result:
+                raise RuntimeError(result['error'])
+        return results
+
+    def _load_measurement(self, measurement: str, database: str,
+                          time_range: bool) -> MeasurementSchema:
+        source = quote_ident(measurement)
+        statements = [s.format(source=source) for s in _SCHEMA_STATEMENTS]
+        if time_range:
+            statements += [f'SELECT * FROM {quote_ident(measurement)} ORDER BY time ASC LIMIT 1',
+                           f'SELECT * FROM {quote_ident(measurement)} ORDER BY time DESC LIMIT 1']
+        results = self._execute(statements, database)
+        schema = MeasurementSchema()
+        self._apply({measurement: schema}, results[:3])
+        if time_range:
+            schema.first, schema.last = (self._point_time(r) for r in results[3:5])
+            schema.time_range_loaded = True
+        with self._lock:
+            db = self._databases.get(database)
+            if db is not None:
+                db.measurements[measurement] = schema
+        return schema
+
+    @staticmethod
+    def _apply(schemas: Dict[str, MeasurementSchema],
+               results: List[Dict[str, Any]]) -> None:
+        """Разбор ответов SHOW TAG KEYS, SHOW FIELD KEYS, SHOW TAG VALUES"""
+        tag_keys, field_keys, tag_values = results
+        for series in tag_keys.get('series', []):
+            if series['name'] in schemas:
+                schemas[series['name']].tag_keys = [row[0] for row in series['values']]
+        for series in field_keys.get('series', []):
+            if series['name'] in schemas:
+                schemas[series['name']].field_keys = {row[0]: row[1] for row in series['values']}
+        for series in tag_values.get('series', []):
+            if series['name'] in schemas:
+                values = schemas[series['name']].tag_values
+                for key, value in series['values']:
+                    values.setdefault(key, []).append(value)
+
+    @staticmethod
+    def _point_time(result: Dict[str, Any]) -> Optional[pd.Timestamp]:
+        for series in result.get('series', []):
+            df = series_to_dataframe(series)
+            if not df.empty:
+                return df.index[0]
+        return None
@@ -0,0 +1,175 @@
+"""
+Чтение новых точек измерения по отметке времени (follow/tail)
+
+Для каждой пары (измерение, набор тегов) хранится отметка - время
+последней выданной точки. Очередной опрос запрашивает только
+time > отметка, поэтому уже переданные строки повторно не читаются.
+Отметки можно сохранять в файл: перезапущенный потребитель продолжит
+с места остановки.
+
+Отметка сдвигается, когда потребитель запрашивает следующий DataFrame,
+то есть после обработки предыдущего (доставка "хотя бы один раз").
+Точки, записанные позже с временем не больше отметки, не выдаются.
+
+Если весь ответ с LIMIT пришёлся на одну метку времени, точки этой метки
+дочитываются страницами (time = метка, OFFSET), и только потом отметка
+сдвигается за неё (FollowCursor).
+"""
+import json
+import os
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+
+import pandas as pd
+
+from influx_line_protocol import timestamps_to_ns
+from influx_query import build_follow, build_follow_instant
+
+
+class WatermarkStore:
+    """Отметки времени последних прочитанных точек с сохранением в JSON-файл"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: Файл отметок (None - только в памяти)
+        """
+        self.path = path
+        self._marks: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self._marks = {k: int(v) for k, v in json.load(f).items()}
+
+    @staticmethod
+    def key(database: str, measurement: str,
+            tags: Optional[Dict[str, Any]] = None) -> str:
+        """Ключ отметки: база/измерение/k1=v1,k2=v2"""
+        tag_set = ','.join(f'{k}={v}' for k, v in sorted((tags or {}).items()))
+        return f'{database}/{measurement}/{tag_set}'
+
+    def get(self, key: str) -> Optional[int]:
+        """Отметка в нс UTC или None"""
+        with self._lock:
+            return self._marks.get(key)
+
+    def set(self, key: str, time_ns: int) -> None:
+        """Сдвиг отметки (сохраняется в файл, если он задан)"""
+        with self._lock:
+            self._marks[key] = int(time_ns)
+            if self.path:
+                self._save()
+
+    def _save(self) -> None:
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._marks, f)
+        os.replace(tmp_path, self.path)
+
+
+def watermark_store(watermarks) -> WatermarkStore:
+    """WatermarkStore из пути к файлу, готового хранилища или None"""
+    if isinstance(watermarks, WatermarkStore):
+        return watermarks
+    return WatermarkStore(watermarks)
+
+
+def initial_mark(since=None) -> int:
+    """Начальная отметка: since или текущий момент (только новые точки)"""
+    if since is None:
+        return pd.Timestamp.now(tz='UTC').value
+    return pd.Timestamp(since).value
+
+
+def trim_partial(df: pd.DataFrame, limit: Optional[int]) -> pd.DataFrame:
+    """
+    Отбросить точки последней метки времени, если ответ упёрся в LIMIT
+
+    Иначе точки других серий с той же меткой, не вошедшие в ответ,
+    были бы пропущены условием time > отметка. Если все точки ответа
+    имеют одну метку, ответ возвращается целиком (см. FollowCursor).
+    """
+    if not limit or len(df) < limit:
+        return df
+    keep = df.index < df.index[-1]
+    return df[keep] if keep.any() else df
+
+
+def last_mark(df: pd.DataFrame) -> int:
+    """Новая отметка - время последней строки в нс UTC"""
+    return int(timestamps_to_ns(df.index[-1:])[0])
+
+
+class FollowCursor:
+    """
+    Состояние опроса follow для одного ключа отметки
+
+    Порядок работы: query() - текст очередного запроса, accept(df) -
+    разбор успешного ответа, commit() - сдвиг отметки после того, как
+    потребитель обработал выданный DataFrame.
+    """
+
+    def __init__(self, store: WatermarkStore, key: str,
+                 since=None, limit: Optional[int] = None):
+        """
+        Args:
+            store: Хранилище отметок
+            key: Ключ отметки (WatermarkStore.key)
+            since: Начальная отметка, если сохранённой нет
+            limit: LIMIT запроса (batch_size)
+        """
+        self.store = store
+        self.key = key
+        self.limit = limit
+        mark = store.get(key)
+        self.mark = initial_mark(since) if mark is None else mark
+        # метка времени, точки которой дочитываются страницами, и число прочитанных
+        self.instant: Optional[int] = None
+        self.offset = 0
+        self._pending: Optional[int] = None
+
+    def query(self, measurement: str,
+              fields: Optional[List[str]] = None,
+              tags: Optional[Dict[str, Any]] = None) -> str:
+        """Запрос точек новее отметки или следующей страницы дочитываемой метки"""
+        if self.instant is None:
+            return build_follow(measurement, self.mark, fields, tags, self.limit)
+        return build_follow_instant(measurement, self.instant, fields, tags,
+                                    self.limit, self.offset)
+
+    def accept(self, df: Optional[pd.DataFrame]) -> Tuple[Optional[pd.DataFrame], bool]:
+        """
+        Разбор ответа на запрос query()
+
+        Args:
+            df: Точки ответа (None или пустой DataFrame - новых точек нет)
+
+        Returns:
+            Tuple: (DataFrame для выдачи или None, повторить опрос без паузы)
+        """
+        empty = df is None or df.empty
+        full = not empty and bool(self.limit) and len(df) >= self.limit
+        if self.instant is not None:
+            if not full:
+                # метка дочитана - отметка сдвигается за неё
+                self._pending, self.instant, self.offset = self.instant, None, 0
+                if empty:
+                    self.commit()
+            else:
+                self.offset += len(df)
+            return (None if empty else df), True
+        if empty:
+            return None, False
+        if full and df.index[0] == df.index[-1]:
+            # весь ответ - одна метка времени: она дочитывается страницами
+            self.instant, self.offset = last_mark(df), len(df)
+            return df, True
+        df = trim_partial(df, self.limit)
+        self._pending = last_mark(df)
+        return df, full
+
+    def commit(self) -> None:
+        """Сдвиг отметки после обработки выданного DataFrame"""
+        if self._pending is not None:
+            self.mark, self._pending = self._pending, None
+            self.store.set(self.key, self.mark)
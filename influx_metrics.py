@@ -0,0 +1,394 @@
+"""
+Метрики и трассировка операций чтения и записи InfluxDB
+
+Каждая операция (чтение, запись, запрос схемы) выполняется внутри Span:
+время выполнения, число строк/точек, переданные байты, повторы и ошибка
+с тегами operation и measurement. Транспорт (пул соединений, пакетная
+запись) добавляет объёмы и повторы к текущему Span потока, вложенные
+Span по завершении суммируются в родительский.
+
+По умолчанию инструментирование выключено (Instrumentation ничего не
+делает). Для сбора метрик:
+
+    registry = MetricsRegistry()
+    set_instrumentation(registry)
+    serve_prometheus(registry, port=9108)    # или registry.to_prometheus()
+
+Собственная обработка (трассировка, журнал) - через listener:
+
+    registry.add_listener(lambda span: print(span))
+"""
+import functools
+import inspect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Dict, Any, List, Callable, Tuple
+
+_local = threading.local()
+
+
+def _stack() -> list:
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class Span:
+    """Одна операция: длительность, объёмы, повторы, ошибка"""
+
+    def __init__(self, sink: 'Instrumentation', operation: str,
+                 measurement: Optional[str] = None, **attrs):
+        self.sink = sink
+        self.operation = operation
+        self.measurement = measurement or ''
+        self.attrs: Dict[str, Any] = attrs
+        self.rows = 0
+        self.points = 0
+        self.bytes = 0
+        self.retries = 0
+        self.error: Optional[str] = None
+        self.error_type: Optional[str] = None
+        self.start = 0.0
+        self.duration = 0.0
+        self.parent: Optional['Span'] = None
+        # Span метода, открытый декоратором traced
+        self.traced = False
+        self._lock = threading.Lock()
+
+    def add(self, rows: int = 0, points: int = 0, bytes: int = 0, retries: int = 0) -> None:
+        """Добавить объёмы (вызывается из транспорта, в том числе из других потоков)"""
+        with self._lock:
+            self.rows += rows
+            self.points += points
+            self.bytes += bytes
+            self.retries += retries
+
+    def fail(self, error) -> None:
+        """Отметить операцию как неудачную (исключение или текст ошибки)"""
+        self.error = str(error)
+        self.error_type = type(error).__name__ if isinstance(error, BaseException) else 'Error'
+
+    def set(self, **attrs) -> None:
+        """Дополнительные атрибуты (попадание в кэш, число окон и т.п.)"""
+        self.attrs.update(attrs)
+
+    @property
+    def status(self) -> str:
+        return 'error' if self.error else 'ok'
+
+    def __enter__(self) -> 'Span':
+        stack = _stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.duration = time.perf_counter() - self.start
+        stack = _stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        if exc is not None:
+            self.fail(exc)
+        if self.parent is not None:
+            self.parent.add(self.rows, self.points, self.bytes, self.retries)
+        self.sink.record(self)
+
+    def __repr__(self) -> str:
+        return (f"Span({self.operation}, {self.measurement or '-'}, {self.status}, "
+                f"{self.duration * 1000:.1f} мс, строк: {self.rows}, точек: {self.points}, "
+                f"байт: {self.bytes}, повторов: {self.retries})")
+
+
+class _NullSpan(Span):
+    """Span выключенного инструментирования: ничего не измеряет"""
+
+    def __init__(self):
+        super().__init__(None, '')
+
+    def add(self, rows: int = 0, points: int = 0, bytes: int = 0, retries: int = 0) -> None:
+        pass
+
+    def fail(self, error) -> None:
+        pass
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def __enter__(self) -> 'Span':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Instrumentation:
+    """Инструментирование по умолчанию: ничего не делает"""
+
+    enabled = False
+
+    def span(self, operation: str, measurement: Optional[str] = None, **attrs) -> Span:
+        """Контекстный менеджер операции: with instrumentation.span('read', m) as span"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, operation, measurement, **attrs)
+
+    def record(self, span: Span) -> None:
+        """Обработка завершённой операции"""
+
+
+_instrumentation = Instrumentation()
+
+
+def get_instrumentation() -> Instrumentation:
+    return _instrumentation
+
+
+def set_instrumentation(instrumentation: Optional[Instrumentation]) -> Instrumentation:
+    """Установить инструментирование процесса (None - выключить); возвращает прежнее"""
+    global _instrumentation
+    previous = _instrumentation
+    _instrumentation = instrumentation or Instrumentation()
+    return previous
+
+
+def span(operation: str, measurement: Optional[str] = None, **attrs) -> Span:
+    """Span операции в текущем инструментировании"""
+    return _instrumentation.span(operation, measurement, **attrs)
+
+
+def current_span() -> Span:
+    """Текущий Span потока (NULL_SPAN вне операций)"""
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else NULL_SPAN
+
+
+@contextmanager
+def use_span(parent: Span):
+    """Сделать parent текущим Span в другом потоке (пулы потоков транспорта)"""
+    if parent is NULL_SPAN:
+        yield parent
+        return
+    stack = _stack()
+    stack.append(parent)
+    try:
+        yield parent
+    finally:
+        stack.remove(parent)
+
+
+def traced(operation: Optional[str] = None, measurement: str = 'measurement'):
+    """
+    Декоратор: вызов функции - Span операции
+
+    Args:
+        operation: Имя операции (по умолчанию - имя функции)
+        measurement: Имя аргумента с именем измерения
+
+    Число строк результата-DataFrame учитывается автоматически; для
+    функций-генераторов Span охватывает всю итерацию. Вызовы внутри уже
+    открытого traced-Span (метод, вызывающий другой метод) отдельной
+    операцией не считаются.
+    """
+    def decorator(func):
+        name = operation or func.__name__
+        signature = inspect.signature(func)
+        position = list(signature.parameters).index(measurement) \
+            if measurement in signature.parameters else None
+
+        def measurement_of(args, kwargs):
+            if measurement in kwargs:
+                return kwargs[measurement]
+            if position is not None and position < len(args):
+                return args[position]
+            return None
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                if not _instrumentation.enabled or current_span().traced:
+                    yield from func(*args, **kwargs)
+                    return
+                op = Span(_instrumentation, name, measurement_of(args, kwargs))
+                op.traced = True
+                op.start = time.perf_counter()
+                items = func(*args, **kwargs)
+                try:
+                    while True:
+                        # Span текущий только на время работы генератора:
+                        # между элементами поток выполняет код потребителя
+                        with use_span(op):
+                            try:
+                                item = next(items)
+                            except StopIteration:
+                                return
+                        op.add(rows=_rows(item))
+                        yield item
+                except BaseException as e:
+                    if not isinstance(e, GeneratorExit):
+                        op.fail(e)
+                    raise
+                finally:
+                    items.close()
+                    op.duration = time.perf_counter() - op.start
+                    op.sink.record(op)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _instrumentation.enabled or current_span().traced:
+                return func(*args, **kwargs)
+            with _instrumentation.span(name, measurement_of(args, kwargs)) as op:
+                op.traced = True
+                result = func(*args, **kwargs)
+                # строки результата точнее строк ответов сервера
+                rows = _rows(result)
+                if rows:
+                    op.rows = rows
+                return result
+        return wrapper
+    return decorator
+
+
+def _rows(result) -> int:
+    shape = getattr(result, 'shape', None)
+    return shape[0] if shape and not isinstance(result, (str, bytes)) else 0
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class MetricsRegistry(Instrumentation):
+    """Сбор метрик операций: гистограммы времени и счётчики по operation/measurement"""
+
+    enabled = True
+
+    def __init__(self, namespace: str = 'influx',
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Args:
+            namespace: Префикс имён метрик
+            buckets: Границы корзин гистограммы времени, с
+        """
+        self.namespace = namespace
+        self.buckets = tuple(sorted(buckets))
+        self.listeners: List[Callable[[Span], None]] = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    def add_listener(self, listener: Callable[[Span], None]) -> None:
+        """Функция, вызываемая для каждой завершённой операции"""
+        self.listeners.append(listener)
+
+    def reset(self) -> None:
+        with self._lock:
+            # (operation, measurement) -> [счётчики корзин..., сумма, число]
+            self._latency: Dict[Tuple[str, str], list] = {}
+            self._counters: Dict[str, Dict[tuple, float]] = defaultdict(lambda: defaultdict(float))
+
+    def record(self, span: Span) -> None:
+        key = (span.operation, span.measurement)
+        with self._lock:
+            latency = self._latency.get(key)
+            if latency is None:
+                latency = self._latency[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if span.duration <= bound:
+                    latency[i] += 1
+            latency[-2] += span.duration
+            latency[-1] += 1
+            counters = self._counters
+            counters['operations_total'][key + (span.status,)] += 1
+            for name in ('rows', 'points', 'bytes', 'retries'):
+                value = getattr(span, name)
+                if value:
+                    counters[f'{name}_total'][key] += value
+            if span.error:
+                counters['errors_total'][key + (span.error_type,)] += 1
+        for listener in self.listeners:
+            listener(span)
+
+    def snapshot(self) -> Dict[str, Dict[tuple, float]]:
+        """Значения счётчиков: имя -> {(operation, measurement[, status|error]): значение}"""
+        with self._lock:
+            out = {name: dict(values) for name, values in self._counters.items()}
+            out['duration_seconds_count'] = {k: v[-1] for k, v in self._latency.items()}
+            out['duration_seconds_sum'] = {k: v[-2] for k, v in self._latency.items()}
+        return out
+
+    def to_prometheus(self) -> str:
+        """Метрики в текстовом формате Prometheus"""
+        ns = self.namespace
+        lines = []
+        with self._lock:
+            lines += [f'# HELP {ns}_operation_duration_seconds Время выполнения операции',
+                      f'# TYPE {ns}_operation_duration_seconds histogram']
+            for (operation, measurement), latency in sorted(self._latency.items()):
+                labels = _labels(operation=operation, measurement=measurement)
+                for bound, count in zip(self.buckets, latency):
+                    lines.append(f'{ns}_operation_duration_seconds_bucket'
+                                 f'{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{ns}_operation_duration_seconds_bucket{{{labels},le="+Inf"}} {latency[-1]}')
+                lines.append(f'{ns}_operation_duration_seconds_sum{{{labels}}} {latency[-2]}')
+                lines.append(f'{ns}_operation_duration_seconds_count{{{labels}}} {latency[-1]}')
+            for name, extra in (('operations_total', 'status'), ('rows_total', None),
+                                ('points_total', None), ('bytes_total', None),
+                                ('retries_total', None), ('errors_total', 'error')):
+                lines += [f'# HELP {ns}_{name} {_HELP[name]}', f'# TYPE {ns}_{name} counter']
+                for key, value in sorted(self._counters.get(name, {}).items()):
+                    names = {'operation': key[0], 'measurement': key[1]}
+                    if extra:
+                        names[extra] = key[2]
+                    lines.append(f'{ns}_{name}{{{_labels(**names)}}} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+_HELP = {'operations_total': 'Число операций',
+         'rows_total': 'Прочитано строк',
+         'points_total': 'Записано точек',
+         'bytes_total': 'Передано байт (тела запросов записи и ответов чтения)',
+         'retries_total': 'Повторы запросов',
+         'errors_total': 'Ошибки операций по типу'}
+
+
+def _labels(**labels) -> str:
+    def escape(value) -> str:
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{k}="{escape(v)}"' for k, v in labels.items())
+
+
+def serve_prometheus(registry: MetricsRegistry, port: int = 9108,
+                     host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """
+    HTTP-сервер метрик (/metrics) в фоновом потоке
+
+    По умолчанию слушает только локальный интерфейс; для сбора метрик
+    с другой машины адрес задаётся явно (например, host='0.0.0.0').
+
+    Returns:
+        ThreadingHTTPServer: Сервер (остановка - shutdown())
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            body = registry.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,369 @@
+"""
+Общий пул HTTP-соединений с InfluxDB
+
+Один долгоживущий requests.Session с keep-alive и ограниченным пулом
+соединений на пару (хост, порт). Каждый поток получает собственный
+DataFrameClient поверх общего Session, поэтому потоки не закрывают
+соединения друг друга, а TCP-соединения переиспользуются между вызовами.
+Пакетная запись выполняется в долгоживущем пуле потоков пула соединений,
+так что потоки и их клиенты тоже создаются один раз.
+"""
+import gzip
+import inspect
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Dict, Tuple, Iterator, Any, List
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from influxdb import DataFrameClient
+from influxdb.exceptions import InfluxDBClientError
+
+from influx_batch_writer import is_retryable, retry_delay
+from influx_query import unpack_msgpack, results_to_dataframes
+from influx_metrics import current_span
+from influx_line_protocol import wire_precision
+
+
+# Длина запроса, сверх которой /query отправляется POST-формой, а не в адресе GET
+MAX_GET_QUERY = 4096
+
+
+@dataclass
+class WriteStats:
+    """Объём отправленных тел запросов записи до и после сжатия"""
+    requests: int = 0
+    points: int = 0
+    raw_bytes: int = 0
+    sent_bytes: int = 0
+
+    @property
+    def ratio(self) -> float:
+        """Степень сжатия: исходный объём / отправленный"""
+        return self.raw_bytes / self.sent_bytes if self.sent_bytes else 1.0
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.raw_bytes - self.sent_bytes
+
+    def add(self, points: int, raw_bytes: int, sent_bytes: int) -> None:
+        self.requests += 1
+        self.points += points
+        self.raw_bytes += raw_bytes
+        self.sent_bytes += sent_bytes
+
+    def __str__(self) -> str:
+        return (f"запросов: {self.requests}, точек: {self.points}, "
+                f"объём: {self.raw_bytes} -> {self.sent_bytes} байт "
+                f"(сжатие x{self.ratio:.2f})")
+
+
+class InfluxClientPool:
+    """Пул соединений и потоковых клиентов InfluxDB"""
+
+    def __init__(self, host: str, port: int,
+                 pool_size: int = 10,
+                 timeout: Optional[float] = None,
+                 retries: int = 3,
+                 username: str = 'root',
+                 password: str = 'root',
+                 gzip: bool = False,
+                 compresslevel: int = 6,
+                 ssl: bool = False):
+        """
+        Args:
+            host: Адрес сервера InfluxDB
+            port: Порт сервера InfluxDB
+            pool_size: Максимум одновременно открытых соединений
+            timeout: Таймаут HTTP-запроса, с
+            retries: Число повторов при сетевых ошибках
+            username: Имя пользователя
+            password: Пароль
+            gzip: Сжимать тела запросов записи по умолчанию
+            compresslevel: Уровень сжатия gzip (1 - быстрее, 9 - сильнее)
+            ssl: Подключаться по https (с проверкой сертификата)
+        """
+        self.host = host
+        self.port = int(port)
+        self.pool_size = int(pool_size)
+        self.timeout = timeout
+        self.retries = retries
+        self.username = username
+        self.password = password
+        self.gzip = gzip
+        self.compresslevel = compresslevel
+        self.ssl = bool(ssl)
+        self.scheme = 'https' if self.ssl else 'http'
+        self.pid = os.getpid()
+        self.write_stats = WriteStats()
+
+        self._session = requests.Session()
+        # pool_block: при нехватке соединений потоки ждут свободное,
+        # а не открывают новые TCP-соединения вне пула
+        self._adapter = HTTPAdapter(pool_connections=self.pool_size,
+                                    pool_maxsize=self.pool_size,
+                                    pool_block=True)
+        self._session.mount(f'{self.scheme}://', self._adapter)
+        # ответы /query принимаются сжатыми, распаковка - на стороне requests
+        self._session.headers['Accept-Encoding'] = 'gzip, deflate'
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._executor = None
+        self.closed = False
+
+    def client(self) -> DataFrameClient:
+        """Клиент текущего потока поверх общего пула соединений"""
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            with self._lock:
+                client = DataFrameClient(
+                    host=self.host,
+                    port=self.port,
+                    username=self.username,
+                    password=self.password,
+                    timeout=self.timeout,
+                    retries=self.retries,
+                    ssl=self.ssl,
+                    verify_ssl=self.ssl,
+                    session=self._session
+                )
+                # InfluxDBClient монтирует в Session собственный адаптер -
+                # возвращаем общий, чтобы не терять открытые соединения
+                self._session.mount(f'{self.scheme}://', self._adapter)
+            self._local.client = client
+        return client
+
+    @property
+    def base_url(self) -> str:
+        """Адрес сервера со схемой клиентов пула"""
+        return f'{self.scheme}://{self.host}:{self.port}'
+
+    def executor(self) -> ThreadPoolExecutor:
+        """
+        Долгоживущий пул потоков записи (не больше pool_size потоков -
+        по числу соединений); у каждого потока свой клиент (см. client)
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_size,
+                                                    thread_name_prefix='influx-write')
+            return self._executor
+
+    def query(self, query: str, database: Optional[str] = None, **kwargs):
+        """Выполнение запроса клиентом текущего потока"""
+        return self.client().query(query, database=database, **kwargs)
+
+    def query_results(self, query: str,
+                      database: Optional[str] = None,
+                      method: str = 'GET') -> List[Dict[str, Any]]:
+        """
+        Выполнение запроса (нескольких операторов через ';') одним HTTP-запросом
+
+        Returns:
+            List[Dict]: Элементы results ответа по операторам
+        """
+        response = self.client().request(
+            url='query',
+            method=method,
+            params={'q': query, 'db': database},
+            expected_response_code=200,
+            headers={'Accept': 'application/json'}
+        )
+        current_span().add(bytes=len(response.content))
+        return response.json().get('results', [])
+
+    def query_frames(self, query: str,
+                     database: Optional[str] = None,
+                     dropna: bool = True) -> Dict[Any, pd.DataFrame]:
+        """
+        Запрос SELECT с разбором ответа по столбцам
+
+        Запрос длиннее MAX_GET_QUERY символов передаётся в теле POST.
+        Ответ запрашивается в формате MessagePack и разбирается сразу в
+        столбцы DataFrame (без ResultSet и словаря на каждую строку);
+        если сервер ответил JSON - разбирается JSON. Результат совпадает
+        с DataFrameClient.query, но время сохраняет наносекунды. Сбои
+        повторяются по тем же правилам, что и запись (is_retryable).
+
+        Returns:
+            Dict: Ключ серии (имя или (имя, ((тег, значение), ...))) -> DataFrame
+        """
+        params = {'q': query, 'db': database}
+        headers = {'Accept': 'application/x-msgpack'}
+        # длинный запрос (фильтры по тысячам значений тега) - в теле POST:
+        # адрес GET такой длины сервер отклоняет (414)
+        if len(query) > MAX_GET_QUERY:
+            request = {'method': 'POST', 'data': params}
+        else:
+            request = {'method': 'GET', 'params': params}
+        span = current_span()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = self._session.request(url=f'{self.base_url}/query',
+                                                 headers=headers,
+                                                 auth=(self.username, self.password),
+                                                 verify=self.ssl,
+                                                 timeout=self.timeout,
+                                                 **request)
+                if response.headers.get('Content-Type', '').startswith('application/x-msgpack'):
+                    data = unpack_msgpack(response.content)
+                else:
+                    data = response.json() if response.content else {}
+                if response.status_code != 200:
+                    raise InfluxDBClientError(data.get('error') or response.text, response.status_code)
+                break
+            except (requests.exceptions.RequestException, InfluxDBClientError) as e:
+                if attempt > self.retries or not is_retryable(e):
+                    raise
+                span.add(retries=1)
+                time.sleep(retry_delay(attempt))
+        results = data.get('results', [])
+        frames = results_to_dataframes(results[0], dropna) if results else {}
+        span.add(rows=sum(len(df) for df in frames.values()), bytes=len(response.content))
+        return frames
+
+    def query_chunked(self, query: str,
+                      database: Optional[str] = None,
+                      chunk_size: int = 10000) -> Iterator[Dict[str, Any]]:
+        """
+        Потоковое выполнение запроса с chunked-ответом InfluxDB
+
+        Ответ читается по мере поступления, в памяти одновременно
+        находится только один фрагмент.
+
+        Yields:
+            Dict: Элемент results очередного фрагмента ответа
+        """
+        params = {'q': query, 'db': database, 'chunked': 'true'}
+        if chunk_size:
+            params['chunk_size'] = chunk_size
+        response = self.client().request(
+            url='query',
+            method='GET',
+            params=params,
+            stream=True,
+            headers={'Accept': 'application/json'}
+        )
+        try:
+            span = current_span()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                span.add(bytes=len(line))
+                for result in json.loads(line).get('results', []):
+                    yield result
+        finally:
+            response.close()
+
+    def write(self, payload: bytes,
+              database: Optional[str] = None,
+              precision: Optional[str] = None,
+              gzip: Optional[bool] = None,
+              retry: bool = False) -> bool:
+        """
+        Отправка тела запроса в формате line protocol
+
+        Args:
+            payload: Строки line protocol в кодировке utf-8
+            database: Имя базы данных
+            precision: Точность меток времени в payload (ns, us, ms, s);
+                в запрос передаётся значение wire_precision (us -> u)
+            gzip: Сжать тело запроса (по умолчанию - настройка пула)
+            retry: Повторять запрос (до retries раз) при сбоях is_retryable;
+                без него - одна попытка, повторы делает вызывающий
+                (BatchWriter, WriteSpool)
+
+        Returns:
+            bool: True; ответ сервера, отличный от 204, пробрасывается как
+                InfluxDBClientError с кодом ответа, сетевые ошибки - как
+                исключения requests
+        """
+        params = {'db': database}
+        if precision:
+            params['precision'] = wire_precision(precision)
+        headers = {'Content-Type': 'application/octet-stream'}
+        body = payload
+        if self.gzip if gzip is None else gzip:
+            body = compress(payload, self.compresslevel)
+            headers['Content-Encoding'] = 'gzip'
+        span = current_span()
+        attempt = 0
+        # запрос идёт мимо InfluxDBClient.request с его собственными повторами:
+        # повторы - только здесь (retry) или у вызывающего
+        while True:
+            attempt += 1
+            try:
+                response = self._session.post(f'{self.base_url}/write',
+                                              params=params, data=body, headers=headers,
+                                              auth=(self.username, self.password),
+                                              verify=self.ssl,
+                                              timeout=self.timeout)
+                if response.status_code != 204:
+                    raise InfluxDBClientError(response.text, response.status_code)
+                break
+            except (requests.exceptions.RequestException, InfluxDBClientError) as e:
+                if not retry or attempt > self.retries or not is_retryable(e):
+                    raise
+                span.add(retries=1)
+                time.sleep(retry_delay(attempt))
+        points = payload.count(b'\n')
+        with self._lock:
+            self.write_stats.add(points, len(payload), len(body))
+        span.add(points=points, bytes=len(body))
+        return True
+
+    def close(self) -> None:
+        """Закрытие всех соединений пула"""
+        self.closed = True
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._session.close()
+
+
+def compress(payload: bytes, compresslevel: int = 6) -> bytes:
+    """Сжатие тела запроса gzip (mtime=0 - одинаковый результат для одинаковых данных)"""
+    return gzip.compress(payload, compresslevel, mtime=0)
+
+
+_pools: Dict[Tuple[Any, ...], InfluxClientPool] = {}
+_pools_lock = threading.Lock()
+
+
+def pool_key(host: str, port: int, **kwargs) -> Tuple[Any, ...]:
+    """Ключ общего пула: сервер и все параметры пула (пропущенные - по умолчанию)"""
+    bound = inspect.signature(InfluxClientPool).bind(host, int(port), **kwargs)
+    bound.apply_defaults()
+    return tuple(bound.arguments.items())
+
+
+def get_pool(host: str, port: int, **kwargs) -> InfluxClientPool:
+    """
+    Общий для процесса пул соединений с сервером (host, port)
+
+    Пул общий для вызовов с одинаковыми параметрами (ssl, учётные данные,
+    pool_size, timeout, ...): при других параметрах создаётся отдельный пул.
+    Пулы закрываются только close_pools; после fork в дочернем процессе
+    создаётся новый пул.
+    """
+    key = pool_key(host, port, **kwargs)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.closed or pool.pid != os.getpid():
+            pool = InfluxClientPool(host, port, **kwargs)
+            _pools[key] = pool
+        return pool
+
+
+def close_pools() -> None:
+    """Закрытие всех пулов соединений процесса"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
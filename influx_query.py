@@ -0,0 +1,405 @@
+"""
+Построение запросов InfluxQL и разбор ответов /query в DataFrame
+
+Общие для синхронного и асинхронного менеджеров InfluxDB функции.
+Разбор ответа повторяет DataFrameClient.query: индекс - время UTC,
+столбцы, целиком состоящие из пропусков, удаляются.
+"""
+import math
+from collections import defaultdict
+from typing import Optional, Dict, Any, List, Union, Iterable, Iterator
+
+import msgpack
+import numpy as np
+import pandas as pd
+from influxdb.line_protocol import quote_ident, quote_literal
+
+
+def tag_condition(key: str, value) -> str:
+    """
+    Условие по одному тегу: "k"='v' или ("k"='v1' OR "k"='v2') для списка значений
+
+    Ключ всегда в кавычках (name, key и т.п. - ключевые слова InfluxQL),
+    кавычки и обратные косые черты в значениях экранируются.
+    """
+    if isinstance(value, (list, tuple, set)):
+        return '(' + ' OR '.join(f"{quote_ident(key)}={quote_literal(str(v))}" for v in value) + ')'
+    return f"{quote_ident(key)}={quote_literal(str(value))}"
+
+
+def select_list(fields: Optional[List[str]] = None) -> str:
+    """Список SELECT: * или поля/теги в кавычках"""
+    return '*' if not fields else ', '.join(quote_ident(f) for f in fields)
+
+
+def tags_condition(tags: Optional[Dict[str, Any]]) -> str:
+    """Условие по тегам вида "k='v' AND ... AND " (пустая строка без тегов)"""
+    if not tags:
+        return ''
+    conditions = [tag_condition(k, v) for k, v in tags.items()]
+    return ' AND '.join(conditions) + ' AND '
+
+
+def build_select(measurement: str,
+                 start_time=None,
+                 end_time=None,
+                 fields: Optional[List[str]] = None,
+                 tags: Optional[Dict[str, Any]] = None,
+                 time_zone: Optional[str] = None,
+                 end_inclusive: bool = True) -> str:
+    """
+    Запрос сырых данных измерения за интервал [start_time, end_time]
+    (при end_inclusive=False - за [start_time, end_time))
+    """
+    fields_select = select_list(fields)
+    if start_time is None:
+        query = f"SELECT {fields_select} FROM {measurement}"
+    else:
+        end_op = '<=' if end_inclusive else '<'
+        query = (f"SELECT {fields_select} FROM {measurement} "
+                 f"WHERE {tags_condition(tags)}time >= '{start_time}' AND time {end_op} '{end_time}'")
+    if time_zone:
+        query += f" tz('{time_zone}')"
+    return query
+
+
+def build_last_point(measurement: str,
+                     tags: Optional[Dict[str, Any]] = None) -> str:
+    """Запрос последней точки за сутки"""
+    return (f"SELECT * FROM {measurement} "
+            f"WHERE {tags_condition(tags)}time > now() - 1d "
+            f"ORDER BY time DESC LIMIT 1")
+
+
+def build_last_points(measurement: str,
+                      tag_filters: Optional[List[Dict[str, Any]]] = None,
+                      group_by: Optional[List[str]] = None,
+                      tags: Optional[Dict[str, Any]] = None,
+                      lookback: str = '1d') -> str:
+    """
+    Запрос последней точки каждой серии одним GROUP BY
+
+    Args:
+        measurement: Имя измерения
+        tag_filters: Наборы тегов серий: (набор 1) OR (набор 2) ...;
+            пустые наборы пропускаются
+        group_by: Теги группировки (по умолчанию - ключи tag_filters)
+        tags: Общий фильтр по тегам
+        lookback: Глубина поиска от текущего момента
+    """
+    tag_filters = [f for f in tag_filters or [] if f]
+    if group_by is None:
+        group_by = list(dict.fromkeys(k for f in tag_filters for k in f))
+    if not group_by:
+        raise ValueError("Не заданы теги группировки серий")
+    condition = tags_condition(tags)
+    if tag_filters:
+        alternatives = [' AND '.join(tag_condition(k, v) for k, v in f.items())
+                        for f in tag_filters]
+        condition += '(' + ' OR '.join(f'({a})' for a in alternatives) + ') AND '
+    return (f"SELECT * FROM {measurement} "
+            f"WHERE {condition}time > now() - {lookback} "
+            f"GROUP BY {', '.join(quote_ident(k) for k in group_by)} ORDER BY time DESC LIMIT 1")
+
+
+def build_follow(measurement: str,
+                 watermark_ns: int,
+                 fields: Optional[List[str]] = None,
+                 tags: Optional[Dict[str, Any]] = None,
+                 limit: Optional[int] = None) -> str:
+    """Запрос точек новее отметки watermark_ns (нс UTC) в порядке времени"""
+    fields_select = select_list(fields)
+    query = (f"SELECT {fields_select} FROM {measurement} "
+             f"WHERE {tags_condition(tags)}time > {int(watermark_ns)} "
+             f"ORDER BY time ASC")
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    return query
+
+
+def build_follow_instant(measurement: str,
+                         time_ns: int,
+                         fields: Optional[List[str]] = None,
+                         tags: Optional[Dict[str, Any]] = None,
+                         limit: Optional[int] = None,
+                         offset: int = 0) -> str:
+    """Страница точек с меткой времени time_ns (нс UTC): LIMIT limit OFFSET offset"""
+    fields_select = select_list(fields)
+    query = (f"SELECT {fields_select} FROM {measurement} "
+             f"WHERE {tags_condition(tags)}time = {int(time_ns)}")
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    if offset:
+        query += f" OFFSET {int(offset)}"
+    return query
+
+
+# Окна GROUP BY time(), из которых выбирается автоматическое
+_WINDOW_LADDER = ['1s', '5s', '10s', '15s', '30s', '1m', '5m', '10m', '15m', '30m',
+                  '1h', '2h', '3h', '6h', '12h', '1d', '7d', '30d']
+
+
+def auto_window(start_time, end_time, max_points: int) -> str:
+    """Наименьшее окно из стандартного ряда, дающее не больше max_points интервалов"""
+    span = pd.Timestamp(end_time) - pd.Timestamp(start_time)
+    target = span / max(1, int(max_points))
+    for window in _WINDOW_LADDER:
+        if pd.Timedelta(window) >= target:
+            return window
+    return f'{math.ceil(target / pd.Timedelta("1d"))}d'
+
+
+def estimate_windows(start_time, end_time, window: str) -> int:
+    """Число интервалов GROUP BY time(window) на [start_time, end_time]"""
+    span = pd.Timestamp(end_time) - pd.Timestamp(start_time)
+    return math.ceil(span / pd.Timedelta(window)) + 1
+
+
+def resolve_window(start_time, end_time,
+                   window: Optional[str] = '1h',
+                   max_points: Optional[int] = None,
+                   row_budget: Optional[int] = None,
+                   on_budget: str = 'coarsen') -> str:
+    """
+    Окно агрегации с учётом целевого разрешения и лимита строк
+
+    Args:
+        start_time: Начало интервала
+        end_time: Конец интервала
+        window: Заданное окно (не используется при max_points)
+        max_points: Целевое число точек результата - окно выбирается по интервалу
+        row_budget: Лимит строк результата
+        on_budget: При превышении лимита: coarsen - укрупнить окно,
+            refuse - ValueError
+
+    Returns:
+        str: Окно для GROUP BY time()
+    """
+    if max_points:
+        window = auto_window(start_time, end_time, max_points)
+    if row_budget:
+        rows = estimate_windows(start_time, end_time, window)
+        if rows > row_budget:
+            if on_budget != 'coarsen':
+                raise ValueError(f"Оценка результата {rows} строк превышает лимит {row_budget} "
+                                 f"(окно {window})")
+            window = auto_window(start_time, end_time, row_budget - 1)
+    return window
+
+
+def _aggregate_select(aggregation: Union[str, List[str]],
+                      fields: Optional[List[str]]) -> str:
+    """Список агрегатов: один агрегат одного поля - как раньше, иначе agg(field) AS agg_field"""
+    if isinstance(aggregation, str):
+        if not fields or len(fields) == 1:
+            return f"{aggregation}({fields[0] if fields else '*'})"
+        aggregation = [aggregation]
+    if not fields:
+        return ', '.join(f'{func}(*)' for func in aggregation)
+    return ', '.join(f'{func}({quote_ident(f)}) AS {quote_ident(f"{func}_{f}")}'
+                     for f in fields for func in aggregation)
+
+
+def build_aggregated(measurement: str,
+                     start_time,
+                     end_time,
+                     aggregation: Union[str, List[str]] = 'mean',
+                     window: str = '1h',
+                     fields: Optional[List[str]] = None,
+                     tags: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Запрос агрегированных данных с окном GROUP BY time(window)
+
+    Несколько агрегатов и полей выбираются одним оператором; столбцы
+    результата - <агрегат>_<поле>.
+    """
+    return (f"SELECT {_aggregate_select(aggregation, fields)} FROM {measurement} "
+            f"WHERE {tags_condition(tags)}time >= '{start_time}' AND time <= '{end_time}' "
+            f"GROUP BY time({window})")
+
+
+# Единица времени, которую pandas выбирает при разборе строк RFC3339 (как
+# в DataFrameClient): ns в pandas 2, us в pandas 3 (ns - при наличии наносекунд)
+_STRING_TIME_UNIT = pd.to_datetime(pd.Series(['2000-01-01T00:00:00Z'])).dt.unit
+
+
+# Время MessagePack-ответа InfluxDB: расширение 5, секунды и наносекунды big-endian
+_MSGPACK_TIME = np.dtype([('seconds', '>u8'), ('nanoseconds', '>u4')])
+
+
+def _msgpack_ext(code: int, data: bytes):
+    # время остаётся байтами и разбирается сразу по всему столбцу
+    return data if code == 5 else msgpack.ExtType(code, data)
+
+
+def unpack_msgpack(content: bytes) -> Dict[str, Any]:
+    """Ответ /query в формате MessagePack; время - 12 байт расширения 5"""
+    return msgpack.unpackb(content, ext_hook=_msgpack_ext, raw=False)
+
+
+def _time_index(values: np.ndarray) -> pd.DatetimeIndex:
+    """
+    Столбец времени ответа в индекс UTC
+
+    Единица индекса - та же, что при разборе строк RFC3339 в DataFrameClient.
+    """
+    if len(values) and isinstance(values[0], bytes):
+        packed = np.frombuffer(b''.join(values), dtype=_MSGPACK_TIME)
+        values = (packed['seconds'].astype(np.int64) * 1_000_000_000
+                  + packed['nanoseconds'].astype(np.int64))
+    elif not len(values) or isinstance(values[0], str):
+        return pd.DatetimeIndex(pd.to_datetime(list(values), utc=True, format='ISO8601'))
+    values = np.asarray(values, dtype=np.int64)
+    index = pd.to_datetime(values, unit='ns', utc=True)
+    if _STRING_TIME_UNIT != 'ns' and not (values % 1000).any():
+        index = index.as_unit(_STRING_TIME_UNIT)
+    return index
+
+
+def series_to_dataframe(series: Dict[str, Any]) -> pd.DataFrame:
+    """Серия ответа InfluxDB (columns/values) в DataFrame с индексом времени UTC"""
+    columns = series['columns']
+    values = series.get('values') or []
+    # сборка по столбцам: столбцы двумерного object-массива типизируются
+    # так же, как при построении DataFrame из списка строк
+    matrix = np.array(values, dtype=object) if values else np.empty((0, len(columns)), dtype=object)
+    data = {name: matrix[:, i].tolist() for i, name in enumerate(columns) if name != 'time'}
+    if 'time' not in columns:
+        return pd.DataFrame(data, columns=columns)
+    index = _time_index(matrix[:, columns.index('time')])
+    index.name = None
+    return pd.DataFrame(data, index=index, columns=[c for c in columns if c != 'time'])
+
+
+def series_key(series: Dict[str, Any]):
+    """Ключ серии как в DataFrameClient: имя или (имя, ((тег, значение), ...))"""
+    tags = series.get('tags')
+    if tags is None:
+        return series['name']
+    return series['name'], tuple(sorted(tags.items()))
+
+
+def results_to_dataframes(result: Dict[str, Any],
+                          dropna: bool = True) -> Dict[Union[str, tuple], pd.DataFrame]:
+    """
+    Результат одного оператора ответа /query в словарь DataFrame по сериям
+
+    Args:
+        result: Элемент списка results ответа InfluxDB
+        dropna: Удалять столбцы, состоящие только из пропусков
+
+    Returns:
+        Dict: Ключ серии -> DataFrame
+    """
+    if 'error' in result:
+        raise RuntimeError(result['error'])
+    frames = defaultdict(list)
+    for series in result.get('series', []):
+        frames[series_key(series)].append(series_to_dataframe(series))
+    out = {}
+    for key, parts in frames.items():
+        df = pd.concat(parts).sort_index() if len(parts) > 1 else parts[0].sort_index()
+        if dropna:
+            df = df.dropna(how='all', axis=1)
+        out[key] = df
+    return out
+
+
+def series_frames_to_rows(frames: Dict[Union[str, tuple], pd.DataFrame],
+                          measurement: str) -> pd.DataFrame:
+    """
+    Серии ответа с GROUP BY по тегам в один DataFrame
+
+    Значения тегов группировки добавляются столбцами, строки упорядочены
+    по тегам; индекс - время точки.
+    """
+    rows = []
+    group_tags = []
+    for key, df in frames.items():
+        if not isinstance(key, tuple) or key[0] != measurement or df.empty:
+            continue
+        df = df.copy()
+        for tag, value in key[1]:
+            df[tag] = value
+            if tag not in group_tags:
+                group_tags.append(tag)
+        rows.append(df)
+    if not rows:
+        return pd.DataFrame()
+    df = pd.concat(rows)
+    df = df[group_tags + [c for c in df.columns if c not in group_tags]]
+    return df.sort_values(group_tags, kind='stable')
+
+
+def pivot_long(df: pd.DataFrame,
+               name_column: str = 'name',
+               value_column: str = 'value',
+               dtype=None) -> pd.DataFrame:
+    """
+    Длинная таблица (время, имя, значение) в широкую: столбец на имя
+
+    Время и имена кодируются через pd.factorize, значения раскладываются
+    в заранее выделенную матрицу NumPy - без MultiIndex и unstack.
+    Повторы (время, имя) - берётся последнее значение.
+
+    Args:
+        df: Таблица с индексом времени и столбцами name_column, value_column
+        name_column: Столбец имён (станет столбцами результата)
+        value_column: Столбец значений
+        dtype: Тип значений результата (например, 'float32');
+            по умолчанию - float64 для числовых значений, иначе object
+
+    Returns:
+        pd.DataFrame: Индекс - время по возрастанию, столбцы - имена по алфавиту
+    """
+    time_codes, times = pd.factorize(df.index, sort=True)
+    name_codes, names = pd.factorize(df[name_column], sort=True)
+    values = df[value_column].to_numpy()
+    if dtype is None:
+        dtype = np.float64 if pd.api.types.is_numeric_dtype(values.dtype) else object
+    matrix = np.full((len(times), len(names)), np.nan, dtype=dtype)
+    valid = name_codes >= 0
+    matrix[time_codes[valid], name_codes[valid]] = values[valid]
+    out = pd.DataFrame(matrix, index=times, columns=pd.Index(names, name=name_column))
+    out.index.name = 'index'
+    return out
+
+
+def compact_frame(df: pd.DataFrame,
+                  float32: bool = False,
+                  categorical: bool = False) -> pd.DataFrame:
+    """
+    Компактные типы столбцов
+
+    Args:
+        df: Исходная таблица
+        float32: float64 -> float32
+        categorical: строковые столбцы (теги) -> category
+    """
+    if not float32 and not categorical:
+        return df
+    types = {}
+    for column, dtype in df.dtypes.items():
+        if float32 and isinstance(dtype, np.dtype) and dtype == np.float64:
+            types[column] = np.float32
+        elif categorical and (dtype == object or pd.api.types.is_string_dtype(dtype)):
+            types[column] = 'category'
+    return df.astype(types) if types else df
+
+
+def iter_chunk_frames(results: Iterable[Dict[str, Any]],
+                      measurement: str,
+                      time_zone: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """
+    DataFrame по фрагментам chunked-ответа для одного измерения
+
+    Столбцы без значений внутри фрагмента не удаляются, чтобы все
+    фрагменты имели одинаковый набор столбцов.
+    """
+    for result in results:
+        df = results_to_dataframes(result, dropna=False).get(measurement)
+        if df is None or df.empty:
+            continue
+        if time_zone:
+            df = df.tz_convert(time_zone)
+        yield df
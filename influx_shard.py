@@ -0,0 +1,169 @@
+"""
+Параллельное чтение длинных интервалов по временным окнам
+
+Интервал [start, end] делится на окна [t0, t1), [t1, t2), ..., [tn-1, end]:
+все окна, кроме последнего, полуоткрытые, поэтому граничные точки не
+дублируются. Окна запрашиваются параллельно пулом потоков и склеиваются
+в исходном порядке - результат совпадает с результатом одного запроса.
+
+Границы окон задаются числом окон, длительностью окна или оценкой числа
+точек (по запросу count(*) с GROUP BY time).
+"""
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Tuple, Callable, Dict, Any
+
+import pandas as pd
+
+from influx_query import tags_condition
+from influx_metrics import current_span, use_span
+
+TimeWindow = Tuple[pd.Timestamp, pd.Timestamp, bool]
+
+
+def _cut_points(start: pd.Timestamp, end: pd.Timestamp,
+                bounds: List[pd.Timestamp]) -> List[TimeWindow]:
+    """Окна по упорядоченным внутренним границам (последнее окно включает end)"""
+    bounds = sorted({b for b in bounds if start < b < end})
+    edges = [start] + bounds + [end]
+    return [(edges[i], edges[i + 1], i == len(edges) - 2)
+            for i in range(len(edges) - 1)]
+
+
+def split_time_range(start, end,
+                     shards: Optional[int] = None,
+                     window=None) -> List[TimeWindow]:
+    """
+    Разбиение интервала на окна равной длительности
+
+    Args:
+        start: Начало интервала
+        end: Конец интервала (включительно)
+        shards: Число окон
+        window: Длительность окна ('1D', '6h', pd.Timedelta); важнее shards
+
+    Returns:
+        List: Кортежи (начало, конец, конец включается)
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if end <= start:
+        return [(start, end, True)]
+    if window is not None:
+        step = pd.Timedelta(window)
+    elif shards and shards > 1:
+        step = (end - start) / int(shards)
+        # границы по целым секундам, если окна не короче секунды
+        if step >= pd.Timedelta('1s'):
+            step = step.ceil('s')
+    else:
+        return [(start, end, True)]
+    if step <= pd.Timedelta(0):
+        raise ValueError(f'Неверная длительность окна: {window}')
+    count = math.ceil((end - start) / step)
+    return _cut_points(start, end, [start + step * i for i in range(1, count)])
+
+
+def split_by_counts(start, end,
+                    buckets: List[Tuple[pd.Timestamp, int]],
+                    shard_points: int) -> List[TimeWindow]:
+    """
+    Разбиение интервала на окна примерно по shard_points точек
+
+    Args:
+        start: Начало интервала
+        end: Конец интервала (включительно)
+        buckets: Упорядоченные пары (начало корзины, число точек в ней)
+        shard_points: Желаемое число точек в окне
+
+    Returns:
+        List: Кортежи (начало, конец, конец включается)
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    bounds = []
+    accumulated = 0
+    for i, (_, points) in enumerate(buckets):
+        accumulated += points
+        if accumulated >= shard_points and i + 1 < len(buckets):
+            bounds.append(buckets[i + 1][0])
+            accumulated = 0
+    return _cut_points(start, end, bounds)
+
+
+def estimate_buckets(query: Callable[[str], Optional[pd.DataFrame]],
+                     measurement: str, start, end,
+                     tags: Optional[Dict[str, Any]] = None,
+                     buckets: int = 64) -> List[Tuple[pd.Timestamp, int]]:
+    """
+    Распределение числа точек по времени: count(*) с GROUP BY time
+
+    Args:
+        query: Функция выполнения запроса, возвращает DataFrame измерения или None
+        measurement: Имя измерения
+        start: Начало интервала
+        end: Конец интервала
+        tags: Фильтры по тегам
+        buckets: Число корзин на интервале
+
+    Returns:
+        List: Пары (начало корзины, число точек) во временной зоне start
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    seconds = max(1, math.ceil((end - start).total_seconds() / buckets))
+    df = query(f"SELECT count(*) FROM {measurement} "
+               f"WHERE {tags_condition(tags)}time >= '{start}' AND time <= '{end}' "
+               f"GROUP BY time({seconds}s)")
+    if df is None or df.empty:
+        return []
+    # число точек корзины - максимум по полям (count считается по каждому полю)
+    counts = df.fillna(0).max(axis=1).astype('int64')
+    index = df.index
+    if start.tzinfo is None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    else:
+        index = index.tz_convert(start.tzinfo)
+    return list(zip(index, counts.tolist()))
+
+
+def _merge_columns(column_lists: List[List[str]]) -> List[str]:
+    """Общий порядок столбцов окон: как в ответе одного запроса"""
+    merged = list(dict.fromkeys(c for columns in column_lists for c in columns))
+    # SELECT * возвращает столбцы по алфавиту - сохраняем этот порядок
+    if all(list(columns) == sorted(columns) for columns in column_lists):
+        merged.sort()
+    return merged
+
+
+def read_sharded(fetch: Callable[[pd.Timestamp, pd.Timestamp, bool], Optional[pd.DataFrame]],
+                 windows: List[TimeWindow],
+                 workers: int = 4) -> Optional[pd.DataFrame]:
+    """
+    Параллельное чтение окон и склейка в порядке времени
+
+    Args:
+        fetch: Чтение одного окна (начало, конец, конец включается) -> DataFrame
+            без удаления пустых столбцов или None
+        windows: Окна (см. split_time_range, split_by_counts)
+        workers: Число потоков
+
+    Returns:
+        pd.DataFrame: Склеенный результат или None, если данных нет
+    """
+    if len(windows) == 1 or workers <= 1:
+        frames = [fetch(*w) for w in windows]
+    else:
+        parent = current_span()
+
+        def fetch_window(window):
+            with use_span(parent):
+                return fetch(*window)
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(windows))) as executor:
+            frames = list(executor.map(fetch_window, windows))
+    frames = [df for df in frames if df is not None and not df.empty]
+    if not frames:
+        return None
+    columns = _merge_columns([list(df.columns) for df in frames])
+    # пустые внутри окна столбцы удаляются до склейки, чтобы не портить типы
+    frames = [df.dropna(how='all', axis=1) for df in frames]
+    df = pd.concat(frames) if len(frames) > 1 else frames[0]
+    return df[[c for c in columns if c in df.columns]]
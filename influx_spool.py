@@ -0,0 +1,374 @@
+"""
+Локальный журнал упреждающей записи (spool) для записи в InfluxDB
+
+Тела запросов line protocol сначала дописываются в сегментированный
+файловый журнал, а фоновый поток по порядку отправляет их на сервер.
+Пока InfluxDB недоступен, данные копятся на диске и не теряются;
+после перезапуска процесса отправка продолжается с сохранённой позиции.
+
+Формат записи сегмента:
+    >IIH (длина payload, crc32(meta + payload), длина meta) + meta (json) + payload
+"""
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Optional, Callable, Any, Dict, Tuple
+
+from influxdb.exceptions import InfluxDBClientError
+
+_HEADER = struct.Struct('>IIH')
+_SEGMENT_SUFFIX = '.spool'
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+
+class SpoolFullError(Exception):
+    """Превышен лимит дискового пространства журнала"""
+
+
+def is_rejected(error: Exception) -> bool:
+    """Сервер отверг сами данные (400: ошибка разбора, частичная запись) - повтор бесполезен"""
+    return isinstance(error, InfluxDBClientError) and error.code == 400
+
+
+class WriteSpool:
+    """Сегментированный журнал записей с фоновой отправкой"""
+
+    def __init__(self, directory: str,
+                 send: Callable[[bytes, Optional[str], Optional[str]], Any],
+                 segment_bytes: int = 16 * 1024 * 1024,
+                 max_bytes: int = 1024 * 1024 * 1024,
+                 fsync: str = 'interval',
+                 fsync_interval: float = 1.0,
+                 on_full: str = 'raise',
+                 retry_interval: float = 1.0,
+                 max_retry_interval: float = 60.0):
+        """
+        Args:
+            directory: Каталог журнала
+            send: Отправка записи: send(payload, database, precision)
+            segment_bytes: Размер сегмента, после которого начинается новый
+            max_bytes: Лимит суммарного размера сегментов на диске
+            fsync: Политика fsync: always (каждая запись), interval, never
+            fsync_interval: Период fsync для политики interval, с
+            on_full: При переполнении: raise (SpoolFullError) или drop_oldest
+            retry_interval: Начальная пауза после неудачной отправки, с
+            max_retry_interval: Максимальная пауза между попытками, с
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Неизвестная политика fsync: {fsync}")
+        if on_full not in ('raise', 'drop_oldest'):
+            raise ValueError(f"Неизвестная политика переполнения: {on_full}")
+        self.directory = directory
+        self.send = send
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.on_full = on_full
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_fsync = time.monotonic()
+
+        self._sizes: Dict[int, int] = {}
+        self._active = None
+        self._active_id = 0
+        self._cursor: Tuple[int, int] = (0, 0)
+        self.pending_records = 0
+        self.pending_bytes = 0
+        self.sent_records = 0
+        self.dropped_records = 0
+        self.last_error: Optional[str] = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+
+    # --- файлы ------------------------------------------------------------------
+
+    def _segment_path(self, segment_id: int) -> str:
+        return os.path.join(self.directory, f'{segment_id:012d}{_SEGMENT_SUFFIX}')
+
+    @property
+    def _cursor_path(self) -> str:
+        return os.path.join(self.directory, 'cursor.json')
+
+    def _save_cursor(self, force_fsync: bool = False) -> None:
+        tmp_path = self._cursor_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'segment': self._cursor[0], 'offset': self._cursor[1]}, f)
+            if force_fsync or self.fsync == 'always':
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self._cursor_path)
+
+    def _scan(self, segment_id: int, start: int = 0) -> Tuple[int, int, int]:
+        """
+        Проверка записей сегмента
+
+        Returns:
+            (число записей, байт payload, смещение конца последней целой записи)
+        """
+        records = payload_bytes = 0
+        offset = start
+        with open(self._segment_path(segment_id), 'rb') as f:
+            f.seek(start)
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                length, crc, meta_length = _HEADER.unpack(header)
+                body = f.read(meta_length + length)
+                if len(body) < meta_length + length or zlib.crc32(body) != crc:
+                    break
+                records += 1
+                payload_bytes += length
+                offset += _HEADER.size + meta_length + length
+        return records, payload_bytes, offset
+
+    def _recover(self) -> None:
+        """
+        Восстановление состояния после перезапуска
+
+        Каждый сегмент проверяется по CRC и обрезается до последней целой
+        записи: отправка читает записи без проверки и не должна встретить
+        недописанную или повреждённую запись ни в одном сегменте.
+        """
+        segment_ids = sorted(int(name[:-len(_SEGMENT_SUFFIX)])
+                             for name in os.listdir(self.directory)
+                             if name.endswith(_SEGMENT_SUFFIX))
+        cursor = (segment_ids[0] if segment_ids else 1, 0)
+        if os.path.exists(self._cursor_path):
+            with open(self._cursor_path) as f:
+                saved = json.load(f)
+            cursor = (saved['segment'], saved['offset'])
+
+        for segment_id in segment_ids:
+            if segment_id < cursor[0]:
+                os.remove(self._segment_path(segment_id))
+                continue
+            start = cursor[1] if segment_id == cursor[0] else 0
+            records, payload_bytes, end = self._scan(segment_id, start)
+            size = os.path.getsize(self._segment_path(segment_id))
+            if end < size:
+                print(f"Журнал {self.directory}: сегмент {segment_id} повреждён, "
+                      f"отброшено {size - end} байт после смещения {end}")
+                with open(self._segment_path(segment_id), 'r+b') as f:
+                    f.truncate(end)
+                size = end
+            self._sizes[segment_id] = size
+            self.pending_records += records
+            self.pending_bytes += payload_bytes
+
+        if cursor[0] not in self._sizes:
+            cursor = (min(self._sizes) if self._sizes else cursor[0], 0)
+        self._cursor = cursor
+        self._active_id = max(self._sizes) if self._sizes else cursor[0]
+        self._open_active()
+        self._save_cursor(force_fsync=True)
+
+    def _open_active(self) -> None:
+        self._active = open(self._segment_path(self._active_id), 'ab')
+        self._sizes.setdefault(self._active_id, self._active.tell())
+
+    def _roll(self) -> None:
+        self._sync_active(force=True)
+        self._active.close()
+        self._active_id += 1
+        self._open_active()
+
+    def _sync_active(self, force: bool = False) -> None:
+        self._active.flush()
+        now = time.monotonic()
+        if self.fsync == 'always' or (force and self.fsync != 'never') or \
+                (self.fsync == 'interval' and now - self._last_fsync >= self.fsync_interval):
+            os.fsync(self._active.fileno())
+            self._last_fsync = now
+
+    def _drop_segment(self, segment_id: int) -> None:
+        records, payload_bytes, _ = self._scan(
+            segment_id, self._cursor[1] if segment_id == self._cursor[0] else 0)
+        self.pending_records -= records
+        self.pending_bytes -= payload_bytes
+        del self._sizes[segment_id]
+        os.remove(self._segment_path(segment_id))
+
+    # --- запись -----------------------------------------------------------------
+
+    def append(self, payload: bytes,
+               database: Optional[str] = None,
+               precision: Optional[str] = None) -> bool:
+        """
+        Добавление тела запроса в журнал
+
+        Returns:
+            bool: True; при переполнении и on_full='raise' - SpoolFullError
+        """
+        if not payload:
+            return True
+        meta = json.dumps({'db': database, 'precision': precision}).encode('utf-8')
+        record = _HEADER.pack(len(payload), zlib.crc32(meta + payload), len(meta)) + meta + payload
+
+        with self._lock:
+            while sum(self._sizes.values()) + len(record) > self.max_bytes:
+                oldest = min(self._sizes)
+                if self.on_full == 'raise' or oldest == self._active_id:
+                    raise SpoolFullError(
+                        f"Журнал {self.directory} заполнен: {sum(self._sizes.values())} байт")
+                dropped = self.pending_records
+                self._drop_segment(oldest)
+                self.dropped_records += dropped - self.pending_records
+                self._cursor = (min(self._sizes), 0)
+                self._save_cursor()
+
+            if self._sizes[self._active_id] and \
+                    self._sizes[self._active_id] + len(record) > self.segment_bytes:
+                self._roll()
+            self._active.write(record)
+            self._sizes[self._active_id] += len(record)
+            self._sync_active()
+            self.pending_records += 1
+            self.pending_bytes += len(payload)
+        self._wakeup.set()
+        return True
+
+    # --- отправка -----------------------------------------------------------------
+
+    def _next_record(self) -> Optional[Tuple[bytes, Dict[str, Any], Tuple[int, int], int]]:
+        with self._lock:
+            segment_id, offset = self._cursor
+            size = self._sizes.get(segment_id, 0)
+            if offset >= size:
+                if segment_id == self._active_id:
+                    if size:
+                        # Весь журнал отправлен - начинаем новый сегмент, старый удаляем
+                        self._roll()
+                        del self._sizes[segment_id]
+                        os.remove(self._segment_path(segment_id))
+                        self._cursor = (self._active_id, 0)
+                        self._save_cursor()
+                    return None
+                del self._sizes[segment_id]
+                os.remove(self._segment_path(segment_id))
+                self._cursor = (min(self._sizes), 0)
+                self._save_cursor()
+                segment_id, offset = self._cursor
+            if segment_id == self._active_id:
+                self._active.flush()
+        try:
+            with open(self._segment_path(segment_id), 'rb') as f:
+                f.seek(offset)
+                length, _, meta_length = _HEADER.unpack(f.read(_HEADER.size))
+                meta = json.loads(f.read(meta_length))
+                payload = f.read(length)
+        except FileNotFoundError:
+            # Сегмент удалён при переполнении (on_full='drop_oldest')
+            return None
+        return payload, meta, (segment_id, offset), _HEADER.size + meta_length + length
+
+    def _advance(self, position: Tuple[int, int], record_size: int, payload_size: int) -> None:
+        with self._lock:
+            if self._cursor != position:
+                return
+            self._cursor = (position[0], position[1] + record_size)
+            self.pending_records -= 1
+            self.pending_bytes -= payload_size
+            self._save_cursor()
+
+    def drain_once(self) -> bool:
+        """
+        Отправка одной записи журнала
+
+        Returns:
+            bool: False, если журнал пуст или сервер недоступен
+        """
+        record = self._next_record()
+        if record is None:
+            return False
+        payload, meta, position, record_size = record
+        try:
+            self.send(payload, meta.get('db'), meta.get('precision'))
+            self.sent_records += 1
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            if not is_rejected(e):
+                # сбои сети и 5xx, а также неверные учётные данные (401, 403)
+                # и отсутствующая база (404): запись остаётся в журнале,
+                # отправка повторяется с паузой
+                return False
+            print(f"Запись журнала отклонена сервером и удалена: {e}")
+            self.dropped_records += 1
+        self._advance(position, record_size, len(payload))
+        return True
+
+    def _drain_loop(self) -> None:
+        delay = self.retry_interval
+        while not self._stopped.is_set():
+            if self.drain_once():
+                delay = self.retry_interval
+                continue
+            if self.last_error is not None:
+                self._stopped.wait(delay)
+                delay = min(self.max_retry_interval, delay * 2)
+            else:
+                self._wakeup.wait(self.retry_interval)
+                self._wakeup.clear()
+
+    def start(self) -> 'WriteSpool':
+        """Запуск фоновой отправки"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._drain_loop, daemon=True,
+                                            name='influx-spool-drainer')
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Остановка фоновой отправки и сброс журнала на диск"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._lock:
+            self._sync_active(force=True)
+            self._save_cursor(force_fsync=self.fsync != 'never')
+
+    def close(self) -> None:
+        self.stop()
+        with self._lock:
+            self._active.close()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Ожидание отправки всего журнала
+
+        Returns:
+            bool: True, если журнал опустел до истечения таймаута
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending_records > 0:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self._wakeup.set()
+            time.sleep(0.05)
+        return True
+
+    def backlog(self) -> Dict[str, Any]:
+        """Состояние журнала: неотправленные записи, байты, сегменты, ошибки"""
+        with self._lock:
+            return {
+                'pending_records': self.pending_records,
+                'pending_bytes': self.pending_bytes,
+                'disk_bytes': sum(self._sizes.values()),
+                'segments': len(self._sizes),
+                'sent_records': self.sent_records,
+                'dropped_records': self.dropped_records,
+                'last_error': self.last_error,
+            }
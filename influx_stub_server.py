@@ -0,0 +1,699 @@
+"""
+Локальный HTTP-сервер, имитирующий InfluxDB 1.x (/ping, /query, /write)
+
+Используется для проверки клиентов и бенчмарков без настоящего сервера.
+Принимает сжатые gzip тела запросов и сжимает ответы при Accept-Encoding: gzip.
+При Accept: application/x-msgpack отвечает в формате MessagePack (время -
+расширение 5, как в InfluxDB), иначе JSON.
+Данные хранятся в памяти; поддерживается подмножество InfluxQL:
+
+    SHOW DATABASES / MEASUREMENTS / TAG KEYS / FIELD KEYS [FROM m]
+    SHOW TAG VALUES [FROM m] WITH KEY = "k" | IN ("k1", "k2") | =~ /re/
+    CREATE DATABASE, DROP MEASUREMENT
+    SELECT *|поля|агрегаты(поле|*) [AS имя] FROM m
+        [WHERE тег='v' AND (... OR ...) AND time >= '...' AND time < now() - 1d]
+        [GROUP BY time(1h), тег, *] [ORDER BY time DESC] [LIMIT n [OFFSET m]] [tz('...')]
+
+Пример:
+    with StubInfluxServer() as server:
+        config = {'DB_name': 'test', 'IP_': server.host, 'port_': server.port}
+"""
+import gzip
+import json
+import re
+import struct
+import threading
+from collections import defaultdict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import msgpack
+import numpy as np
+import pandas as pd
+
+_DURATION_NS = {'ns': 1, 'u': 1_000, 'µ': 1_000, 'ms': 1_000_000, 's': 1_000_000_000,
+                'm': 60_000_000_000, 'h': 3_600_000_000_000,
+                'd': 86_400_000_000_000, 'w': 604_800_000_000_000}
+# как у InfluxDB 1.x: 'us' в precision/epoch не принимается (400)
+_PRECISION_NS = {'n': 1, 'ns': 1, 'u': 1_000, 'ms': 1_000_000,
+                 's': 1_000_000_000, 'm': 60_000_000_000, 'h': 3_600_000_000_000}
+_AGGREGATES = {
+    'mean': lambda v: float(np.mean(v)),
+    'sum': sum,
+    'count': len,
+    'min': min,
+    'max': max,
+    'first': lambda v: v[0],
+    'last': lambda v: v[-1],
+}
+
+
+def parse_duration(text: str) -> int:
+    """Длительность InfluxQL (1h, 30m, 1d) в наносекундах"""
+    total = 0
+    for number, unit in re.findall(r'(\d+)(ns|ms|u|µ|s|m|h|d|w)', text):
+        total += int(number) * _DURATION_NS[unit]
+    return total
+
+
+def _split_unescaped(text: str, sep: str) -> List[str]:
+    """Разбиение строки line protocol по разделителю вне кавычек и экранирования"""
+    parts, current, quoted, i = [], [], False, 0
+    while i < len(text):
+        ch = text[i]
+        if ch == '\\' and i + 1 < len(text):
+            current.append(text[i:i + 2])
+            i += 2
+            continue
+        if ch == '"':
+            quoted = not quoted
+        if ch == sep and not quoted:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(ch)
+        i += 1
+    parts.append(''.join(current))
+    return parts
+
+
+def _unescape(text: str) -> str:
+    return re.sub(r'\\(.)', lambda m: '\n' if m.group(1) == 'n' else m.group(1), text)
+
+
+def _parse_field_value(text: str):
+    if text.startswith('"'):
+        return _unescape(text[1:-1])
+    if text in ('t', 'T', 'true', 'True', 'TRUE'):
+        return True
+    if text in ('f', 'F', 'false', 'False', 'FALSE'):
+        return False
+    if text.endswith('i'):
+        return int(text[:-1])
+    return float(text)
+
+
+def parse_line(line: str, precision: str = 'ns', now_ns: int = 0):
+    """
+    Разбор строки line protocol
+
+    Returns:
+        (measurement, tags, fields, time_ns)
+    """
+    parts = _split_unescaped(line, ' ')
+    parts = [p for p in parts if p != '']
+    key, field_set = parts[0], parts[1]
+    keys = _split_unescaped(key, ',')
+    measurement = _unescape(keys[0])
+    tags = {}
+    for item in keys[1:]:
+        k, v = _split_unescaped(item, '=')
+        tags[_unescape(k)] = _unescape(v)
+    fields = {}
+    for item in _split_unescaped(field_set, ','):
+        k, v = _split_unescaped(item, '=')[0], '='.join(_split_unescaped(item, '=')[1:])
+        fields[_unescape(k)] = _parse_field_value(v)
+    time_ns = int(parts[2]) * _PRECISION_NS[precision] if len(parts) > 2 else now_ns
+    return measurement, tags, fields, time_ns
+
+
+def format_time(time_ns: int, epoch: Optional[str] = None):
+    """Метка времени в формате ответа InfluxDB (RFC3339 UTC или epoch)"""
+    if epoch:
+        return time_ns // _PRECISION_NS[epoch]
+    text = pd.Timestamp(time_ns, unit='ns').isoformat()
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    return text + 'Z'
+
+
+class StubInfluxStore:
+    """Хранилище точек в памяти: db -> measurement -> {(tags, time): fields}"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.databases: Dict[str, Dict[str, Dict[Tuple, Dict[str, Any]]]] = defaultdict(
+            lambda: defaultdict(dict))
+
+    def write(self, database: str, body: str, precision: str = 'ns') -> int:
+        now_ns = pd.Timestamp.now(tz='UTC').value
+        count = 0
+        with self.lock:
+            for line in body.splitlines():
+                if not line.strip() or line.startswith('#'):
+                    continue
+                measurement, tags, fields, time_ns = parse_line(line, precision, now_ns)
+                key = (tuple(sorted(tags.items())), time_ns)
+                self.databases[database][measurement].setdefault(key, {}).update(fields)
+                count += 1
+        return count
+
+    def rows(self, database: str, measurement: str) -> List[Tuple[Dict, int, Dict]]:
+        with self.lock:
+            data = self.databases.get(database, {}).get(measurement, {})
+            return [(dict(tags), time_ns, dict(fields))
+                    for (tags, time_ns), fields in data.items()]
+
+    def measurements(self, database: str) -> List[str]:
+        with self.lock:
+            return sorted(m for m, d in self.databases.get(database, {}).items() if d)
+
+
+# Ключевые слова InfluxQL: без кавычек как идентификаторы не принимаются
+_KEYWORDS = frozenset(
+    'ALL ALTER ANALYZE ANY AS ASC BEGIN BY CARDINALITY CREATE CONTINUOUS DATABASE '
+    'DATABASES DEFAULT DELETE DESC DESTINATIONS DIAGNOSTICS DISTINCT DROP DURATION '
+    'END EVERY EXPLAIN FIELD FOR FROM GRANT GRANTS GROUP GROUPS IN INF INSERT INTO '
+    'KEY KEYS KILL LIMIT MEASUREMENT MEASUREMENTS NAME OFFSET ON ORDER PASSWORD '
+    'POLICY POLICIES PRIVILEGES QUERIES QUERY READ REPLICATION RESAMPLE RETENTION '
+    'REVOKE SELECT SERIES SET SHARD SHARDS SLIMIT SOFFSET STATS SUBSCRIPTION '
+    'SUBSCRIPTIONS TAG TO USER USERS VALUES WHERE WITH WRITE'.split())
+
+
+class InfluxQLParseError(ValueError):
+    """Ошибка разбора запроса: сервер отвечает 400 на весь запрос"""
+
+
+def _identifier(text: str) -> str:
+    """Идентификатор в кавычках или без; ключевое слово без кавычек - ошибка"""
+    text = text.strip()
+    if text.startswith('"') and text.endswith('"') and len(text) > 1:
+        return text[1:-1].replace('\\"', '"')
+    if text.upper() in _KEYWORDS:
+        raise InfluxQLParseError(f'error parsing query: found {text.upper()}, expected identifier')
+    return text
+
+
+class _Condition:
+    """Условие WHERE: дерево из AND/OR над сравнениями тегов и времени"""
+
+    _token = re.compile(r"\s*(\(|\)|AND\b|OR\b|(?:\"[^\"]+\"|[\w.]+)\s*(?:=~|!~|!=|<>|>=|<=|=|>|<)\s*"
+                        r"(?:'(?:[^'\\]|\\.)*'|/(?:[^/\\]|\\.)*/|now\(\)(?:\s*[-+]\s*\d+\w+)?|-?\d+\w*))",
+                        re.IGNORECASE)
+
+    def __init__(self, text: str):
+        self.tokens = [t.strip() for t in self._token.findall(text or '')]
+        self.pos = 0
+        self.tree = self._parse_or() if self.tokens else None
+
+    def _parse_or(self):
+        node = self._parse_and()
+        while self.pos < len(self.tokens) and self.tokens[self.pos].upper() == 'OR':
+            self.pos += 1
+            node = ('or', node, self._parse_and())
+        return node
+
+    def _parse_and(self):
+        node = self._parse_atom()
+        while self.pos < len(self.tokens) and self.tokens[self.pos].upper() == 'AND':
+            self.pos += 1
+            node = ('and', node, self._parse_atom())
+        return node
+
+    def _parse_atom(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        if token == '(':
+            node = self._parse_or()
+            self.pos += 1
+            return node
+        match = re.match(r"(\"[^\"]+\"|[\w.]+)\s*(=~|!~|!=|<>|>=|<=|=|>|<)\s*(.*)", token, re.S)
+        key, op, value = match.groups()
+        return ('cmp', _identifier(key), op, value.strip())
+
+    @staticmethod
+    def _time_value(text: str, now_ns: int) -> int:
+        if text.startswith("'"):
+            ts = pd.Timestamp(text.strip("'"))
+            return ts.value
+        if text.lower().startswith('now()'):
+            rest = text[5:].replace(' ', '')
+            if not rest:
+                return now_ns
+            sign = -1 if rest[0] == '-' else 1
+            return now_ns + sign * parse_duration(rest[1:])
+        match = re.match(r'(-?\d+)(\w*)', text)
+        number, unit = int(match.group(1)), match.group(2)
+        return number * (_DURATION_NS[unit] if unit else 1)
+
+    def evaluate(self, tags: Dict, time_ns: int, fields: Dict, now_ns: int,
+                 node=None) -> bool:
+        node = self.tree if node is None else node
+        if node is None:
+            return True
+        if node[0] == 'and':
+            return (self.evaluate(tags, time_ns, fields, now_ns, node[1]) and
+                    self.evaluate(tags, time_ns, fields, now_ns, node[2]))
+        if node[0] == 'or':
+            return (self.evaluate(tags, time_ns, fields, now_ns, node[1]) or
+                    self.evaluate(tags, time_ns, fields, now_ns, node[2]))
+        _, key, op, value = node
+        if key == 'time':
+            left, right = time_ns, self._time_value(value, now_ns)
+        else:
+            left = tags.get(key, fields.get(key))
+            if op in ('=~', '!~'):
+                found = left is not None and re.search(value.strip('/'), str(left)) is not None
+                return found if op == '=~' else not found
+            if value.startswith("'"):
+                right = re.sub(r"\\(.)", r"\1", value[1:-1])
+                left = None if left is None else str(left)
+            else:
+                right = float(value)
+            if left is None:
+                return op in ('!=', '<>')
+        return {'=': left == right, '!=': left != right, '<>': left != right,
+                '>': left > right, '<': left < right,
+                '>=': left >= right, '<=': left <= right}[op]
+
+    def time_bounds(self, now_ns: int) -> Tuple[Optional[int], Optional[int]]:
+        """Нижняя и верхняя граница времени из условий верхнего уровня AND"""
+        lower = upper = None
+        stack = [self.tree] if self.tree else []
+        while stack:
+            node = stack.pop()
+            if node[0] == 'and':
+                stack.extend(node[1:])
+            elif node[0] == 'cmp' and node[1] == 'time':
+                value = self._time_value(node[3], now_ns)
+                if node[2] in ('>', '>='):
+                    lower = value if lower is None else max(lower, value)
+                elif node[2] in ('<', '<='):
+                    upper = value if upper is None else min(upper, value)
+        return lower, upper
+
+
+class StubInfluxServer:
+    """Сервер-заглушка InfluxDB 1.x в отдельном потоке"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 store: Optional[StubInfluxStore] = None,
+                 msgpack: bool = True,
+                 sink_databases: Tuple[str, ...] = ()):
+        """
+        Args:
+            host: Адрес для прослушивания
+            port: Порт (0 - выбрать свободный)
+            store: Хранилище точек (по умолчанию новое пустое)
+            msgpack: Отвечать MessagePack клиентам, которые его принимают
+            sink_databases: Базы, запись в которые только подсчитывается
+                (без разбора и хранения) - для замеров скорости клиента
+        """
+        self.store = store or StubInfluxStore()
+        self.msgpack = msgpack
+        self.sink_databases = set(sink_databases)
+        self.stats = defaultdict(int)
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def host(self) -> str:
+        return self._server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    def start(self) -> 'StubInfluxServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    # --- выполнение InfluxQL -------------------------------------------------
+
+    def execute(self, database: str, query: str, epoch: Optional[str] = None) -> List[Dict]:
+        """Выполнение запроса (нескольких через ';'), ответ в формате results"""
+        statements = [s.strip() for s in re.split(r";(?=(?:[^']*'[^']*')*[^']*$)", query)
+                      if s.strip()]
+        results = []
+        for statement_id, statement in enumerate(statements):
+            try:
+                result = self._execute_statement(database, statement, epoch)
+            except InfluxQLParseError:
+                raise
+            except Exception as e:
+                result = {'error': f'stub: {e}'}
+            result['statement_id'] = statement_id
+            results.append(result)
+        return results
+
+    def _execute_statement(self, database: str, statement: str,
+                           epoch: Optional[str]) -> Dict[str, Any]:
+        upper = statement.upper()
+        if upper.startswith('SELECT'):
+            return {'series': self._select(database, statement, epoch)}
+        if upper.startswith('SHOW DATABASES'):
+            names = sorted(self.store.databases) or []
+            return {'series': [{'name': 'databases', 'columns': ['name'],
+                                'values': [[n] for n in names]}]}
+        if upper.startswith('CREATE DATABASE'):
+            self.store.databases[statement.split()[-1].strip('"')]
+            return {}
+        if upper.startswith('DROP MEASUREMENT'):
+            name = statement.split(None, 2)[2].strip('"')
+            with self.store.lock:
+                self.store.databases.get(database, {}).pop(name, None)
+            return {}
+        if upper.startswith('SHOW MEASUREMENTS'):
+            names = self.store.measurements(database)
+            if not names:
+                return {}
+            return {'series': [{'name': 'measurements', 'columns': ['name'],
+                                'values': [[n] for n in names]}]}
+        match = re.match(r'SHOW TAG VALUES(?:\s+FROM\s+"?([^"\s;]+)"?)?\s+WITH\s+KEY\s*'
+                         r'(=~\s*/(?P<re>.*)/|=\s*"?(?P<eq>[^"\s]+)"?|IN\s*\((?P<in>[^)]*)\))',
+                         statement, re.IGNORECASE)
+        if match:
+            source = match.group(1)
+            if match.group('re') is not None:
+                accept = re.compile(match.group('re')).search
+            elif match.group('eq') is not None:
+                accept = {match.group('eq')}.__contains__
+            else:
+                accept = {k.strip().strip('"') for k in match.group('in').split(',')}.__contains__
+            series = []
+            for measurement in self.store.measurements(database):
+                if source and measurement != source:
+                    continue
+                pairs = sorted({(k, v) for tags, _, _ in self.store.rows(database, measurement)
+                                for k, v in tags.items() if accept(k)})
+                if pairs:
+                    series.append({'name': measurement, 'columns': ['key', 'value'],
+                                   'values': [list(p) for p in pairs]})
+            return {'series': series} if series else {}
+        match = re.match(r'SHOW (TAG|FIELD) KEYS(?:\s+FROM\s+"?([^"\s;]+)"?)?', statement,
+                         re.IGNORECASE)
+        if match:
+            kind, source = match.group(1).upper(), match.group(2)
+            series = []
+            for measurement in self.store.measurements(database):
+                if source and measurement != source:
+                    continue
+                rows = self.store.rows(database, measurement)
+                if kind == 'TAG':
+                    keys = sorted({k for tags, _, _ in rows for k in tags})
+                    values = [[k] for k in keys]
+                    columns = ['tagKey']
+                else:
+                    types = {}
+                    for _, _, fields in rows:
+                        for k, v in fields.items():
+                            types.setdefault(k, self._field_type(v))
+                    values = [[k, types[k]] for k in sorted(types)]
+                    columns = ['fieldKey', 'fieldType']
+                if values:
+                    series.append({'name': measurement, 'columns': columns, 'values': values})
+            return {'series': series} if series else {}
+        raise ValueError(f'неподдерживаемый запрос: {statement}')
+
+    @staticmethod
+    def _field_type(value) -> str:
+        if isinstance(value, bool):
+            return 'boolean'
+        if isinstance(value, int):
+            return 'integer'
+        if isinstance(value, str):
+            return 'string'
+        return 'float'
+
+    _select_re = re.compile(
+        r'SELECT\s+(?P<fields>.+?)\s+FROM\s+"?(?P<measurement>[^"\s]+)"?'
+        r'(?:\s+WHERE\s+(?P<where>.+?))?'
+        r'(?:\s+GROUP\s+BY\s+(?P<group>.+?))?'
+        r'(?:\s+fill\((?P<fill>\w+)\))?'
+        r'(?:\s+ORDER\s+BY\s+time\s+(?P<order>ASC|DESC))?'
+        r'(?:\s+LIMIT\s+(?P<limit>\d+))?'
+        r'(?:\s+OFFSET\s+(?P<offset>\d+))?'
+        r'(?:\s+SLIMIT\s+(?P<slimit>\d+))?'
+        r"(?:\s+tz\('(?P<tz>[^']+)'\))?\s*$",
+        re.IGNORECASE | re.DOTALL)
+
+    def _select(self, database: str, statement: str, epoch: Optional[str]) -> List[Dict]:
+        match = self._select_re.match(' '.join(statement.split()))
+        if not match:
+            raise ValueError(f'неподдерживаемый SELECT: {statement}')
+        parts = match.groupdict()
+        measurement = parts['measurement']
+        now_ns = pd.Timestamp.now(tz='UTC').value
+        condition = _Condition(parts['where'])
+        rows = [row for row in self.store.rows(database, measurement)
+                if condition.evaluate(row[0], row[1], row[2], now_ns)]
+        if not rows:
+            return []
+
+        group_tags, interval = [], None
+        for item in [g.strip() for g in (parts['group'] or '').split(',') if g.strip()]:
+            time_match = re.match(r'time\((\w+)\)', item, re.IGNORECASE)
+            if time_match:
+                interval = parse_duration(time_match.group(1))
+            elif item == '*':
+                group_tags = sorted({k for tags, _, _ in rows for k in tags})
+            else:
+                group_tags.append(_identifier(item))
+
+        projections = self._projections(parts['fields'], rows, group_tags)
+        groups = defaultdict(list)
+        for tags, time_ns, fields in rows:
+            groups[tuple((k, tags.get(k, '')) for k in group_tags)].append((tags, time_ns, fields))
+
+        series = []
+        for group_key in sorted(groups):
+            points = sorted(groups[group_key], key=lambda r: r[1])
+            if any(p[0] for p in projections):
+                values = self._aggregate(points, projections, interval, condition, now_ns,
+                                         parts['fill'])
+            else:
+                values = [[time_ns] + [fields.get(name, tags.get(name))
+                                       for _, name, _, _ in projections]
+                          for tags, time_ns, fields in points]
+                values = [v for v in values if any(x is not None for x in v[1:])]
+            if parts['order'] and parts['order'].upper() == 'DESC':
+                values.reverse()
+            if parts['offset']:
+                values = values[int(parts['offset']):]
+            if parts['limit']:
+                values = values[:int(parts['limit'])]
+            if not values:
+                continue
+            for value in values:
+                value[0] = format_time(value[0], epoch)
+            item = {'name': measurement,
+                    'columns': ['time'] + [p[3] for p in projections],
+                    'values': values}
+            if group_tags:
+                item['tags'] = dict(group_key)
+            series.append(item)
+        return series
+
+    @staticmethod
+    def _projections(text: str, rows, group_tags) -> List[Tuple]:
+        """Список (агрегат, поле, источник, имя столбца) из списка SELECT"""
+        tag_keys = sorted({k for tags, _, _ in rows for k in tags} - set(group_tags))
+        field_keys = sorted({k for _, _, fields in rows for k in fields})
+        projections = []
+        for item in re.split(r',\s*(?![^()]*\))', text):
+            item = item.strip()
+            alias_match = re.match(r'(.+?)\s+AS\s+"?(\w+)"?$', item, re.IGNORECASE)
+            alias = alias_match.group(2) if alias_match else None
+            expr = alias_match.group(1) if alias_match else item
+            func_match = re.match(r'(\w+)\((.+)\)$', expr)
+            if func_match:
+                func, arg = func_match.group(1).lower(), func_match.group(2).strip()
+                arg = arg if arg == '*' else _identifier(arg)
+                names = field_keys if arg == '*' else [arg]
+                for name in names:
+                    column = alias or (f'{func}_{name}' if arg == '*' else func)
+                    projections.append((func, name, 'field', column))
+            elif expr == '*':
+                for name in sorted(tag_keys + field_keys):
+                    projections.append((None, name, 'tag_or_field', name))
+            else:
+                name = _identifier(expr)
+                projections.append((None, name, 'tag_or_field', alias or name))
+        return projections
+
+    @staticmethod
+    def _aggregate(points, projections, interval, condition, now_ns, fill) -> List[List]:
+        if interval:
+            lower, upper = condition.time_bounds(now_ns)
+            lower = points[0][1] if lower is None else lower
+            upper = points[-1][1] if upper is None else upper
+            starts = list(range(lower - lower % interval, upper + 1, interval))
+        else:
+            starts = [0]
+        buckets = defaultdict(list)
+        for point in points:
+            start = point[1] - point[1] % interval if interval else 0
+            buckets[start].append(point)
+        values = []
+        for start in starts:
+            bucket = buckets.get(start, [])
+            row = [start]
+            for func, name, _, _ in projections:
+                data = [fields[name] for _, _, fields in bucket if fields.get(name) is not None]
+                if func in ('first', 'last') and data:
+                    row.append(data[0] if func == 'first' else data[-1])
+                elif data:
+                    row.append(_AGGREGATES[func](data))
+                else:
+                    row.append(0 if func == 'count' else None)
+            if fill and fill.lower() == 'none' and all(v is None for v in row[1:]):
+                continue
+            values.append(row)
+        if not interval and projections and projections[0][0] in ('first', 'last'):
+            # Селекторы без GROUP BY time возвращают время найденной точки
+            for func, name, _, _ in projections[:1]:
+                data = [(t, fields[name]) for _, t, fields in points if name in fields]
+                if data:
+                    values[0][0] = data[0][0] if func == 'first' else data[-1][0]
+        return values
+
+    # --- HTTP -----------------------------------------------------------------
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code: int, body: bytes = b'',
+                      content_type: str = 'application/json') -> None:
+                self.send_response(code)
+                if body and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    body = gzip.compress(body, 1)
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('X-Influxdb-Version', '1.8-stub')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _params(self) -> Dict[str, str]:
+                params = {k: v[-1] for k, v in parse_qs(urlparse(self.path).query).items()}
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                content_type = self.headers.get('Content-Type', '')
+                self._wire_bytes = len(body)
+                if body and self.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                if body and 'x-www-form-urlencoded' in content_type:
+                    params.update({k: v[-1] for k, v in parse_qs(body.decode()).items()})
+                    body = b''
+                self._body = body
+                return params
+
+            def do_GET(self):
+                self._dispatch()
+
+            def do_POST(self):
+                self._dispatch()
+
+            def _dispatch(self):
+                path = urlparse(self.path).path.rstrip('/')
+                params = self._params()
+                if path == '/ping':
+                    server.stats['ping'] += 1
+                    self._send(204)
+                elif path == '/write':
+                    self._write(params)
+                elif path == '/query':
+                    self._query(params)
+                else:
+                    self._send(404, b'{"error":"not found"}')
+
+            def _write(self, params):
+                server.stats['write_requests'] += 1
+                server.stats['write_bytes'] += self._wire_bytes
+                if params.get('db', '') in server.sink_databases:
+                    server.stats['points_written'] += self._body.count(b'\n') + (not self._body.endswith(b'\n'))
+                    self._send(204)
+                    return
+                precision = params.get('precision', 'ns')
+                if precision not in _PRECISION_NS:
+                    self._send(400, json.dumps({'error': f'invalid precision {precision!r}'}).encode())
+                    return
+                try:
+                    count = server.store.write(params.get('db', ''),
+                                               self._body.decode('utf-8'),
+                                               precision)
+                except Exception as e:
+                    self._send(400, json.dumps({'error': f'unable to parse: {e}'}).encode())
+                    return
+                server.stats['points_written'] += count
+                self._send(204)
+
+            def _query(self, params):
+                server.stats['query_requests'] += 1
+                use_msgpack = (server.msgpack and params.get('chunked') != 'true'
+                               and 'application/x-msgpack' in self.headers.get('Accept', ''))
+                epoch = params.get('epoch') or ('ns' if use_msgpack else None)
+                try:
+                    results = server.execute(params.get('db', ''), params.get('q', ''), epoch)
+                except InfluxQLParseError as e:
+                    self._send(400, json.dumps({'error': str(e)}).encode())
+                    return
+                if use_msgpack:
+                    if not params.get('epoch'):
+                        self._msgpack_times(results)
+                    body = msgpack.packb({'results': results})
+                    server.stats['query_bytes'] += len(body)
+                    self._send(200, body, 'application/x-msgpack')
+                    return
+                if params.get('chunked') == 'true':
+                    size = int(params.get('chunk_size') or 10000)
+                    body = b''.join(json.dumps({'results': [r]}).encode() + b'\n'
+                                    for result in results
+                                    for r in self._chunks(result, size))
+                else:
+                    body = json.dumps({'results': results}).encode()
+                server.stats['query_bytes'] += len(body)
+                self._send(200, body)
+
+            @staticmethod
+            def _msgpack_times(results: List[Dict]) -> None:
+                """Время в нс -> расширение MessagePack 5 (секунды, наносекунды)"""
+                for result in results:
+                    for series in result.get('series', []):
+                        if 'time' not in series['columns']:
+                            continue
+                        i = series['columns'].index('time')
+                        for row in series['values']:
+                            seconds, nanoseconds = divmod(row[i], 1_000_000_000)
+                            row[i] = msgpack.ExtType(5, struct.pack('>QI', seconds, nanoseconds))
+
+            @staticmethod
+            def _chunks(result: Dict, size: int):
+                series = result.get('series')
+                if not series:
+                    yield result
+                    return
+                parts = []
+                for item in series:
+                    for start in range(0, len(item['values']), size):
+                        parts.append(dict(item, values=item['values'][start:start + size]))
+                for i, part in enumerate(parts):
+                    chunk = {'statement_id': result['statement_id'], 'series': [part]}
+                    if i < len(parts) - 1:
+                        chunk['partial'] = True
+                    yield chunk
+
+        return Handler
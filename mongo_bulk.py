@@ -0,0 +1,330 @@
+"""
+Пакетная запись кривых (DataFrame) в MongoDB
+
+Документы кривых готовятся (сериализация DataFrame, при необходимости
+перенос в GridFS) в пуле рабочих потоков и отправляются неупорядоченными
+bulk_write пачками ограниченного размера (по числу документов и байтам).
+Номера версий всех кривых пачки определяются одним запросом агрегации.
+Если номер версии успел занять другой процесс (уникальный индекс
+name_version), кривая получает следующий номер и отправляется повторно.
+По итогам возвращается результат по каждой кривой.
+
+Режимы:
+    insert - новая версия каждой кривой (как write_DF_2mongo)
+    upsert - замена последней версии кривой (новая кривая - версия 1)
+"""
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Iterable, Tuple, Union
+
+import bson
+from bson import ObjectId
+from pymongo import InsertOne, ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from mongo_frames import encode_payload, delete_files
+from mongo_query import latest_versions, VERSION_RETRIES
+
+# предел размера документа MongoDB
+MAX_DOCUMENT_BYTES = 16 * 1024 * 1024
+DUPLICATE_KEY = 11000
+
+
+def curve_name(Equipment='TA3', Name='D0', Subsystem='St2', Model='Base') -> str:
+    """Имя записи кривой: Equipment[.Subsystem].Name[:Model]"""
+    name = Equipment
+    if Subsystem is not None:
+        name = name + '.' + Subsystem
+    name = name + '.' + Name
+    if Model != 'Base':
+        name = name + ':' + Model
+    return name
+
+
+@dataclass
+class CurveEntry:
+    """Кривая для записи (параметры как у write_DF_2mongo)"""
+    frame: Any
+    Equipment: str = 'TA3'
+    Subsystem: Optional[str] = 'St2'
+    Name: str = 'D0'
+    Model: str = 'Base'
+
+    @property
+    def name(self) -> str:
+        return curve_name(self.Equipment, self.Name, self.Subsystem, self.Model)
+
+    @classmethod
+    def of(cls, entry: Union['CurveEntry', Dict[str, Any], Tuple]) -> 'CurveEntry':
+        """CurveEntry из словаря или кортежа (frame, Equipment, Subsystem, Name, Model)"""
+        if isinstance(entry, cls):
+            return entry
+        if isinstance(entry, dict):
+            entry = dict(entry)
+            if 'DFSt2' in entry:
+                entry['frame'] = entry.pop('DFSt2')
+            return cls(**entry)
+        return cls(*entry)
+
+
+def curve_document(db, entry: CurveEntry, format: str = 'json') -> Tuple[Dict[str, Any], List[Any]]:
+    """
+    Документ записи кривой (без номера версии)
+
+    Args:
+        db: База pymongo (для GridFS)
+        entry: Кривая
+        format: 'json', 'arrow' или 'parquet' (см. mongo_frames)
+
+    Returns:
+        Tuple: (документ, список _id файлов GridFS)
+    """
+    file_ids = []
+    if format == 'json':
+        # внешний модуль нужен только прежнему формату JSON
+        from json_convertor import convert2jsonMongo
+        payload = convert2jsonMongo(entry.frame)
+    else:
+        payload, file_ids = encode_payload(db, entry.frame, format, filename=entry.name)
+    document = {'name': entry.name,
+                'Equipment': entry.Equipment,
+                'Subsystem': entry.Subsystem,
+                'Name': entry.Name,
+                'Model': entry.Model,
+                'Type': 'Curve',
+                'DF': payload}
+    if file_ids:
+        document['gridfs'] = file_ids
+    return document, file_ids
+
+
+@dataclass
+class CurveResult:
+    """Результат записи одной кривой"""
+    index: int
+    name: str
+    success: bool = False
+    version: Optional[int] = None
+    id: Any = None
+    bytes: int = 0
+    replaced: bool = False
+    error: Optional[str] = None
+
+
+@dataclass
+class BulkReport:
+    """Отчёт о пакетной записи кривых (результаты в порядке входных кривых)"""
+    results: List[CurveResult] = field(default_factory=list)
+    batches: int = 0
+
+    @property
+    def written(self) -> int:
+        return sum(1 for r in self.results if r.success)
+
+    @property
+    def failed(self) -> List[CurveResult]:
+        return [r for r in self.results if not r.success]
+
+    @property
+    def success(self) -> bool:
+        return not self.failed
+
+    def __bool__(self) -> bool:
+        return self.success
+
+    def __str__(self) -> str:
+        return (f"кривых: {len(self.results)}, записано: {self.written}, "
+                f"ошибок: {len(self.failed)}, пачек: {self.batches}")
+
+
+class CurveBulkWriter:
+    """Пакетная запись кривых: подготовка в пуле потоков, неупорядоченный bulk_write"""
+
+    def __init__(self, db,
+                 format: str = 'json',
+                 mode: str = 'insert',
+                 workers: int = 4,
+                 batch_documents: int = 500,
+                 batch_bytes: int = 32 * 1024 * 1024,
+                 collection: str = 'posts'):
+        """
+        Args:
+            db: База pymongo
+            format: Формат DataFrame: 'json', 'arrow' или 'parquet'
+            mode: 'insert' (новые версии) или 'upsert' (замена последней версии)
+            workers: Число потоков подготовки документов
+            batch_documents: Максимум документов в пачке bulk_write
+            batch_bytes: Максимальный размер пачки (BSON), байт
+            collection: Коллекция кривых
+        """
+        if mode not in ('insert', 'upsert'):
+            raise ValueError(f"Неизвестный режим {mode!r}, ожидается 'insert' или 'upsert'")
+        self.db = db
+        self.collection = db[collection]
+        self.format = format
+        self.mode = mode
+        self.workers = max(1, int(workers))
+        self.batch_documents = max(1, int(batch_documents))
+        self.batch_bytes = int(batch_bytes)
+
+    def _prepare(self, item: Tuple[int, CurveEntry, Dict[str, Any]]):
+        index, entry, target = item
+        result = CurveResult(index, entry.name, version=target['version'],
+                             replaced=target.get('replaced', False))
+        file_ids = []
+        try:
+            document, file_ids = curve_document(self.db, entry, self.format)
+            document['_id'] = target['_id']
+            document['version'] = target['version']
+            result.id = document['_id']
+            result.bytes = len(bson.encode(document))
+            if result.bytes > MAX_DOCUMENT_BYTES:
+                raise ValueError(f"размер документа {result.bytes} байт превышает 16 МБ; "
+                                 f"используйте формат 'arrow' или 'parquet'")
+        except Exception as e:
+            delete_files(self.db, file_ids)
+            result.error = f"{type(e).__name__}: {e}"
+            return result, None, []
+        return result, document, file_ids
+
+    def _targets(self, entries: List[CurveEntry]) -> List[Dict[str, Any]]:
+        """
+        Номер версии и _id документа для каждой кривой
+
+        Новые _id создаются здесь, в вызывающем потоке и в порядке entries:
+        порядок _id (время вставки) должен совпадать с порядком версий,
+        а рабочие потоки завершают подготовку в произвольном порядке.
+        """
+        latest = latest_versions(self.collection, [e.name for e in entries])
+        targets = []
+        if self.mode == 'insert':
+            issued: Dict[str, int] = {}
+            for entry in entries:
+                version = issued.get(entry.name) or latest.get(entry.name, {}).get('version', 0)
+                issued[entry.name] = version + 1
+                targets.append({'version': version + 1, '_id': ObjectId()})
+            return targets
+        for entry in entries:
+            current = latest.get(entry.name)
+            if current is None:
+                targets.append({'version': 1, '_id': ObjectId()})
+            else:
+                targets.append({'version': current['version'], '_id': current['_id'],
+                                'replaced': True, 'gridfs': current.get('gridfs') or []})
+        return targets
+
+    def write(self, entries: Iterable[Union[CurveEntry, Dict[str, Any], Tuple]]) -> BulkReport:
+        """
+        Запись кривых
+
+        Args:
+            entries: CurveEntry, словари с полями CurveEntry (или DFSt2
+                вместо frame) либо кортежи (frame, Equipment, Subsystem, Name, Model)
+
+        Returns:
+            BulkReport: Результат по каждой кривой в порядке entries
+        """
+        entries = [CurveEntry.of(e) for e in entries]
+        report = BulkReport([None] * len(entries))
+        if not entries:
+            report.results = []
+            return report
+
+        targets = self._targets(entries)
+        items = list(zip(range(len(entries)), entries, targets))
+        if self.mode == 'upsert':
+            # в одном вызове у кривой остаётся последняя из повторяющихся записей
+            last = {e.name: i for i, e in enumerate(entries)}
+            for i, entry in enumerate(entries):
+                if last[entry.name] != i:
+                    report.results[i] = CurveResult(i, entry.name,
+                                                    error=f"заменена записью {last[entry.name]} того же вызова")
+            items = [item for item in items if report.results[item[0]] is None]
+
+        batch: List[Tuple[CurveResult, Dict[str, Any], List[Any]]] = []
+        batch_bytes = 0
+        conflicts = []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for result, document, file_ids in pool.map(self._prepare, items):
+                report.results[result.index] = result
+                if document is None:
+                    continue
+                if batch and (len(batch) >= self.batch_documents
+                              or batch_bytes + result.bytes > self.batch_bytes):
+                    conflicts += self._flush(batch, report)
+                    batch, batch_bytes = [], 0
+                batch.append((result, document, file_ids))
+                batch_bytes += result.bytes
+            if batch:
+                conflicts += self._flush(batch, report)
+        self._retry_conflicts(conflicts, report)
+
+        if self.mode == 'upsert':
+            # файлы GridFS заменённых версий больше не нужны
+            old_files = [target.get('gridfs') or [] for (i, _, target) in items if report.results[i].success]
+            delete_files(self.db, list(itertools.chain.from_iterable(old_files)))
+        return report
+
+    def _retry_conflicts(self, conflicts: List[Tuple[CurveResult, Dict[str, Any], List[Any]]],
+                         report: BulkReport) -> None:
+        """
+        Повторная вставка кривых, номер версии которых занял другой процесс
+
+        Кривые получают номера после последних записанных версий и новые _id
+        (в порядке входных кривых).
+        """
+        for attempt in range(VERSION_RETRIES):
+            if not conflicts:
+                return
+            conflicts.sort(key=lambda item: item[0].index)
+            latest = latest_versions(self.collection, [result.name for result, _, _ in conflicts])
+            issued: Dict[str, int] = {}
+            for result, document, _ in conflicts:
+                version = issued.get(result.name) or latest.get(result.name, {}).get('version', 0)
+                issued[result.name] = version + 1
+                document['version'] = result.version = version + 1
+                document['_id'] = result.id = ObjectId()
+            retry, conflicts = conflicts, []
+            for start in range(0, len(retry), self.batch_documents):
+                conflicts += self._flush(retry[start:start + self.batch_documents], report)
+        for result, _, file_ids in conflicts:
+            result.error = f"{DUPLICATE_KEY}: номер версии занят, попыток {VERSION_RETRIES + 1}"
+            delete_files(self.db, file_ids)
+
+    def _flush(self, batch: List[Tuple[CurveResult, Dict[str, Any], List[Any]]],
+               report: BulkReport) -> List[Tuple[CurveResult, Dict[str, Any], List[Any]]]:
+        """
+        Отправка пачки одним неупорядоченным bulk_write
+
+        Returns:
+            List: Вставки, отклонённые уникальным индексом (для повтора)
+        """
+        report.batches += 1
+        errors: Dict[int, Tuple[Any, str]] = {}
+        # документы отклонены сервером - их файлы GridFS можно удалить;
+        # при сбое соединения часть пачки могла быть записана, файлы остаются
+        rejected = True
+        operations = [ReplaceOne({'_id': document['_id']}, document, upsert=True)
+                      if result.replaced else InsertOne(document)
+                      for result, document, _ in batch]
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                errors[error['index']] = (error.get('code'), f"{error.get('code')}: {error.get('errmsg')}")
+        except Exception as e:
+            errors = {i: (None, f"{type(e).__name__}: {e}") for i in range(len(batch))}
+            rejected = False
+        conflicts = []
+        for i, item in enumerate(batch):
+            result, _, file_ids = item
+            if i not in errors:
+                result.success = True
+            elif errors[i][0] == DUPLICATE_KEY and not result.replaced:
+                conflicts.append(item)
+            else:
+                result.error = errors[i][1]
+                if rejected:
+                    delete_files(self.db, file_ids)
+        return conflicts
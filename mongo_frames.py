@@ -0,0 +1,171 @@
+"""
+Хранение DataFrame в MongoDB в двоичном колоночном виде
+
+Формат записи выбирается параметром: 'json' (прежний, строка to_json),
+'arrow' (Arrow IPC) или 'parquet'. Двоичные форматы сжаты (zstd),
+сохраняют типы столбцов и индекса и читаются без разбора текста.
+
+Двоичный DataFrame в документе - словарь-маркер:
+
+    {'_frame': 'arrow', 'data': <bytes>}                 в самом документе
+    {'_frame': 'arrow', 'gridfs': <ObjectId>, 'size': n}  в GridFS
+
+Если двоичные данные документа больше spill_bytes, самые крупные из них
+переносятся в GridFS (бакет 'frames'), чтобы не упираться в ограничение
+документа 16 МБ. Чтение определяет формат по значению: строки -
+прежний JSON, словари-маркеры - двоичный формат.
+"""
+import io
+from typing import Optional, Dict, Any, List, Tuple, Callable
+
+import pandas as pd
+import pyarrow as pa
+from gridfs import GridFSBucket
+
+FORMATS = ('json', 'arrow', 'parquet')
+BUCKET = 'frames'
+# запас до 16 МБ на заголовок документа и накладные расходы BSON
+SPILL_BYTES = 8 * 1024 * 1024
+
+
+def frame_to_bytes(df: pd.DataFrame, format: str = 'arrow', compression: str = 'zstd') -> bytes:
+    """
+    DataFrame в байты
+
+    Args:
+        df: Данные
+        format: 'arrow' (Arrow IPC) или 'parquet'
+        compression: Сжатие: 'zstd', 'lz4' (arrow), 'snappy' (parquet) или None
+
+    Returns:
+        bytes: Данные вместе с индексом и метаданными типов pandas
+    """
+    if format == 'arrow':
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        sink = io.BytesIO()
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+    if format == 'parquet':
+        sink = io.BytesIO()
+        df.to_parquet(sink, engine='pyarrow', compression=compression, index=True)
+        return sink.getvalue()
+    raise ValueError(f"Неизвестный формат {format!r}, ожидается 'arrow' или 'parquet'")
+
+
+def bytes_to_frame(data: bytes, format: str) -> pd.DataFrame:
+    """Обратное преобразование frame_to_bytes"""
+    if format == 'arrow':
+        return pa.ipc.open_file(pa.BufferReader(data)).read_all().to_pandas()
+    if format == 'parquet':
+        return pd.read_parquet(io.BytesIO(data), engine='pyarrow')
+    raise ValueError(f"Неизвестный формат {format!r}")
+
+
+def is_frame_blob(value) -> bool:
+    """Значение - маркер двоичного DataFrame"""
+    return isinstance(value, dict) and '_frame' in value
+
+
+def has_frame_blobs(value) -> bool:
+    """В значении поля (DataFrame или словарь DataFrame) есть двоичные DataFrame"""
+    return is_frame_blob(value) or (
+        isinstance(value, dict) and any(is_frame_blob(v) for v in value.values()))
+
+
+def encode_payload(db, payload, format: str = 'arrow',
+                   compression: str = 'zstd',
+                   spill_bytes: int = SPILL_BYTES,
+                   filename: str = '') -> Tuple[Any, List[Any]]:
+    """
+    DataFrame или словарь DataFrame в значение поля документа
+
+    Прочие значения словаря сохраняются как есть.
+
+    Args:
+        db: База pymongo (для GridFS)
+        payload: DataFrame или словарь {ключ: DataFrame}
+        format: 'arrow' или 'parquet'
+        compression: Сжатие (см. frame_to_bytes)
+        spill_bytes: Предел двоичных данных в документе; сверх него крупные
+            DataFrame переносятся в GridFS
+        filename: Имя файлов GridFS (имя записи)
+
+    Returns:
+        Tuple: (значение поля, список _id файлов GridFS)
+    """
+    single = isinstance(payload, pd.DataFrame)
+    items = {None: payload} if single else dict(payload)
+    blobs = {k: frame_to_bytes(v, format, compression)
+             for k, v in items.items() if isinstance(v, pd.DataFrame)}
+
+    spilled = set()
+    total = sum(len(b) for b in blobs.values())
+    for key in sorted(blobs, key=lambda k: len(blobs[k]), reverse=True):
+        if total <= spill_bytes:
+            break
+        spilled.add(key)
+        total -= len(blobs[key])
+
+    bucket = GridFSBucket(db, bucket_name=BUCKET) if spilled else None
+    file_ids = []
+    out = {}
+    for key, value in items.items():
+        if key not in blobs:
+            out[key] = value
+        elif key in spilled:
+            name = filename if key is None else f'{filename}/{key}'
+            file_id = bucket.upload_from_stream(name, blobs[key],
+                                                metadata={'format': format, 'compression': compression})
+            file_ids.append(file_id)
+            out[key] = {'_frame': format, 'gridfs': file_id, 'size': len(blobs[key])}
+        else:
+            out[key] = {'_frame': format, 'data': blobs[key]}
+    return (out[None] if single else out), file_ids
+
+
+def decode_payload(db, value, legacy: Optional[Callable[[Any], Any]] = None):
+    """
+    Значение поля документа обратно в DataFrame или словарь DataFrame
+
+    Args:
+        db: База pymongo (для GridFS)
+        value: Значение поля, записанное encode_payload или в прежнем JSON
+        legacy: Преобразование значений без двоичных DataFrame (прежний
+            JSON); по умолчанию pd.read_json для строк
+
+    Returns:
+        DataFrame или словарь
+    """
+    if not has_frame_blobs(value):
+        return (legacy or _read_json)(value)
+    if is_frame_blob(value):
+        return _decode_blob(db, value)
+    return {k: _decode_blob(db, v) if is_frame_blob(v) else _read_json(v)
+            for k, v in value.items()}
+
+
+def delete_files(db, file_ids: List[Any]) -> None:
+    """Удаление файлов GridFS, на которые ссылались удалённые документы"""
+    if not file_ids:
+        return
+    bucket = GridFSBucket(db, bucket_name=BUCKET)
+    for file_id in file_ids:
+        bucket.delete(file_id)
+
+
+def _decode_blob(db, blob: Dict[str, Any]) -> pd.DataFrame:
+    if 'gridfs' in blob:
+        data = GridFSBucket(db, bucket_name=BUCKET).open_download_stream(blob['gridfs']).read()
+    else:
+        data = blob['data']
+    return bytes_to_frame(data, blob['_frame'])
+
+
+def _read_json(value):
+    if isinstance(value, str):
+        return pd.read_json(io.StringIO(value))
+    if isinstance(value, dict):
+        return {k: _read_json(v) for k, v in value.items()}
+    return value
@@ -0,0 +1,107 @@
+"""
+Общий клиент MongoDB на процесс
+
+pymongo.MongoClient сам держит пул соединений и потоки мониторинга
+топологии, поэтому на процесс достаточно одного клиента на сервер.
+Создание клиента на каждый вызов означает новое соединение,
+аутентификацию и обнаружение топологии; общий клиент делает их один раз,
+а дальше каждая операция - один запрос к серверу.
+
+Клиент создаётся при первом обращении (connect=False - без соединения
+в конструкторе). После fork дочерний процесс получает собственный клиент:
+соединения и потоки родителя в нём непригодны. Закрытие -
+close_mongo_clients() при завершении работы.
+"""
+import os
+import threading
+from typing import Optional, Dict, Tuple, Any
+
+from pymongo import MongoClient
+
+
+class SharedClient:
+    """
+    Клиент из общего пула: всё как у MongoClient, но close() не закрывает
+    общий клиент (соединения остаются в пуле для следующих вызовов)
+    """
+
+    def __init__(self, client: MongoClient):
+        self._client = client
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+    def __getitem__(self, name: str):
+        return self._client[name]
+
+    def close(self) -> None:
+        pass
+
+
+_clients: Dict[Tuple[Any, ...], Tuple[int, MongoClient]] = {}
+_clients_lock = threading.Lock()
+
+
+def mongo_options(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Параметры MongoClient из словаря настроек (config.MONGO)
+
+    Args:
+        settings: Словарь с необязательными ключами pool_size_ (максимум
+            соединений, по умолчанию 100), min_pool_size_, timeout_
+            (таймаут операции, с), connect_timeout_ (с),
+            server_selection_timeout_ (с), max_idle_time_ (с)
+
+    Returns:
+        Dict: Именованные аргументы MongoClient
+    """
+    options = {'maxPoolSize': int(settings.get('pool_size_', 100)),
+               'minPoolSize': int(settings.get('min_pool_size_', 0))}
+    for key, option in (('timeout_', 'socketTimeoutMS'),
+                        ('connect_timeout_', 'connectTimeoutMS'),
+                        ('server_selection_timeout_', 'serverSelectionTimeoutMS'),
+                        ('max_idle_time_', 'maxIdleTimeMS')):
+        if settings.get(key) is not None:
+            options[option] = int(settings[key] * 1000)
+    return options
+
+
+def get_mongo_client(host: str, port: int,
+                     username: Optional[str] = None,
+                     password: Optional[str] = None,
+                     **options) -> SharedClient:
+    """
+    Общий для процесса клиент сервера MongoDB (host, port, username)
+
+    Args:
+        host: Адрес сервера
+        port: Порт сервера
+        username: Имя пользователя
+        password: Пароль
+        **options: Параметры MongoClient (maxPoolSize, socketTimeoutMS, ...);
+            учитываются при создании клиента
+
+    Returns:
+        SharedClient: Клиент; close() у него можно вызывать как раньше
+    """
+    key = (host, int(port), username)
+    pid = os.getpid()
+    with _clients_lock:
+        entry = _clients.get(key)
+        if entry is None or entry[0] != pid:
+            # клиент родителя после fork не закрывается: его сокеты
+            # и потоки принадлежат родительскому процессу
+            client = MongoClient(host, int(port), username=username, password=password,
+                                 connect=False, **options)
+            entry = _clients[key] = (pid, client)
+        return SharedClient(entry[1])
+
+
+def close_mongo_clients() -> None:
+    """Закрытие всех общих клиентов процесса (следующий вызов создаст новые)"""
+    pid = os.getpid()
+    with _clients_lock:
+        for client_pid, client in _clients.values():
+            if client_pid == pid:
+                client.close()
+        _clients.clear()
@@ -0,0 +1,230 @@
+"""
+Построение запросов и конвейеров агрегации MongoDB для каталога кривых
+
+Каталог (get_list) - по одной строке на пару (name, Equipment): заголовок
+последней записанной версии. Группировка, подсчёт и страницы выполняются
+на сервере, в Python передаются только строки запрошенной страницы.
+
+Чтение одной версии (find_version) - поиск по индексу с sort + limit 1,
+время не зависит от длины истории записи. Номера последних версий многих
+записей сразу - latest_versions.
+"""
+import threading
+from typing import Optional, Dict, Any, List
+
+import pandas as pd
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+# Поля заголовка записи (без данных кривой)
+HEADER_FIELDS = ['name', 'Equipment', 'Subsystem', 'Name', 'Model', 'Type']
+
+
+def catalog_pipeline(query: Optional[Dict[str, Any]] = None,
+                     skip: int = 0,
+                     limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Конвейер агрегации каталога
+
+    Версии одной пары (name, Equipment) сворачиваются в одну строку с _id
+    и полями последней версии (по _id). Порядок строк - по первой версии
+    пары, как в исходной коллекции.
+
+    Args:
+        query: Фильтр find по полям записи
+        skip: Число пропускаемых строк каталога
+        limit: Размер страницы (None - все строки)
+
+    Returns:
+        List: Конвейер; при limit - один документ {'total': [{'total': n}],
+            'items': [...]}, иначе поток строк каталога
+    """
+    pipeline = [{'$sort': {'_id': 1}}]
+    if query:
+        pipeline.insert(0, {'$match': query})
+    group = {'_id': {'name': '$name', 'Equipment': '$Equipment'},
+             'first_id': {'$first': '$_id'},
+             'last_id': {'$last': '$_id'}}
+    group.update({f: {'$last': f'${f}'} for f in HEADER_FIELDS})
+    pipeline += [
+        {'$group': group},
+        {'$sort': {'first_id': 1}},
+        {'$project': {'_id': '$last_id', **{f: 1 for f in HEADER_FIELDS}}},
+    ]
+    if limit is None:
+        if skip:
+            pipeline.append({'$skip': int(skip)})
+        return pipeline
+    page = [{'$skip': int(skip)}] if skip else []
+    page.append({'$limit': int(limit)})
+    # без limit страница не ограничена, а $facet возвращает один документ (до 16 МБ)
+    pipeline.append({'$facet': {'total': [{'$count': 'total'}], 'items': page}})
+    return pipeline
+
+
+# Индексы коллекции кривых: последняя версия по имени (_id растёт со временем
+# вставки), версия по номеру (уникальна; записи без поля version, сохранённые
+# до его появления, в индекс не входят), выборки по оборудованию
+INDEXES = [
+    ([('name', 1), ('_id', -1)], {'name': 'name_latest'}),
+    ([('name', 1), ('version', -1)], {'name': 'name_version', 'unique': True,
+                                      'partialFilterExpression': {'version': {'$exists': True}}}),
+    ([('Equipment', 1), ('Subsystem', 1), ('Model', 1), ('_id', -1)], {'name': 'equipment_latest'}),
+]
+
+_indexed = set()
+_indexed_lock = threading.Lock()
+
+
+def ensure_indexes(collection, key=None) -> None:
+    """
+    Создание индексов INDEXES (один раз на коллекцию за время работы процесса)
+
+    Попытка тоже одна: если создать индексы не удалось (например, нет прав
+    createIndex), ошибка выбрасывается только при первом вызове.
+
+    Args:
+        collection: Коллекция pymongo
+        key: Ключ коллекции для учёта созданных индексов (по умолчанию
+            полное имя коллекции)
+    """
+    key = key or collection.full_name
+    with _indexed_lock:
+        if key in _indexed:
+            return
+        _indexed.add(key)
+        for keys, options in INDEXES:
+            collection.create_index(keys, **options)
+
+
+def version_filter(name: str,
+                   version: Optional[int] = None,
+                   as_of=None) -> Dict[str, Any]:
+    """
+    Фильтр find для выбора версии записи
+
+    Args:
+        name: Имя записи (поле name)
+        version: Номер версии (поле version, с 1)
+        as_of: Последняя версия, записанная не позже этого момента
+            (по времени вставки из _id, с точностью до секунды)
+    """
+    query: Dict[str, Any] = {'name': name}
+    if version is not None:
+        query['version'] = int(version)
+    if as_of is not None:
+        moment = pd.Timestamp(as_of)
+        if moment.tzinfo is None:
+            moment = moment.tz_localize('UTC')
+        # ObjectId хранит секунды: всё, вставленное в секунду as_of, включается
+        bound = moment.floor('s') + pd.Timedelta(seconds=1)
+        query['_id'] = {'$lt': ObjectId.from_datetime(bound.to_pydatetime())}
+    return query
+
+
+def find_version(collection, name: str,
+                 version: Optional[int] = None,
+                 as_of=None,
+                 projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Одна версия записи по индексу: последняя, по номеру или на момент as_of
+
+    Номер версии совпадает с порядковым номером вставки (next_version).
+    Записи, сохранённые до появления поля version, его не имеют - для них
+    номер выбирается пропуском ключей индекса name_latest без чтения
+    пропущенных документов.
+
+    Args:
+        collection: Коллекция pymongo
+        name: Имя записи
+        version: Номер версии (с 1; None - последняя)
+        as_of: Момент времени (см. version_filter)
+        projection: Проекция find
+
+    Returns:
+        Dict: Документ или None
+    """
+    query = version_filter(name, version, as_of)
+    document = next(iter(collection.find(query, projection).sort([('_id', -1)]).limit(1)), None)
+    if document is None and version is not None and int(version) > 0:
+        query = version_filter(name, None, as_of)
+        document = next(iter(collection.find(query, projection)
+                             .sort([('_id', 1)]).skip(int(version) - 1).limit(1)), None)
+        if document is not None and document.get('version') not in (None, int(version)):
+            document = None
+    return document
+
+
+def next_version(collection, name: str) -> int:
+    """
+    Номер следующей версии записи name: номер последней + 1, для истории
+    без поля version - число записей + 1
+    """
+    latest = collection.find_one({'name': name}, {'version': 1}, sort=[('_id', -1)])
+    if latest is None:
+        return 1
+    if latest.get('version') is not None:
+        return int(latest['version']) + 1
+    return collection.count_documents({'name': name}) + 1
+
+
+# Число попыток записи версии, номер которой одновременно занял другой процесс
+VERSION_RETRIES = 5
+
+
+def insert_version(collection, document: Dict[str, Any],
+                   retries: int = VERSION_RETRIES) -> int:
+    """
+    Вставка новой версии записи document['name']
+
+    Номер версии (next_version) и вставка не атомарны: если номер успел
+    занять другой процесс, уникальный индекс name_version отклоняет вставку,
+    и она повторяется со следующим номером.
+
+    Returns:
+        int: Номер записанной версии
+    """
+    for attempt in range(retries):
+        document['version'] = next_version(collection, document['name'])
+        # новый _id на каждую попытку: порядок _id совпадает с порядком версий
+        document['_id'] = ObjectId()
+        try:
+            collection.insert_one(document)
+            return document['version']
+        except DuplicateKeyError:
+            if attempt == retries - 1:
+                raise
+
+
+def latest_versions(collection, names: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Последние версии записей одним запросом (для пакетной записи)
+
+    Args:
+        collection: Коллекция pymongo
+        names: Имена записей
+
+    Returns:
+        Dict: {имя: {'_id', 'version', 'gridfs'}} для существующих записей
+    """
+    unique = list(dict.fromkeys(names))
+    if not unique:
+        return {}
+    # сортировка совпадает с индексом name_latest: $first - последняя версия
+    pipeline = [
+        {'$match': {'name': {'$in': unique}}},
+        {'$sort': {'name': 1, '_id': -1}},
+        {'$group': {'_id': '$name',
+                    'last_id': {'$first': '$_id'},
+                    'version': {'$first': '$version'},
+                    'gridfs': {'$first': '$gridfs'}}},
+    ]
+    latest = {}
+    for row in collection.aggregate(pipeline, allowDiskUse=True):
+        version = row.get('version')
+        if version is None:
+            # история без поля version: номер последней - число записей
+            version = collection.count_documents({'name': row['_id']})
+        latest[row['_id']] = {'_id': row['last_id'], 'version': int(version),
+                              'gridfs': row.get('gridfs') or []}
+    return latest
@@ -0,0 +1,563 @@
+"""
+MongoDB в памяти процесса для бенчмарков и проверок без сервера
+
+StubMongoClient повторяет используемую часть API pymongo.MongoClient.
+Документы хранятся в BSON (bson из pymongo), поэтому запись и чтение
+проходят те же сериализацию и проверку размера (16 МБ), что и с сервером.
+Поддерживаются:
+
+    insert_one / insert_many, find / find_one (сравнения $eq $ne $gt $gte
+    $lt $lte $in $nin $exists $regex, вложенные поля через точку),
+    проекция, sort / skip / limit, count_documents, delete_one / delete_many,
+    update_one / replace_one (upsert, $set $unset $inc), create_index
+    (unique и partialFilterExpression проверяются при записи - DuplicateKeyError),
+    aggregate ($match $project $group $sort $skip $limit $count $facet),
+    bulk_write, GridFS (StubGridFSBucket)
+
+Пример:
+    import mongo_pool, mongo_frames
+    mongo_pool.MongoClient = StubMongoClient
+    mongo_frames.GridFSBucket = StubGridFSBucket
+"""
+import re
+import threading
+from typing import Optional, Dict, Any, List, Iterator, Iterable, Tuple, Union
+
+import bson
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+_MISSING = object()
+
+
+def _get(document: Dict[str, Any], path: str):
+    value = document
+    for part in path.split('.'):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return _MISSING
+    return value
+
+
+def _compare(value, op: str, arg) -> bool:
+    if op == '$exists':
+        return (value is not _MISSING) == bool(arg)
+    if op == '$in':
+        return value is not _MISSING and value in arg
+    if op == '$nin':
+        return value is _MISSING or value not in arg
+    if op == '$ne':
+        return value is _MISSING or value != arg
+    if op == '$regex':
+        return isinstance(value, str) and re.search(arg, value) is not None
+    if value is _MISSING:
+        return False
+    if op == '$eq':
+        return value == arg
+    try:
+        if op == '$gt':
+            return value > arg
+        if op == '$gte':
+            return value >= arg
+        if op == '$lt':
+            return value < arg
+        if op == '$lte':
+            return value <= arg
+    except TypeError:
+        return False
+    raise ValueError(f'stub: неподдерживаемый оператор {op}')
+
+
+def matches(document: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    """Соответствие документа фильтру find"""
+    for key, condition in (query or {}).items():
+        if key == '$and':
+            if not all(matches(document, q) for q in condition):
+                return False
+            continue
+        if key == '$or':
+            if not any(matches(document, q) for q in condition):
+                return False
+            continue
+        value = _get(document, key)
+        if isinstance(condition, dict) and condition and all(k.startswith('$') for k in condition):
+            if not all(_compare(value, op, arg) for op, arg in condition.items()):
+                return False
+        elif value is _MISSING or value != condition:
+            return False
+    return True
+
+
+def project(document: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Проекция документа: включение или исключение полей верхнего уровня,
+    в $project агрегации также вычисляемые поля вида {'new': '$old'}
+    """
+    if not projection:
+        return document
+    computed = {k: v for k, v in projection.items() if isinstance(v, str) and v.startswith('$')}
+    include = {k for k, v in projection.items() if v and k != '_id' and k not in computed}
+    if include or computed:
+        out = {k: document[k] for k in document if k in include}
+        if '_id' not in computed and projection.get('_id', 1) and '_id' in document:
+            out = {'_id': document['_id'], **out}
+        for key, path in computed.items():
+            value = _get(document, path[1:])
+            if value is not _MISSING:
+                out[key] = value
+        return out
+    exclude = {k for k, v in projection.items() if not v}
+    return {k: v for k, v in document.items() if k not in exclude}
+
+
+def _evaluate(document: Dict[str, Any], expression):
+    """Значение выражения агрегации: '$поле', {'k': выражение, ...} или константа"""
+    if isinstance(expression, str) and expression.startswith('$'):
+        value = _get(document, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, dict):
+        return {k: _evaluate(document, v) for k, v in expression.items()}
+    return expression
+
+
+def _group(documents: List[Dict[str, Any]], spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    accumulators = [(name, *acc.popitem()) for name, acc in
+                    ((k, dict(v)) for k, v in spec.items() if k != '_id')]
+    groups: Dict[bytes, Dict[str, Any]] = {}
+    for document in documents:
+        key = _evaluate(document, spec['_id'])
+        hashable = bson.encode({'k': key})
+        out = groups.get(hashable)
+        first = out is None
+        if first:
+            out = groups[hashable] = {'_id': key}
+        for name, op, expression in accumulators:
+            value = _evaluate(document, expression)
+            if op == '$first':
+                if first:
+                    out[name] = value
+            elif op == '$last':
+                out[name] = value
+            elif op == '$sum':
+                out[name] = out.get(name, 0) + (value or 0)
+            elif op == '$push':
+                out.setdefault(name, []).append(value)
+            else:
+                raise ValueError(f'stub: неподдерживаемый аккумулятор {op}')
+    return list(groups.values())
+
+
+def _sort(documents: List[Dict[str, Any]], keys: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+    for key, direction in reversed(keys):
+        present = [d for d in documents if _get(d, key) is not _MISSING]
+        missing = [d for d in documents if _get(d, key) is _MISSING]
+        present.sort(key=lambda d: _get(d, key), reverse=direction < 0)
+        # отсутствующее поле меньше любого значения
+        documents = missing + present if direction > 0 else present + missing
+    return documents
+
+
+class StubResult:
+    """Результаты операций записи (поля как у pymongo.results)"""
+
+    def __init__(self, **fields):
+        self.acknowledged = True
+        self.__dict__.update(fields)
+
+
+class StubCursor:
+    """Курсор find: sort, skip, limit, итерация"""
+
+    def __init__(self, collection: 'StubCollection', query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction: int = 1) -> 'StubCursor':
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+
+    def skip(self, count: int) -> 'StubCursor':
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> 'StubCursor':
+        self._limit = count
+        return self
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        documents = self._collection._select(self._query)
+        if self._sort:
+            documents = _sort(documents, self._sort)
+        documents = documents[self._skip:]
+        if self._limit:
+            documents = documents[:self._limit]
+        return (project(d, self._projection) for d in documents)
+
+
+class StubCollection:
+    """Коллекция: документы в BSON в порядке вставки"""
+
+    def __init__(self, name: str, database: str = ''):
+        self.name = name
+        self.full_name = f'{database}.{name}'
+        self._documents: List[bytes] = []
+        self.indexes: Dict[str, Dict[str, Any]] = {}
+        # множество _id для проверки дубликатов (None - пересчитать)
+        self._ids: Optional[set] = set()
+        # значения ключей уникальных индексов (None - пересчитать)
+        self._unique: Optional[set] = set()
+        self._lock = threading.RLock()
+        self.stats = {'inserted': 0, 'found': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+    # --- внутреннее ------------------------------------------------------------
+
+    def _select(self, query) -> List[Dict[str, Any]]:
+        with self._lock:
+            raw = list(self._documents)
+        out = []
+        for data in raw:
+            document = bson.decode(data)
+            if matches(document, query):
+                out.append(document)
+                self.stats['bytes_out'] += len(data)
+        self.stats['found'] += len(out)
+        return out
+
+    def _encode(self, document: Dict[str, Any]) -> bytes:
+        document.setdefault('_id', ObjectId())
+        data = bson.encode(document)
+        if len(data) > 16 * 1024 * 1024:
+            raise ValueError(f'stub: размер документа {len(data)} байт превышает 16 МБ')
+        return data
+
+    def _id_set(self) -> set:
+        if self._ids is None:
+            self._ids = {bson.decode(data)['_id'] for data in self._documents}
+        return self._ids
+
+    def _unique_keys(self, document: Dict[str, Any]) -> List[Tuple[str, tuple]]:
+        """(индекс, значения ключа) уникальных индексов, в которые входит документ"""
+        keys = []
+        for name, index in self.indexes.items():
+            if index.get('unique') and matches(document, index.get('partialFilterExpression')):
+                values = (_get(document, k) for k, _ in index['key'])
+                keys.append((name, tuple(None if v is _MISSING else v for v in values)))
+        return keys
+
+    def _unique_set(self) -> set:
+        if self._unique is None:
+            self._unique = {key for data in self._documents
+                            for key in self._unique_keys(bson.decode(data))}
+        return self._unique
+
+    def _check_unique(self, document: Dict[str, Any], replaced=None) -> List[Tuple[str, tuple]]:
+        """Проверка уникальных индексов перед записью document (вместо replaced)"""
+        keys = self._unique_keys(document)
+        taken = self._unique_set()
+        if replaced is not None:
+            taken = taken - set(self._unique_keys(replaced))
+        for name, values in keys:
+            if (name, values) in taken:
+                raise DuplicateKeyError(f'E11000 duplicate key error index: {name} dup key: {values}', 11000)
+        return keys
+
+    def _indices(self, query) -> List[int]:
+        with self._lock:
+            return [i for i, data in enumerate(self._documents) if matches(bson.decode(data), query)]
+
+    # --- запись ----------------------------------------------------------------
+
+    def insert_one(self, document: Dict[str, Any]) -> StubResult:
+        data = self._encode(document)
+        with self._lock:
+            if document['_id'] in self._id_set():
+                raise DuplicateKeyError(f"E11000 duplicate key error index: _id_ dup key: {document['_id']}", 11000)
+            keys = self._check_unique(document)
+            self._documents.append(data)
+            self._ids.add(document['_id'])
+            self._unique.update(keys)
+        self.stats['inserted'] += 1
+        self.stats['bytes_in'] += len(data)
+        return StubResult(inserted_id=document['_id'])
+
+    def insert_many(self, documents: Iterable[Dict[str, Any]], ordered: bool = True) -> StubResult:
+        ids = [self.insert_one(d).inserted_id for d in documents]
+        return StubResult(inserted_ids=ids)
+
+    def delete_many(self, query: Dict[str, Any]) -> StubResult:
+        with self._lock:
+            indices = set(self._indices(query))
+            self._documents = [d for i, d in enumerate(self._documents) if i not in indices]
+            self._ids = self._unique = None
+        return StubResult(deleted_count=len(indices))
+
+    def delete_one(self, query: Dict[str, Any]) -> StubResult:
+        with self._lock:
+            indices = self._indices(query)[:1]
+            for i in indices:
+                del self._documents[i]
+            self._ids = self._unique = None
+        return StubResult(deleted_count=len(indices))
+
+    def replace_one(self, query: Dict[str, Any], replacement: Dict[str, Any],
+                    upsert: bool = False) -> StubResult:
+        return self._update(query, lambda old: {'_id': old['_id'], **replacement}, upsert,
+                            lambda: dict(replacement))
+
+    def update_one(self, query: Dict[str, Any], update: Dict[str, Any],
+                   upsert: bool = False) -> StubResult:
+        def apply(document):
+            document = dict(document)
+            for key, value in update.get('$set', {}).items():
+                document[key] = value
+            for key in update.get('$unset', {}):
+                document.pop(key, None)
+            for key, value in update.get('$inc', {}).items():
+                document[key] = document.get(key, 0) + value
+            return document
+
+        def new():
+            base = {k: v for k, v in query.items() if not k.startswith('$') and not isinstance(v, dict)}
+            base.update(update.get('$setOnInsert', {}))
+            return apply(base)
+        return self._update(query, apply, upsert, new)
+
+    def _update(self, query, apply, upsert, new) -> StubResult:
+        with self._lock:
+            indices = self._indices(query)[:1]
+            if indices:
+                i = indices[0]
+                old = bson.decode(self._documents[i])
+                document = apply(old)
+                self._check_unique(document, replaced=old)
+                self._documents[i] = self._encode(document)
+                self._unique = None
+                return StubResult(matched_count=1, modified_count=1, upserted_id=None)
+            if not upsert:
+                return StubResult(matched_count=0, modified_count=0, upserted_id=None)
+            document = new()
+            data = self._encode(document)
+            keys = self._check_unique(document)
+            self._documents.append(data)
+            self._id_set().add(document['_id'])
+            self._unique.update(keys)
+            return StubResult(matched_count=0, modified_count=0, upserted_id=document['_id'])
+
+    def bulk_write(self, requests: List[Any], ordered: bool = True, **kwargs) -> StubResult:
+        """
+        InsertOne, ReplaceOne, UpdateOne, DeleteOne, DeleteMany из pymongo;
+        ошибки операций - BulkWriteError с writeErrors, как у сервера
+        """
+        counts = {'inserted_count': 0, 'matched_count': 0, 'modified_count': 0,
+                  'deleted_count': 0, 'upserted_count': 0}
+        upserted_ids: Dict[int, Any] = {}
+        errors = []
+        for index, request in enumerate(requests):
+            kind = type(request).__name__
+            try:
+                if kind == 'InsertOne':
+                    self.insert_one(request._doc)
+                    counts['inserted_count'] += 1
+                    continue
+                if kind in ('ReplaceOne', 'UpdateOne'):
+                    method = self.replace_one if kind == 'ReplaceOne' else self.update_one
+                    result = method(request._filter, request._doc, upsert=bool(request._upsert))
+                    counts['matched_count'] += result.matched_count
+                    counts['modified_count'] += result.modified_count
+                    if result.upserted_id is not None:
+                        counts['upserted_count'] += 1
+                        upserted_ids[index] = result.upserted_id
+                    continue
+                if kind in ('DeleteOne', 'DeleteMany'):
+                    method = self.delete_one if kind == 'DeleteOne' else self.delete_many
+                    counts['deleted_count'] += method(request._filter).deleted_count
+                    continue
+                raise ValueError(f'stub: неподдерживаемая операция {kind}')
+            except DuplicateKeyError as e:
+                errors.append({'index': index, 'code': 11000, 'errmsg': str(e)})
+            except ValueError as e:
+                errors.append({'index': index, 'code': 2, 'errmsg': str(e)})
+            if errors and ordered:
+                break
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'writeConcernErrors': [],
+                                  'nInserted': counts['inserted_count'],
+                                  'nUpserted': counts['upserted_count'],
+                                  'nMatched': counts['matched_count'],
+                                  'nModified': counts['modified_count'],
+                                  'nRemoved': counts['deleted_count'], 'upserted': []})
+        return StubResult(upserted_ids=upserted_ids, **counts)
+
+    def create_index(self, keys: Union[str, List[Tuple[str, int]]], **options) -> str:
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        name = options.get('name') or '_'.join(f'{k}_{d}' for k, d in keys)
+        self.indexes[name] = {'key': list(keys), **options}
+        self._unique = None
+        return name
+
+    # --- чтение ----------------------------------------------------------------
+
+    def find(self, query: Optional[Dict[str, Any]] = None,
+             projection: Optional[Dict[str, Any]] = None, **kwargs) -> StubCursor:
+        cursor = StubCursor(self, query, projection)
+        if kwargs.get('sort'):
+            cursor.sort(kwargs['sort'])
+        if kwargs.get('skip'):
+            cursor.skip(kwargs['skip'])
+        if kwargs.get('limit'):
+            cursor.limit(kwargs['limit'])
+        return cursor
+
+    def find_one(self, query: Optional[Dict[str, Any]] = None,
+                 projection: Optional[Dict[str, Any]] = None, **kwargs) -> Optional[Dict[str, Any]]:
+        for document in self.find(query, projection, **kwargs).limit(1):
+            return document
+        return None
+
+    def count_documents(self, query: Dict[str, Any]) -> int:
+        return len(self._select(query))
+
+    def aggregate(self, pipeline: List[Dict[str, Any]], **kwargs) -> Iterator[Dict[str, Any]]:
+        return iter(self._pipeline(self._select(None), pipeline))
+
+    def _pipeline(self, documents: List[Dict[str, Any]],
+                  pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        for stage in pipeline:
+            (op, arg), = stage.items()
+            if op == '$match':
+                documents = [d for d in documents if matches(d, arg)]
+            elif op == '$project':
+                documents = [project(d, arg) for d in documents]
+            elif op == '$sort':
+                documents = _sort(documents, list(arg.items()))
+            elif op == '$skip':
+                documents = documents[arg:]
+            elif op == '$limit':
+                documents = documents[:arg]
+            elif op == '$group':
+                documents = _group(documents, arg)
+            elif op == '$count':
+                documents = [{arg: len(documents)}] if documents else []
+            elif op == '$facet':
+                documents = [{name: self._pipeline(list(documents), sub)
+                              for name, sub in arg.items()}]
+            else:
+                raise ValueError(f'stub: неподдерживаемая стадия {op}')
+        return documents
+
+
+class StubDatabase:
+    """База данных: коллекции по имени (db.posts или db['posts'])"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, StubCollection] = {}
+        self._buckets: Dict[str, Dict[ObjectId, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> StubCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = StubCollection(name, self.name)
+            return self._collections[name]
+
+    def __getattr__(self, name: str) -> StubCollection:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+
+class StubGridOut:
+    """Поток чтения файла StubGridFSBucket"""
+
+    def __init__(self, document: Dict[str, Any]):
+        self._file = document
+        self._id = document['_id']
+        self.filename = document['filename']
+        self.length = len(document['data'])
+        self.metadata = document['metadata']
+
+    def read(self) -> bytes:
+        return self._file['data']
+
+
+class StubGridFSBucket:
+    """
+    Замена gridfs.GridFSBucket: файлы хранятся целиком в памяти базы
+
+    Пример:
+        import mongo_frames
+        mongo_frames.GridFSBucket = StubGridFSBucket
+    """
+
+    def __init__(self, db: 'StubDatabase', bucket_name: str = 'fs', **kwargs):
+        self._files = db._buckets.setdefault(bucket_name, {})
+
+    def upload_from_stream(self, filename: str, source, metadata=None, **kwargs) -> ObjectId:
+        data = source if isinstance(source, (bytes, bytearray)) else source.read()
+        file_id = ObjectId()
+        self._files[file_id] = {'_id': file_id, 'filename': filename,
+                                'data': bytes(data), 'metadata': metadata}
+        return file_id
+
+    def open_download_stream(self, file_id) -> StubGridOut:
+        if file_id not in self._files:
+            raise KeyError(f'stub: нет файла {file_id}')
+        return StubGridOut(self._files[file_id])
+
+    def delete(self, file_id) -> None:
+        if self._files.pop(file_id, None) is None:
+            raise KeyError(f'stub: нет файла {file_id}')
+
+    def find(self, query: Optional[Dict[str, Any]] = None) -> List[StubGridOut]:
+        return [StubGridOut(d) for d in self._files.values() if matches(d, query)]
+
+
+class StubMongoClient:
+    """
+    Замена pymongo.MongoClient: данные общие для всех клиентов процесса
+
+    Аргументы конструктора (адрес, порт, учётные данные) принимаются
+    и игнорируются.
+    """
+
+    _databases: Dict[str, StubDatabase] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, *args, **kwargs):
+        self.closed = False
+
+    def __getitem__(self, name: str) -> StubDatabase:
+        with self._lock:
+            if name not in self._databases:
+                self._databases[name] = StubDatabase(name)
+            return self._databases[name]
+
+    def __getattr__(self, name: str) -> StubDatabase:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def list_database_names(self, *args, **kwargs) -> List[str]:
+        return list(self._databases)
+
+    def close(self) -> None:
+        self.closed = True
+
+    @classmethod
+    def reset(cls) -> None:
+        """Удалить все данные"""
+        with cls._lock:
+            cls._databases.clear()
@@ -0,0 +1,29 @@
+"""Проверки набора бенчмарков (benchmark) на заглушках серверов"""
+import pytest
+
+import benchmark
+
+
+def test_all_cases_run():
+    report = benchmark.run(rows=400, columns=3, tag_cardinality=3, repeat=1, warmup=0)
+    results = report['results']
+    assert not [name for name, result in results.items() if 'error' in result]
+    assert results['influx_read_DF']['repeat'] == 1
+    assert report['meta']['params']['rows'] == 400
+
+
+def test_unknown_case():
+    with pytest.raises(ValueError):
+        benchmark.run(rows=10, repeat=1, warmup=0, cases=['missing'])
+
+
+def test_compare_reports_regressions():
+    def result(p50, memory=1.0):
+        return {'rows': 100, 'latency_ms': {'p50': p50}, 'throughput_rows_s': 100 / (p50 / 1000),
+                'peak_memory_mb': memory}
+
+    baseline = {'results': {'a': result(10.0), 'b': result(10.0), 'c': result(10.0)}}
+    current = {'a': result(10.5), 'b': result(20.0), 'c': result(10.0, memory=2.0),
+               'd': result(1.0)}
+    regressions = benchmark.compare(current, baseline)
+    assert [line.split(':')[0] for line in regressions] == ['b', 'b', 'c']
@@ -0,0 +1,79 @@
+"""Проверки функций InfluxDB модуля database на StubInfluxServer"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+import database
+from influx_pool import close_pools
+from influx_stub_server import StubInfluxServer
+
+INDEX = pd.to_datetime(['2024-01-01 00:00', '2024-01-01 00:00', '2024-01-01 00:01',
+                        '2024-01-01 00:01', '2024-01-01 00:02', '2024-01-01 00:02'], utc=True)
+FRAME = pd.DataFrame({'v': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+                      'Ni': [1, 2, 1, 2, 1, np.nan],
+                      'Fleet': ['a', 'a', 'a', 'b', 'a', 'a']}, index=INDEX)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with StubInfluxServer() as server:
+        monkeypatch.setitem(config.INFLUX, 'IP_', server.host)
+        monkeypatch.setitem(config.INFLUX, 'port_', server.port)
+        monkeypatch.setattr(database, 'influx_spool', None)
+        yield server
+    close_pools()
+
+
+def stored(server, measurement):
+    return sorted((tags['Ni'], tags['Fleet'], fields['v'])
+                  for tags, _, fields in server.store.rows('test', measurement))
+
+
+def test_save_df_2_db_single_pass(server):
+    database.save_df_2_db(FRAME, table_='opt', database_='test', Tag_Names=['Ni', 'Fleet'])
+    # строка с пропуском в теге не пишется, значения тегов - как str() исходного значения
+    assert stored(server, 'opt') == [('1.0', 'a', 1.0), ('1.0', 'a', 3.0), ('1.0', 'a', 5.0),
+                                     ('2.0', 'a', 2.0), ('2.0', 'b', 4.0)]
+    assert server.stats['write_requests'] == 1
+
+
+def test_save_df_2_db_batches(server):
+    database.save_df_2_db(FRAME, table_='opt', database_='test', Tag_Names=['Ni', 'Fleet'],
+                          batch_size=2)
+    assert len(stored(server, 'opt')) == 5
+    assert server.stats['write_requests'] == 3
+
+
+def test_write_and_read_frame(server):
+    frame = FRAME[['v']]
+    database.write_DF_2_influxDB(frame.iloc[::2], table_='raw', database_='test')
+    df = database.read_DF_from_influxDB(database_='test', table_='raw',
+                                        timestamp_='2024-01-01', timestamp_to='2024-01-02',
+                                        time_zone_='UTC')
+    assert df['v'].tolist() == [1.0, 3.0, 5.0]
+
+
+def test_unstack_caches_key_probe_and_posts_long_queries(server, monkeypatch):
+    names = [f'param_{i:05d}' for i in range(300)]
+    database.influx_write(b'calc,name=param_00001 value=1.5 1704067200000000000\n'
+                          b'calc,name=param_00002 value=2.5 1704067200000000000\n'
+                          b'calc,name=other value=9.0 1704067200000000000\n', 'test', 'n')
+    database._influx_catalogs.clear()
+    session = database.get_pool(server.host, server.port, ssl=database.influx_ssl)._session
+    methods = []
+    request = session.request
+    monkeypatch.setattr(session, 'request',
+                        lambda **kwargs: methods.append(kwargs['method']) or request(**kwargs))
+    read = lambda: database.read_DF_from_influxDB_unstack(
+        database_='test', table_='calc', timestamp_='2024-01-01', timestamp_to='2024-01-02',
+        time_zone_='UTC', names_=names)
+    df = read()
+    # длинный фильтр по name уходит телом POST, а не в URL
+    assert methods[-1] == 'POST'
+    assert sorted(df.keys()) == ['param_00001', 'param_00002']
+    assert df['param_00002'].tolist() == [2.5]
+    requests = server.stats['query_requests']
+    read()
+    # схема взята из каталога: повторное чтение - один запрос данных
+    assert server.stats['query_requests'] == requests + 1
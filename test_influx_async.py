@@ -0,0 +1,74 @@
+"""Проверки асинхронного менеджера (influx_async) на StubInfluxServer"""
+import asyncio
+
+import pandas as pd
+import pytest
+
+from influx_async import AsyncInfluxDBManager
+from influx_pool import close_pools
+from influx_stub_server import StubInfluxServer
+from InfluxDatabase import EnhancedInfluxDBManager
+
+FRAME = pd.DataFrame({'v': [1.0, 2.0, 3.0, 4.0],
+                      'Equipment': ['A', 'A', 'B', 'B']},
+                     index=pd.date_range('2024-01-01', periods=4, freq='min', tz='UTC'))
+
+
+@pytest.fixture
+def server():
+    with StubInfluxServer() as server:
+        yield server
+
+
+def run(server, scenario, **kwargs):
+    async def main():
+        config = {'DB_name': 'test', 'IP_': server.host, 'port_': server.port}
+        async with AsyncInfluxDBManager(config, **kwargs) as manager:
+            return await scenario(manager)
+    return asyncio.run(main())
+
+
+def test_write_and_read(server):
+    async def scenario(manager):
+        assert await manager.write_dataframe_enhanced(FRAME, 'm', tag_columns=['Equipment'])
+        return await asyncio.gather(
+            manager.read_data('m', '2024-01-01', '2024-01-02', tags={'Equipment': 'A'}, time_zone=None),
+            manager.read_data('m', '2024-01-01', '2024-01-02', tags={'Equipment': 'B'}, time_zone=None))
+
+    first, second = run(server, scenario, batch_size=1, gzip=True)
+    assert first['v'].tolist() == [1.0, 2.0] and second['v'].tolist() == [3.0, 4.0]
+    assert server.stats['write_requests'] == 4
+
+
+def test_read_last_points(server):
+    async def scenario(manager):
+        await manager.write_dataframe_enhanced(FRAME, 'm', tag_columns=['Equipment'])
+        return await manager.read_last_points('m', group_by='Equipment', lookback='100000d')
+
+    df = run(server, scenario)
+    assert sorted(df['v'].tolist()) == [2.0, 4.0]
+
+
+def test_write_error_reported(server):
+    async def scenario(manager):
+        return await manager.write_dataframe_enhanced(FRAME, 'm', field_columns=['Equipment'])
+
+    assert run(server, scenario) is False
+
+
+def test_write_invalidates_shared_cache(server):
+    config = {'DB_name': 'test', 'IP_': server.host, 'port_': server.port}
+    reader = EnhancedInfluxDBManager(config)
+    reader.enable_cache()
+
+    def read():
+        return reader.read_data('m', '2024-01-01', '2024-01-02', time_zone='UTC')['v'].tolist()
+
+    def run_write(frame):
+        return run(server, lambda manager: manager.write_dataframe_enhanced(frame, 'm'))
+
+    run_write(FRAME[['v']].iloc[:2])
+    assert read() == [1.0, 2.0]
+    run_write(FRAME[['v']].iloc[2:])
+    assert read() == [1.0, 2.0, 3.0, 4.0]
+    close_pools()
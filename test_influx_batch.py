@@ -0,0 +1,49 @@
+"""Проверки столбцовой пачки точек (InfluxBatch, InfluxDataBuilder)"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from InfluxDatabase import InfluxBatch, InfluxDataBuilder, InfluxDataPoint
+
+T0 = pd.Timestamp('2024-01-01', tz='UTC')
+POINTS = [InfluxDataPoint('m', {'v': 1.5, 'n': 2}, {'k': 'a'}, T0),
+          InfluxDataPoint('m', {'v': 2.5}, {'k': 'b', 'x': 1}, T0 + pd.Timedelta('1s')),
+          InfluxDataPoint('m', {'n': 3}, {}, T0 + pd.Timedelta('2s'))]
+
+
+def test_columns_from_points():
+    batch = InfluxBatch(POINTS)
+    assert len(batch) == 3 and batch.measurement == 'm'
+    assert batch.time.tolist() == [T0.value, T0.value + 10**9, T0.value + 2 * 10**9]
+    assert batch.fields['v'].dtype == np.float64 and np.isnan(batch.fields['v'][2])
+    assert str(batch.fields['n'].dtype) == 'Int64'
+    assert list(batch.tags['k'].categories) == ['a', 'b']
+    assert list(batch.tags['x'].categories) == ['1']
+
+
+def test_round_trip_points():
+    points = InfluxBatch(POINTS).points
+    assert [p.fields for p in points] == [{'v': 1.5, 'n': 2}, {'v': 2.5}, {'n': 3}]
+    assert [p.tags for p in points] == [{'k': 'a'}, {'k': 'b', 'x': '1'}, {}]
+    assert [pd.Timestamp(p.timestamp, tz='UTC') for p in points] == [p.timestamp for p in POINTS]
+
+
+def test_lines_keep_field_types():
+    lines = InfluxBatch(POINTS).to_lines('s')
+    assert lines == [f'm,k=a v=1.5,n=2i {T0.value // 10**9}',
+                     f'm,k=b,x=1 v=2.5 {T0.value // 10**9 + 1}',
+                     f'm n=3i {T0.value // 10**9 + 2}']
+
+
+def test_builder_batch():
+    builder = InfluxDataBuilder('m')
+    builder.with_field('v', 1.0).with_tag('k', 'a').with_timestamp(T0).append()
+    builder.with_field('w', 2.0).with_timestamp(T0 + pd.Timedelta('1s')).append()
+    batch = builder.build_batch()
+    assert len(batch) == 2 and batch.field_names == ['v', 'w']
+    assert batch.to_dataframe()['k'].tolist()[0] == 'a'
+
+
+def test_mixed_measurements_rejected():
+    with pytest.raises(ValueError):
+        InfluxBatch(POINTS + [InfluxDataPoint('other', {'v': 1.0}, {}, T0)])
@@ -0,0 +1,98 @@
+"""Проверки пакетной записи (influx_batch_writer)"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from influxdb.exceptions import InfluxDBClientError
+
+from influx_batch_writer import BatchWriter, is_retryable
+from influx_spool import SpoolFullError
+
+LINES = [f'm v={i} {i}' for i in range(10)]
+
+
+def failing(errors, sent):
+    def send(payload):
+        if errors:
+            raise errors.pop(0)
+        sent.append(payload)
+    return send
+
+
+def test_is_retryable():
+    assert is_retryable(requests.exceptions.ConnectionError('down'))
+    assert is_retryable(requests.exceptions.ReadTimeout('slow'))
+    assert is_retryable(InfluxDBClientError('busy', 503))
+    assert is_retryable(InfluxDBClientError('later', 429))
+    assert not is_retryable(InfluxDBClientError('bad', 400))
+    assert not is_retryable(ValueError('bad line'))
+    assert not is_retryable(SpoolFullError('full'))
+
+
+def test_retries_retryable_errors():
+    sent = []
+    errors = [requests.exceptions.ConnectionError('down'), InfluxDBClientError('busy', 503)]
+    writer = BatchWriter(failing(errors, sent), chunk_points=20, workers=1, retries=3, backoff=0)
+    report = writer.write_lines(LINES)
+    assert report.success and report.chunks[0].attempts == 3
+    assert len(sent) == 1
+
+
+def test_gives_up_after_retries():
+    sent = []
+    errors = [requests.exceptions.ConnectionError('down')] * 5
+    writer = BatchWriter(failing(errors, sent), chunk_points=20, workers=1, retries=2, backoff=0)
+    report = writer.write_lines(LINES)
+    assert not report.success
+    assert report.chunks[0].attempts == 3 and report.chunks[0].error == 'down'
+
+
+def test_no_retry_for_permanent_errors():
+    for error in (ValueError('bad line'), SpoolFullError('full'), InfluxDBClientError('bad', 400)):
+        sent = []
+        writer = BatchWriter(failing([error], sent), chunk_points=20, workers=1, backoff=0)
+        report = writer.write_lines(LINES)
+        assert report.chunks[0].attempts == 1 and not report.success
+
+
+def test_chunks_and_report():
+    sent = []
+    lock = threading.Lock()
+
+    def send(payload):
+        with lock:
+            sent.append(payload)
+
+    report = BatchWriter(send, chunk_points=3, workers=3).write_lines(LINES)
+    assert [c.points for c in report.chunks] == [3, 3, 3, 1]
+    assert report.points_written == 10
+    assert sorted(b''.join(sent).decode().splitlines()) == sorted(LINES)
+
+
+def test_backpressure():
+    release = threading.Event()
+    produced = []
+
+    def lines():
+        for line in LINES:
+            produced.append(line)
+            yield line
+
+    writer = BatchWriter(lambda payload: release.wait(), chunk_points=1, workers=2, queue_size=2)
+    thread = threading.Thread(target=writer.write_lines, args=(lines(),))
+    thread.start()
+    thread.join(0.2)
+    # два потока заняты, две пачки в очереди, одна ждёт места в очереди
+    assert len(produced) <= 2 + 2 + 2
+    release.set()
+    thread.join()
+    assert len(produced) == len(LINES)
+
+
+def test_closed_executor_fails_chunks():
+    executor = ThreadPoolExecutor(2)
+    executor.shutdown()
+    report = BatchWriter(lambda payload: None, chunk_points=4, workers=2,
+                         executor=executor).write_lines(LINES)
+    assert not report.success and report.points_failed == 10
+    assert 'shutdown' in report.chunks[0].error
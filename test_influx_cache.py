@@ -0,0 +1,104 @@
+"""Проверки кэша результатов чтения (influx_cache)"""
+import time
+
+import pandas as pd
+
+from influx_cache import QueryCache, invalidate_caches, measurements_in_payload
+from influx_pool import close_pools
+from influx_spool import WriteSpool
+from influx_stub_server import StubInfluxServer
+from InfluxDatabase import EnhancedInfluxDBManager
+
+FRAME = pd.DataFrame({'v': [1.0, 2.0]})
+
+
+def test_hit_and_copy():
+    cache = QueryCache()
+    key = QueryCache.key('db', 'm', ['v'], {'k': 1}, '2020-01-01', '2020-01-02')
+    assert cache.get(key) is None
+    cache.put(key, FRAME, end='2020-01-02')
+    df = cache.get(key)
+    df.loc[0, 'v'] = 10.0
+    assert cache.get(key).equals(FRAME)
+    assert cache.stats['hits'] == 2 and cache.stats['misses'] == 1
+
+
+def test_naive_time_uses_query_zone():
+    naive = QueryCache.key('db', 'm', start='2020-01-01 03:00', time_zone='Europe/Moscow')
+    aware = QueryCache.key('db', 'm', start='2020-01-01 00:00+00:00', time_zone='Europe/Moscow')
+    assert naive == aware
+
+
+def test_invalidate_payload_in_every_cache():
+    first, second = QueryCache(), QueryCache()
+    for cache in (first, second):
+        cache.put(QueryCache.key('db', 'a'), FRAME)
+        cache.put(QueryCache.key('db', 'b'), FRAME)
+    assert measurements_in_payload(b'a,t=1 v=1 1\n') == {'a'}
+    invalidate_caches('db', payload=b'a,t=1 v=1 1\n')
+    for cache in (first, second):
+        assert cache.get(QueryCache.key('db', 'a')) is None
+        assert cache.get(QueryCache.key('db', 'b')) is not None
+
+
+def test_stale_result_not_stored():
+    cache = QueryCache()
+    generation = cache.generation
+    invalidate_caches('db', 'm')
+    cache.put(QueryCache.key('db', 'm'), FRAME, generation=generation)
+    assert cache.get(QueryCache.key('db', 'm')) is None
+
+
+def test_ttl():
+    cache = QueryCache(ttl=100)
+    cache.put(('open',), FRAME, ttl=0.01)
+    cache.put(('closed',), FRAME, end='2020-01-01', ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get(('open',)) is None
+    assert cache.get(('closed',)) is not None
+    assert cache.ttl == 100
+
+
+def test_eviction():
+    size = int(FRAME.memory_usage(index=True, deep=True).sum())
+    cache = QueryCache(max_bytes=2 * size)
+    for name in 'abc':
+        cache.put((name,), FRAME)
+    assert cache.get(('a',)) is None
+    assert cache.stats['evictions'] == 1
+
+
+def test_spooled_write_invalidates_on_delivery(tmp_path):
+    with StubInfluxServer() as server:
+        manager = EnhancedInfluxDBManager({'DB_name': 'test', 'IP_': server.host, 'port_': server.port})
+        manager.enable_cache()
+        manager.spool = WriteSpool(str(tmp_path), send=manager._write, fsync='never')
+
+        def read():
+            return manager.read_data('m', '2024-01-01', '2024-01-02', time_zone='UTC')['v'].tolist()
+
+        start = pd.Timestamp('2024-01-01', tz='UTC').value
+        assert manager.write_lines(b'm v=1 %d\n' % start)
+        manager.spool.drain_once()
+        assert read() == [1.0]
+        assert manager.write_lines(b'm v=2 %d\n' % (start + 1))
+        # чтение до отправки из журнала не закрепляет в кэше старый результат
+        assert read() == [1.0]
+        manager.spool.drain_once()
+        assert read() == [1.0, 2.0]
+        manager.close()
+    close_pools()
+
+
+def test_write_keeps_other_measurements_puts():
+    cache = QueryCache()
+    generation = cache.generation
+    invalidate_caches('db', 'other')
+    invalidate_caches('other_db', 'm')
+    cache.put(QueryCache.key('db', 'm'), FRAME, generation=generation)
+    assert cache.get(QueryCache.key('db', 'm')) is not None
+    invalidate_caches('db')
+    cache.put(QueryCache.key('db', 'm'), FRAME, generation=generation)
+    cache.invalidate()
+    cache.put(QueryCache.key('db', 'x'), FRAME, generation=generation)
+    assert cache.get(QueryCache.key('db', 'x')) is None
@@ -0,0 +1,66 @@
+"""Проверки каталога схемы (influx_catalog) и get_measurement_info на StubInfluxServer"""
+import pandas as pd
+import pytest
+
+from influx_catalog import SchemaCatalog
+from influx_pool import get_pool, close_pools
+from influx_stub_server import StubInfluxServer
+from InfluxDatabase import EnhancedInfluxDBManager
+
+T0 = pd.Timestamp('2024-01-01', tz='UTC').value
+
+
+@pytest.fixture
+def server():
+    with StubInfluxServer() as server:
+        get_pool(server.host, server.port).write(
+            b'm,k=a v=1,s="x" %d\nm,k=b v=2 %d\nother w=1i %d\n' % (T0, T0 + 10**9, T0), 'test')
+        yield server
+    close_pools()
+
+
+def counting(server, queries):
+    pool = get_pool(server.host, server.port)
+
+    def execute(query, database):
+        queries.append(query)
+        return pool.query_results(query, database)
+    return execute
+
+
+def test_schema_in_one_request(server):
+    queries = []
+    catalog = SchemaCatalog(counting(server, queries))
+    assert catalog.measurements('test') == ['m', 'other']
+    schema = catalog.schema('m', 'test', time_range=True)
+    assert schema.tag_keys == ['k'] and schema.field_keys == {'s': 'string', 'v': 'float'}
+    assert schema.tag_values == {'k': ['a', 'b']}
+    assert (schema.first.value, schema.last.value) == (T0, T0 + 10**9)
+    assert catalog.field_keys('m', 'test') == {'s': 'string', 'v': 'float'}
+    assert catalog.schema('missing', 'test') is None
+    assert catalog.requests == len(queries) == 2
+
+
+def test_write_refreshes_touched_measurement(server):
+    queries = []
+    catalog = SchemaCatalog(counting(server, queries))
+    catalog.schema('m', 'test')
+    catalog.schema('other', 'test')
+    get_pool(server.host, server.port).write(b'm,k=c v=3 %d\nnew v=1 %d\n' % (T0, T0), 'test')
+    catalog.observe_payload(b'm,k=c v=3 %d\nnew v=1 %d\n' % (T0, T0), 'test')
+    assert 'new' in catalog.measurements('test')
+    assert catalog.tag_values('m', 'k', 'test') == ['a', 'b', 'c']
+    catalog.schema('other', 'test')
+    assert catalog.requests == 4
+
+
+def test_measurement_info_from_catalog(server):
+    manager = EnhancedInfluxDBManager({'DB_name': 'test', 'IP_': server.host, 'port_': server.port})
+    before = server.stats['query_requests']
+    info = manager.get_measurement_info('m')
+    assert server.stats['query_requests'] - before == 2
+    assert 'time_range' not in info
+    assert (info['first_time'].value, info['last_time'].value) == (T0, T0 + 10**9)
+    assert info['tag_values'] == {'k': ['a', 'b']}
+    manager.get_measurement_info('m')
+    assert server.stats['query_requests'] - before == 2
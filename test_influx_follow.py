@@ -0,0 +1,63 @@
+"""Проверки отметок и курсора опроса follow (influx_follow)"""
+import pandas as pd
+
+from influx_follow import WatermarkStore, FollowCursor
+
+START = pd.Timestamp('2024-01-01', tz='UTC')
+
+
+def frame(*seconds):
+    return pd.DataFrame({'v': [float(s) for s in seconds]},
+                        index=pd.DatetimeIndex([START + pd.Timedelta(seconds=s) for s in seconds]))
+
+
+def ns(second):
+    return (START + pd.Timedelta(seconds=second)).value
+
+
+def test_store_persists(tmp_path):
+    path = str(tmp_path / 'marks.json')
+    key = WatermarkStore.key('db', 'm', {'b': 2, 'a': 1})
+    assert key == 'db/m/a=1,b=2'
+    WatermarkStore(path).set(key, 5)
+    assert WatermarkStore(path).get(key) == 5
+
+
+def test_mark_moves_on_commit():
+    store = WatermarkStore()
+    cursor = FollowCursor(store, 'k', since=START, limit=10)
+    assert f'time > {START.value} ' in cursor.query('m')
+    df, more = cursor.accept(frame(1, 2))
+    assert len(df) == 2 and not more
+    assert store.get('k') is None
+    cursor.commit()
+    assert store.get('k') == ns(2)
+    assert FollowCursor(store, 'k').mark == ns(2)
+    assert cursor.accept(frame()) == (None, False)
+
+
+def test_full_batch_drops_last_instant():
+    store = WatermarkStore()
+    cursor = FollowCursor(store, 'k', since=START, limit=3)
+    df, more = cursor.accept(frame(1, 2, 2))
+    assert list(df['v']) == [1.0] and more
+    cursor.commit()
+    assert store.get('k') == ns(1)
+
+
+def test_pages_through_one_instant():
+    store = WatermarkStore()
+    cursor = FollowCursor(store, 'k', since=START, limit=2)
+    df, more = cursor.accept(frame(1, 1))
+    assert len(df) == 2 and more
+    cursor.commit()
+    assert store.get('k') is None
+    assert cursor.query('m') == f'SELECT * FROM m WHERE time = {ns(1)} LIMIT 2 OFFSET 2'
+    df, more = cursor.accept(frame(1, 1))
+    assert len(df) == 2 and more
+    assert cursor.query('m').endswith('OFFSET 4')
+    df, more = cursor.accept(frame(1))
+    assert len(df) == 1 and more
+    cursor.commit()
+    assert store.get('k') == ns(1)
+    assert f'time > {ns(1)} ' in cursor.query('m')
@@ -0,0 +1,77 @@
+"""Проверки кодирования line protocol (influx_line_protocol)"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from influx_line_protocol import (wire_precision, precision_factor, escape_key,
+                                  escape_measurement, point_to_line,
+                                  dataframe_to_lines, join_lines, iter_line_batches)
+
+START = pd.Timestamp('2024-01-01', tz='UTC')
+
+
+@pytest.mark.parametrize('precision, wire', [
+    ('ns', 'ns'), ('n', 'ns'), ('us', 'u'), ('u', 'u'),
+    ('ms', 'ms'), ('s', 's'), ('m', 'm'), ('h', 'h'), (None, None),
+])
+def test_wire_precision(precision, wire):
+    assert wire_precision(precision) == wire
+
+
+def test_unknown_precision():
+    with pytest.raises(ValueError):
+        wire_precision('sec')
+    with pytest.raises(ValueError):
+        precision_factor('sec')
+
+
+def test_escaping():
+    assert escape_measurement('a b,c') == 'a\\ b\\,c'
+    assert escape_key('k=v, x') == 'k\\=v\\,\\ x'
+
+
+def test_point_to_line_types():
+    line = point_to_line('m', {'f': 1.5, 'i': 2, 'b': False, 's': 'a "q"', 'nan': float('nan'),
+                               'none': None},
+                         {'t': 'x y', 'empty': ''}, START, 's')
+    assert line == 'm,t=x\\ y f=1.5,i=2i,b=false,s="a \\"q\\"" 1704067200'
+    assert point_to_line('m', {'none': None}) is None
+
+
+def test_dataframe_matches_points():
+    df = pd.DataFrame({'v': [1.5, np.nan],
+                       'n': pd.array([1, None], dtype='Int64'),
+                       'ok': [True, False],
+                       's': ['a "q"', 'b'],
+                       't': ['x y', 'z']},
+                      index=pd.DatetimeIndex([START, START + pd.Timedelta(seconds=1)]))
+    lines = dataframe_to_lines(df, 'my m', tag_columns=['t'], field_columns=['v', 'n', 'ok', 's'],
+                               global_tags={'g': '1'}, precision='s')
+    expected = [point_to_line('my m', {'v': 1.5, 'n': 1, 'ok': True, 's': 'a "q"'},
+                              {'t': 'x y', 'g': '1'}, START, 's'),
+                point_to_line('my m', {'ok': False, 's': 'b'},
+                              {'t': 'z', 'g': '1'}, START + pd.Timedelta(seconds=1), 's')]
+    assert lines == expected
+
+
+def test_dataframe_missing_tags():
+    df = pd.DataFrame({'v': [1.0, 2.0], 't': ['a', None]},
+                      index=pd.DatetimeIndex([START, START + pd.Timedelta(seconds=1)]))
+    assert dataframe_to_lines(df, 'm', tag_columns=['t'])[1].startswith('m,t=')
+    assert dataframe_to_lines(df, 'm', tag_columns=['t'], skip_missing_tags=True)[1].startswith('m v=')
+
+
+def test_dataframe_without_timestamps():
+    with pytest.raises(TypeError):
+        dataframe_to_lines(pd.DataFrame({'v': [1.0]}), 'm')
+    df = pd.DataFrame({'v': [1.0], 'time': [START]})
+    assert dataframe_to_lines(df, 'm', field_columns=['v'], timestamp_column='time') == \
+        ['m v=1.0 1704067200000000000']
+
+
+def test_batches():
+    lines = [f'm v={i} {i}' for i in range(5)]
+    assert join_lines(lines[:2]) == b'm v=0 0\nm v=1 1\n'
+    assert [b.count(b'\n') for b in iter_line_batches(lines, 2)] == [2, 2, 1]
+    assert [b.count(b'\n') for b in iter_line_batches(lines, None, 16)] == [2, 2, 1]
+    assert b''.join(iter_line_batches(lines, 2)) == join_lines(lines)
@@ -0,0 +1,91 @@
+"""Проверки метрик и трассировки операций (influx_metrics)"""
+import threading
+import urllib.request
+
+import pandas as pd
+import pytest
+
+from influx_metrics import (MetricsRegistry, set_instrumentation, traced, span,
+                            current_span, use_span, NULL_SPAN, serve_prometheus)
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    previous = set_instrumentation(registry)
+    yield registry
+    set_instrumentation(previous)
+
+
+@traced()
+def read(measurement, rows=2):
+    current_span().add(bytes=10)
+    return pd.DataFrame({'v': range(rows)})
+
+
+@traced()
+def read_twice(measurement):
+    read(measurement)
+    return read(measurement, rows=3)
+
+
+@traced()
+def chunks(measurement):
+    yield pd.DataFrame({'v': [1]})
+    yield pd.DataFrame({'v': [2, 3]})
+
+
+def test_disabled_by_default():
+    assert current_span() is NULL_SPAN
+    assert read('m').shape == (2, 1)
+    with span('read', 'm') as op:
+        assert op is NULL_SPAN
+
+
+def test_traced_counts_rows_and_bytes(registry):
+    read('m')
+    read_twice('m')
+    snapshot = registry.snapshot()
+    assert snapshot['operations_total'] == {('read', 'm', 'ok'): 1, ('read_twice', 'm', 'ok'): 1}
+    assert snapshot['rows_total'] == {('read', 'm'): 2, ('read_twice', 'm'): 3}
+    assert snapshot['bytes_total'] == {('read', 'm'): 10, ('read_twice', 'm'): 20}
+
+
+def test_generator_span_covers_iteration(registry):
+    assert sum(len(df) for df in chunks('m')) == 3
+    assert registry.snapshot()['rows_total'] == {('chunks', 'm'): 3}
+
+
+def test_errors_and_worker_threads(registry):
+    spans = []
+    registry.add_listener(spans.append)
+    with pytest.raises(ValueError):
+        with span('write', 'm') as op:
+            def send():
+                with use_span(op):
+                    current_span().add(points=5, retries=1)
+            worker = threading.Thread(target=send)
+            worker.start()
+            worker.join()
+            raise ValueError('bad')
+    assert spans[0].points == 5 and spans[0].retries == 1 and spans[0].status == 'error'
+    assert registry.snapshot()['errors_total'] == {('write', 'm', 'ValueError'): 1}
+
+
+def test_prometheus_text(registry):
+    read('m"1')
+    text = registry.to_prometheus()
+    assert 'influx_operation_duration_seconds_count{operation="read",measurement="m\\"1"} 1' in text
+    assert 'influx_rows_total{operation="read",measurement="m\\"1"} 2' in text
+
+
+def test_serve_prometheus_local_by_default(registry):
+    read('m')
+    server = serve_prometheus(registry, port=0)
+    try:
+        host, port = server.server_address[:2]
+        assert host == '127.0.0.1'
+        with urllib.request.urlopen(f'http://{host}:{port}/metrics') as response:
+            assert b'influx_rows_total' in response.read()
+    finally:
+        server.shutdown()
@@ -0,0 +1,126 @@
+"""Проверки общего пула соединений (influx_pool) на StubInfluxServer"""
+import pandas as pd
+import pytest
+import requests
+from influxdb.exceptions import InfluxDBClientError
+
+import influx_pool
+from influx_pool import get_pool, close_pools, pool_key
+from influx_stub_server import StubInfluxServer
+from InfluxDatabase import EnhancedInfluxDBManager
+
+
+@pytest.fixture
+def server():
+    with StubInfluxServer() as server:
+        yield server
+    close_pools()
+
+
+def manager(server, **kwargs):
+    return EnhancedInfluxDBManager({'DB_name': 'test', 'IP_': server.host, 'port_': server.port},
+                                   **kwargs)
+
+
+def frame(rows=2):
+    return pd.DataFrame({'v': [float(i) for i in range(rows)]},
+                        index=pd.date_range('2024-01-01', periods=rows, freq='s', tz='UTC'))
+
+
+def test_pool_key_includes_options():
+    assert pool_key('h', '8086') == pool_key('h', 8086, pool_size=10, ssl=False)
+    assert pool_key('h', 8086) != pool_key('h', 8086, ssl=True)
+    assert pool_key('h', 8086) != pool_key('h', 8086, username='user', password='secret')
+    assert pool_key('h', 8086) != pool_key('h', 8086, pool_size=2)
+
+
+def test_pool_shared_per_options(server):
+    pool = get_pool(server.host, server.port)
+    assert get_pool(server.host, str(server.port), timeout=None) is pool
+    assert get_pool(server.host, server.port, pool_size=2) is not pool
+    assert manager(server).pool is pool
+    assert manager(server, pool_size=2).pool is not pool
+
+
+def test_manager_close_keeps_shared_pool(server):
+    first, second = manager(server), manager(server)
+    assert first.pool is second.pool
+    first.close()
+    assert not second.pool.closed
+    assert second.write_dataframe_enhanced(frame(3), 'm')
+    assert len(server.store.rows('test', 'm')) == 3
+
+
+def test_write_single_attempt(server):
+    pool = get_pool(server.host, server.port)
+    assert pool.write(b'm v=1 1\n', 'test', gzip=True)
+    with pytest.raises(InfluxDBClientError) as error:
+        pool.write(b'm\n', 'test', retry=True)
+    assert error.value.code == 400
+    assert server.stats['write_requests'] == 2
+    assert pool.write_stats.points == 1
+
+
+def test_close_pools_creates_new_pool(server):
+    pool = get_pool(server.host, server.port)
+    close_pools()
+    assert pool.closed
+    assert get_pool(server.host, server.port) is not pool
+
+
+def test_msgpack_frames_match_json(server):
+    pool = get_pool(server.host, server.port)
+    pool.write(b'm,k=a v=1.5,n=1i,s="x" 1704067200000000001\n'
+               b'm,k=b v=2.5,b=true 1704067201000000000\n', 'test')
+    with StubInfluxServer(store=server.store, msgpack=False) as json_server:
+        json_pool = get_pool(json_server.host, json_server.port)
+        for query in ('SELECT * FROM m', 'SELECT v FROM m GROUP BY k'):
+            frames = pool.query_frames(query, 'test')
+            expected = json_pool.query_frames(query, 'test')
+            assert frames.keys() == expected.keys()
+            for key in frames:
+                pd.testing.assert_frame_equal(frames[key], expected[key])
+    df = frames[('m', (('k', 'a'),))]
+    assert df.index[0].value == 1704067200000000001
+    assert server.stats['query_bytes'] > 0
+
+
+def test_query_retries_transient_errors(server, monkeypatch):
+    pool = get_pool(server.host, server.port, retries=3)
+    calls = []
+    request = pool._session.request
+
+    def flaky_request(*args, **kwargs):
+        calls.append(kwargs['params']['q'])
+        if len(calls) == 1:
+            raise requests.exceptions.ConnectionError('down')
+        return request(*args, **kwargs)
+
+    monkeypatch.setattr(influx_pool, 'retry_delay', lambda attempt: 0)
+    monkeypatch.setattr(pool._session, 'request', flaky_request)
+    assert pool.query_frames('SHOW MEASUREMENTS', 'test') == {}
+    assert len(calls) == 2
+    # ошибка оператора в ответе не повторяется
+    with pytest.raises(RuntimeError):
+        pool.query_frames('SELECT bad syntax', 'test')
+    assert len(calls) == 3
+
+
+def test_query_and_write_share_retry_budget(server, monkeypatch):
+    pool = get_pool(server.host, server.port, retries=2)
+    calls = []
+
+    def down(*args, **kwargs):
+        calls.append(kwargs.get('method', 'POST'))
+        raise requests.exceptions.ConnectionError('down')
+
+    monkeypatch.setattr(influx_pool, 'retry_delay', lambda attempt: 0)
+    monkeypatch.setattr(pool._session, 'request', down)
+    monkeypatch.setattr(pool._session, 'post', down)
+    # первая попытка и retries повторов - одинаково для запроса и записи
+    with pytest.raises(requests.exceptions.ConnectionError):
+        pool.query_frames('SHOW MEASUREMENTS', 'test')
+    assert len(calls) == 3
+    with pytest.raises(requests.exceptions.ConnectionError):
+        pool.write(b'm v=1 1\n', 'test', retry=True)
+    assert len(calls) == 6
@@ -0,0 +1,37 @@
+"""Проверки построения запросов InfluxQL (influx_query)"""
+import pytest
+
+from influx_query import (tag_condition, select_list, tags_condition, build_select,
+                          build_last_points, build_follow, build_follow_instant)
+
+
+def test_identifier_quoting():
+    assert tag_condition('name', "it's") == '"name"=\'it\\\'s\''
+    assert tag_condition('key', ['a', 'b']) == '("key"=\'a\' OR "key"=\'b\')'
+    assert select_list(['my field', 'time']) == '"my field", "time"'
+    assert select_list(None) == '*'
+    assert tags_condition({'a': 1}) == '"a"=\'1\' AND '
+    assert tags_condition(None) == ''
+
+
+def test_build_select():
+    query = build_select('m', '2024-01-01', '2024-01-02', ['v'], {'k': 'x'},
+                         time_zone='Europe/Moscow', end_inclusive=False)
+    assert query == ("SELECT \"v\" FROM m WHERE \"k\"='x' AND time >= '2024-01-01' "
+                     "AND time < '2024-01-02' tz('Europe/Moscow')")
+
+
+def test_build_last_points():
+    query = build_last_points('m', [{'Equipment': 'A'}, {}, {'Equipment': 'B'}])
+    assert query == ("SELECT * FROM m WHERE ((\"Equipment\"='A') OR (\"Equipment\"='B')) "
+                     "AND time > now() - 1d GROUP BY \"Equipment\" ORDER BY time DESC LIMIT 1")
+    assert 'WHERE time > ' in build_last_points('m', [{}], group_by=['Equipment'])
+    with pytest.raises(ValueError):
+        build_last_points('m', [{}])
+
+
+def test_build_follow():
+    assert build_follow('m', 5, tags={'k': 'v'}, limit=3) == \
+        "SELECT * FROM m WHERE \"k\"='v' AND time > 5 ORDER BY time ASC LIMIT 3"
+    assert build_follow_instant('m', 5, limit=3, offset=3) == \
+        'SELECT * FROM m WHERE time = 5 LIMIT 3 OFFSET 3'
@@ -0,0 +1,60 @@
+"""Проверки разбиения интервала на окна и склейки окон (influx_shard)"""
+import pandas as pd
+import pytest
+
+from influx_shard import split_time_range, split_by_counts, estimate_buckets, read_sharded
+from influx_stub_server import StubInfluxServer
+from influx_pool import get_pool, close_pools
+
+START, END = pd.Timestamp('2024-01-01'), pd.Timestamp('2024-01-02')
+
+
+def test_split_time_range():
+    windows = split_time_range(START, END, shards=4)
+    assert [w[0] for w in windows] == list(pd.date_range(START, periods=4, freq='6h'))
+    assert windows[-1][1] == END
+    assert [w[2] for w in windows] == [False, False, False, True]
+    assert split_time_range(START, END, window='10h')[1][:2] == (START + pd.Timedelta('10h'),
+                                                                 START + pd.Timedelta('20h'))
+    assert split_time_range(START, END) == [(START, END, True)]
+    with pytest.raises(ValueError):
+        split_time_range(START, END, window='-1h')
+
+
+def test_split_by_counts():
+    buckets = [(START + pd.Timedelta(hours=h), points) for h, points in enumerate([5, 1, 4, 10, 2])]
+    windows = split_by_counts(START, END, buckets, shard_points=5)
+    assert [w[0] for w in windows] == [START, START + pd.Timedelta('1h'),
+                                       START + pd.Timedelta('3h'), START + pd.Timedelta('4h')]
+
+
+def frame(*hours):
+    return pd.DataFrame({'v': [float(h) for h in hours]},
+                        index=pd.DatetimeIndex([START + pd.Timedelta(hours=h) for h in hours]))
+
+
+def test_read_sharded_matches_single_read():
+    data = frame(*range(24), 24)
+
+    def fetch(start, end, end_inclusive):
+        mask = (data.index >= start) & ((data.index <= end) if end_inclusive else (data.index < end))
+        return data[mask]
+
+    df = read_sharded(fetch, split_time_range(START, END, shards=5), workers=3)
+    assert df.equals(data)
+    assert read_sharded(lambda *window: None, split_time_range(START, END, shards=2)) is None
+
+
+def test_estimate_buckets():
+    with StubInfluxServer() as server:
+        pool = get_pool(server.host, server.port)
+        lines = ''.join(f'm v={h} {(START.tz_localize("UTC") + pd.Timedelta(hours=h)).value}\n'
+                        for h in (0, 1, 1.5, 13))
+        pool.write(lines.encode(), 'test')
+
+        def query(text):
+            return pool.query_frames(text, 'test').get('m')
+
+        buckets = estimate_buckets(query, 'm', START, END, buckets=2)
+    close_pools()
+    assert buckets == [(START, 3), (START + pd.Timedelta('12h'), 1), (END, 0)]
@@ -0,0 +1,100 @@
+"""Проверки журнала записи (influx_spool)"""
+import os
+
+import pytest
+from influxdb.exceptions import InfluxDBClientError
+
+from influx_spool import WriteSpool, SpoolFullError
+
+
+def payloads(count):
+    return [b'm v=%d %d\n' % (i, i) for i in range(count)]
+
+
+def open_spool(directory, sent, **kwargs):
+    return WriteSpool(str(directory), send=lambda payload, db, precision: sent.append((payload, db, precision)),
+                      fsync='never', **kwargs)
+
+
+def drain(spool):
+    while spool.drain_once():
+        pass
+
+
+def test_order_and_restart(tmp_path):
+    sent = []
+    spool = open_spool(tmp_path, sent, segment_bytes=100)
+    for payload in payloads(6):
+        spool.append(payload, 'db', 's')
+    for _ in range(2):
+        spool.drain_once()
+    spool.close()
+    spool = open_spool(tmp_path, sent, segment_bytes=100)
+    assert spool.backlog()['pending_records'] == 4
+    drain(spool)
+    spool.close()
+    assert [p for p, _, _ in sent] == payloads(6)
+    assert {(db, precision) for _, db, precision in sent} == {('db', 's')}
+
+
+def test_recovers_torn_middle_segment(tmp_path):
+    spool = open_spool(tmp_path, [], segment_bytes=200)
+    for payload in payloads(12):
+        spool.append(payload, 'db')
+    spool.close()
+    segments = sorted(f for f in os.listdir(tmp_path) if f.endswith('.spool'))
+    assert len(segments) > 2
+    path = tmp_path / segments[0]
+    path.write_bytes(path.read_bytes()[:-5])
+
+    sent = []
+    spool = open_spool(tmp_path, sent, segment_bytes=200)
+    drain(spool)
+    spool.close()
+    order = [payloads(12).index(p) for p, _, _ in sent]
+    assert len(order) == 11 and order == sorted(order)
+
+
+def test_rejected_record_dropped(tmp_path):
+    errors = [InfluxDBClientError('bad', 400)]
+
+    def send(payload, db, precision):
+        if errors:
+            raise errors.pop()
+
+    spool = WriteSpool(str(tmp_path), send=send, fsync='never')
+    spool.append(b'm v=1 1\n')
+    spool.append(b'm v=2 2\n')
+    drain(spool)
+    assert spool.dropped_records == 1 and spool.sent_records == 1
+    spool.close()
+
+
+def test_retryable_error_keeps_record(tmp_path):
+    spool = WriteSpool(str(tmp_path), send=lambda *args: (_ for _ in ()).throw(ConnectionError('down')),
+                       fsync='never')
+    spool.append(b'm v=1 1\n')
+    assert not spool.drain_once()
+    assert spool.pending_records == 1 and spool.last_error == 'down'
+    spool.close()
+
+
+def test_full(tmp_path):
+    spool = open_spool(tmp_path, [], max_bytes=64)
+    spool.append(b'm v=1 1\n')
+    with pytest.raises(SpoolFullError):
+        spool.append(b'm v=1 1\n' * 10)
+    spool.close()
+
+
+@pytest.mark.parametrize('code', [401, 403, 404])
+def test_auth_and_missing_db_keep_record(tmp_path, code):
+    def send(payload, db, precision):
+        raise InfluxDBClientError('database not found' if code == 404 else 'unauthorized', code)
+
+    spool = WriteSpool(str(tmp_path), send=send, fsync='never')
+    spool.append(b'm v=1 1\n')
+    spool.append(b'm v=2 2\n')
+    assert not spool.drain_once()
+    assert spool.pending_records == 2 and spool.dropped_records == 0
+    spool.close()
@@ -0,0 +1,76 @@
+"""Проверки пакетной записи кривых (mongo_bulk) на StubMongoClient"""
+import pandas as pd
+import pytest
+
+import mongo_bulk
+import mongo_frames
+from mongo_bulk import CurveBulkWriter, CurveEntry, curve_name
+from mongo_query import INDEXES
+from mongo_stub import StubMongoClient, StubGridFSBucket
+
+FRAME = pd.DataFrame({'a': [1.0, 2.0]})
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(mongo_frames, 'GridFSBucket', StubGridFSBucket)
+    StubMongoClient.reset()
+    db = StubMongoClient()['TES']
+    for keys, options in INDEXES:
+        db.posts.create_index(keys, **options)
+    return db
+
+
+def stored(db):
+    return [(d['name'], d['version']) for d in db.posts.find({}, {'name': 1, 'version': 1}).sort([('_id', 1)])]
+
+
+def test_curve_name():
+    assert curve_name('TA3', 'D0', 'St2') == 'TA3.St2.D0'
+    assert curve_name('TA3', 'D0', None, 'M') == 'TA3.D0:M'
+    assert CurveEntry.of({'DFSt2': FRAME, 'Name': 'X'}).name == 'TA3.St2.X'
+
+
+@pytest.mark.parametrize('format', ['json', 'arrow'])
+def test_versions_follow_input_order(db, format):
+    writer = CurveBulkWriter(db, format=format, batch_documents=2)
+    report = writer.write([(FRAME, 'TA3', 'St2', name, 'Base') for name in ['X', 'Y', 'X', 'X']])
+    assert report.success and report.batches == 2
+    assert [r.version for r in report.results] == [1, 1, 2, 3]
+    assert stored(db) == [('TA3.St2.X', 1), ('TA3.St2.Y', 1), ('TA3.St2.X', 2), ('TA3.St2.X', 3)]
+    report = writer.write([CurveEntry(FRAME, Name='X')])
+    assert report.results[0].version == 4
+
+
+def test_taken_versions_renumbered(db, monkeypatch):
+    CurveBulkWriter(db).write([CurveEntry(FRAME, Name='X'), CurveEntry(FRAME, Name='X')])
+    latest = mongo_bulk.latest_versions
+    calls = []
+
+    def stale(collection, names):
+        calls.append(names)
+        return {} if len(calls) == 1 else latest(collection, names)
+
+    monkeypatch.setattr(mongo_bulk, 'latest_versions', stale)
+    report = CurveBulkWriter(db).write([CurveEntry(FRAME, Name='X'), CurveEntry(FRAME, Name='X'),
+                                        CurveEntry(FRAME, Name='Y')])
+    assert report.success
+    assert [r.version for r in report.results] == [3, 4, 1]
+    assert stored(db) == [('TA3.St2.X', 1), ('TA3.St2.X', 2), ('TA3.St2.Y', 1),
+                          ('TA3.St2.X', 3), ('TA3.St2.X', 4)]
+
+
+def test_upsert_replaces_last_version(db):
+    CurveBulkWriter(db).write([CurveEntry(FRAME, Name='X'), CurveEntry(FRAME, Name='X')])
+    report = CurveBulkWriter(db, mode='upsert').write([CurveEntry(FRAME * 2, Name='X'),
+                                                       CurveEntry(FRAME, Name='Z')])
+    assert report.success
+    assert [(r.version, r.replaced) for r in report.results] == [(2, True), (1, False)]
+    assert stored(db) == [('TA3.St2.X', 1), ('TA3.St2.X', 2), ('TA3.St2.Z', 1)]
+
+
+def test_oversized_document(db, monkeypatch):
+    monkeypatch.setattr(mongo_bulk, 'MAX_DOCUMENT_BYTES', 10)
+    report = CurveBulkWriter(db, format='arrow').write([CurveEntry(FRAME, Name='X')])
+    assert not report.success and '16 МБ' in report.failed[0].error
+    assert stored(db) == []
@@ -0,0 +1,64 @@
+"""Проверки двоичного хранения DataFrame и переноса в GridFS (mongo_frames)"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import mongo_frames
+from mongo_frames import encode_payload, decode_payload, delete_files, frame_to_bytes, bytes_to_frame
+from mongo_stub import StubMongoClient, StubGridFSBucket
+
+SMALL = pd.DataFrame({'a': [1.0, 2.0]}, index=pd.date_range('2024-01-01', periods=2, tz='UTC'))
+LARGE = pd.DataFrame({'b': np.arange(10000, dtype=np.int64) * 7919 % 10007,
+                      'c': pd.Categorical(['x', 'y'] * 5000)})
+
+
+def assert_frame_equal(left, right):
+    # частота индекса (freq) в двоичных форматах не хранится
+    pd.testing.assert_frame_equal(left, right, check_freq=False)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(mongo_frames, 'GridFSBucket', StubGridFSBucket)
+    StubMongoClient.reset()
+    return StubMongoClient()['TES']
+
+
+def files(db):
+    return StubGridFSBucket(db, bucket_name=mongo_frames.BUCKET).find()
+
+
+@pytest.mark.parametrize('format', ['arrow', 'parquet'])
+def test_bytes_keep_types(format):
+    for frame in (SMALL, LARGE):
+        assert_frame_equal(bytes_to_frame(frame_to_bytes(frame, format), format), frame)
+    with pytest.raises(ValueError):
+        frame_to_bytes(SMALL, 'csv')
+
+
+def test_inline_without_spill(db):
+    value, file_ids = encode_payload(db, {'s': SMALL, 'l': LARGE})
+    assert file_ids == [] and 'data' in value['s'] and 'data' in value['l']
+    decoded = decode_payload(db, value)
+    assert_frame_equal(decoded['s'], SMALL)
+    assert_frame_equal(decoded['l'], LARGE)
+
+
+def test_largest_frame_spills_to_gridfs(db):
+    limit = len(frame_to_bytes(SMALL)) + 10
+    value, file_ids = encode_payload(db, {'s': SMALL, 'l': LARGE}, spill_bytes=limit, filename='curve')
+    assert len(file_ids) == 1 and value['l']['gridfs'] == file_ids[0]
+    assert 'data' in value['s']
+    assert [f.filename for f in files(db)] == ['curve/l']
+    decoded = decode_payload(db, value)
+    assert_frame_equal(decoded['l'], LARGE)
+    delete_files(db, file_ids)
+    assert files(db) == []
+
+
+def test_single_frame_and_legacy_json(db):
+    value, file_ids = encode_payload(db, LARGE, format='parquet', spill_bytes=0)
+    assert value['_frame'] == 'parquet' and len(file_ids) == 1
+    assert_frame_equal(decode_payload(db, value), LARGE)
+    legacy = decode_payload(db, SMALL.reset_index(drop=True).to_json())
+    assert legacy['a'].tolist() == [1.0, 2.0]
@@ -0,0 +1,97 @@
+"""Проверки версий записей и запросов каталога MongoDB (mongo_query) на StubMongoClient"""
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+import database
+import mongo_query
+from mongo_query import (INDEXES, insert_version, next_version, find_version,
+                         latest_versions, catalog_pipeline)
+from mongo_stub import StubMongoClient
+
+
+@pytest.fixture
+def posts():
+    StubMongoClient.reset()
+    collection = StubMongoClient()['TES']['posts']
+    for keys, options in INDEXES:
+        collection.create_index(keys, **options)
+    return collection
+
+
+def test_versions_in_insert_order(posts):
+    assert [insert_version(posts, {'name': 'a', 'n': i}) for i in range(3)] == [1, 2, 3]
+    assert insert_version(posts, {'name': 'b'}) == 1
+    assert find_version(posts, 'a')['n'] == 2
+    assert find_version(posts, 'a', version=2)['n'] == 1
+    assert find_version(posts, 'a', version=4) is None
+    assert latest_versions(posts, ['a', 'b', 'c']).keys() == {'a', 'b'}
+    assert latest_versions(posts, ['a'])['a']['version'] == 3
+
+
+def test_unique_version(posts):
+    posts.insert_one({'name': 'a', 'version': 1})
+    with pytest.raises(DuplicateKeyError):
+        posts.insert_one({'name': 'a', 'version': 1})
+    # записи без поля version в уникальный индекс не входят
+    posts.insert_one({'name': 'a'})
+    posts.insert_one({'name': 'a'})
+
+
+def test_taken_version_retried(posts, monkeypatch):
+    insert_version(posts, {'name': 'a'})
+    calls = []
+
+    def stale(collection, name):
+        calls.append(name)
+        return 1 if len(calls) == 1 else next_version(collection, name)
+
+    monkeypatch.setattr(mongo_query, 'next_version', stale)
+    assert insert_version(posts, {'name': 'a'}) == 2
+    assert len(calls) == 2
+    ids = [d['_id'] for d in posts.find({'name': 'a'}).sort([('version', 1)])]
+    assert ids == sorted(ids)
+
+
+def test_retries_exhausted(posts, monkeypatch):
+    insert_version(posts, {'name': 'a'})
+    monkeypatch.setattr(mongo_query, 'next_version', lambda collection, name: 1)
+    with pytest.raises(DuplicateKeyError):
+        insert_version(posts, {'name': 'a'}, retries=2)
+
+
+def test_legacy_history(posts):
+    for i in range(3):
+        posts.insert_one({'_id': ObjectId(), 'name': 'old', 'n': i})
+    assert next_version(posts, 'old') == 4
+    assert find_version(posts, 'old', version=2)['n'] == 1
+    assert latest_versions(posts, ['old'])['old']['version'] == 3
+
+
+def test_catalog_page(posts):
+    for name in ['a', 'b', 'a', 'c']:
+        insert_version(posts, {'name': name, 'Equipment': 'E'})
+    page = next(iter(posts.aggregate(catalog_pipeline(skip=1, limit=1))))
+    assert page['total'][0]['total'] == 3
+    assert [row['name'] for row in page['items']] == ['b']
+
+
+def test_get_list_skips_on_server(posts, monkeypatch):
+    for name in ['a', 'b', 'a', 'c']:
+        insert_version(posts, {'name': name, 'Equipment': 'E'})
+    pipelines = []
+    aggregate = posts.aggregate
+    monkeypatch.setattr(posts, 'aggregate',
+                        lambda pipeline, **kwargs: pipelines.append(pipeline) or aggregate(pipeline, **kwargs))
+    monkeypatch.setattr(database, 'mongo_db', lambda IP=None: (SimpleNamespace(posts=posts), None))
+    for limit in [None, 5]:
+        res = database.get_list(skip=1, limit=limit)
+        assert res['name'].tolist() == ['b', 'c']
+        assert res.attrs['total'] == 3
+        # пропуск строк - стадия $skip конвейера (при limit - внутри $facet)
+        assert "{'$skip': 1}" in str(pipelines[-1])
+    # страница за концом каталога
+    res = database.get_list(skip=5)
+    assert res.empty and res.attrs['total'] == 3